@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Action Executor - Automazione UI Android tramite ADB
+Usa i dati JSON dell'interfaccia per automatizzare click, input testo, ecc.
+Importabile come modulo dall'orchestratore oppure usabile da riga di comando
+(adb_automator.sh è un semplice wrapper di questo script).
+"""
+
+import json
+import os
+import re
+import sys
+
+from adb_session import get_session, list_devices
+from capture import ScreenCapture
+from element_index import element_by_id, find_elements
+from prompt_generator import button_label, group_rows
+from ui_settle import UISettleDetector
+from workspace import default_workspace
+
+# Colori per output
+RED = '\033[0;31m'
+GREEN = '\033[0;32m'
+BLUE = '\033[0;34m'
+YELLOW = '\033[1;33m'
+NC = '\033[0m'  # No Color
+
+# Mapping specifico per campi conosciuti (label -> frammenti di resource_id), ultima risorsa
+# per i target in testo libero che l'indice degli elementi non trova
+FIELD_MAPPING = {
+    'Nome': ['nameEdit', 'title'],  # Samsung Contacts + Calendar
+    'Cognome': ['familyNameEdit'],  # Samsung Contacts
+    'Telefono': ['phoneEdit'],      # Samsung Contacts
+    'E-mail': ['emailEdit'],        # Samsung Contacts
+    'Note': ['note_text'],          # Samsung Calendar
+    'Luogo': ['location'],          # Samsung Calendar
+    'Invitato': ['attendees'],      # Samsung Calendar
+    'TuoTesto': ['title', 'location', 'note_text', 'attendees']  # Fallback per campi già compilati
+}
+
+SEARCH_FIELD_PATTERN = re.compile(r'[Rr]icerc|[Ss]earch|[Ff]ind|[Cc]erc')
+TEXT_ENTRY_ATTEMPTS = 2  # scritture di un campo (la seconda cancella il testo effettivamente riletto)
+# Valori da numero di telefono: il campo può formattarli con spazi, trattini, punti e parentesi
+PHONE_VALUE = re.compile(r'^\+?[\d\s().-]+$')
+PHONE_SEPARATORS = r'[\s().-]'
+
+
+def print_info(message):
+    print(f"{BLUE}{message}{NC}")
+
+
+def print_success(message):
+    print(f"{GREEN}{message}{NC}")
+
+
+def print_error(message):
+    print(f"{RED}{message}{NC}")
+
+
+def print_warning(message):
+    print(f"{YELLOW}{message}{NC}")
+
+
+def _same_text(observed, expected):
+    """Confronto tollerante solo alla formattazione che i campi applicano davvero: spazi e maiuscole,
+    più i separatori dei numeri di telefono ("333 123-4567"). Una "@" o un "." mancanti restano
+    una differenza."""
+    observed, expected = str(observed), str(expected)
+    separators = PHONE_SEPARATORS if PHONE_VALUE.match(expected) else r'\s'
+    return re.sub(separators, '', observed).casefold() == re.sub(separators, '', expected).casefold()
+
+
+def _size_ok(bounds, min_width, min_height):
+    """Verifica che il bounding box abbia dimensioni ragionevoli"""
+    return bounds.get('width', 0) > min_width and bounds.get('height', 0) > min_height
+
+
+class ActionExecutor:
+    """Traduce i comandi dell'LLM in comandi adb sul dispositivo"""
+
+    def __init__(self, session=None, settle=None, capture=None, workspace=None):
+        self.session = session or get_session()
+        self.workspace = workspace or default_workspace()
+        # Le attese dopo ogni azione usano il rilevamento della UI stabile (pause fisse solo come fallback)
+        self.settle = settle or UISettleDetector(self.session)
+        # Cattura della gerarchia in streaming (senza dump su file e pull)
+        self.capture = capture or ScreenCapture(self.session)
+
+    def keyevent(self, *keycodes):
+        return self.session.keyevent(*keycodes)
+
+    # Funzioni base ADB per automazione
+    def adb_click(self, x, y, description=""):
+        print_info(f"Click su ({x}, {y}) {description}")
+        if self.session.tap(x, y):
+            print_success("Click eseguito")
+            self.settle.wait(fallback=1)  # Attende la fine delle animazioni
+            return True
+        print_error("Errore durante il click")
+        return False
+
+    def adb_type_text(self, text, description=""):
+        print_info(f"Digitando testo: '{text}' {description}")
+
+        # Attende che il campo sia pronto
+        self.settle.wait(fallback=1)
+
+        # Inserimento diretto del testo
+        if self.session.text(text):
+            print_success("Testo inserito")
+        else:
+            print_error("Errore durante inserimento testo")
+            # Metodo backup: inserimento carattere per carattere solo in caso di errore
+            print_info("Tentativo con metodo alternativo carattere per carattere...")
+            for char in text:
+                if char == " ":
+                    self.keyevent("KEYCODE_SPACE")
+                else:
+                    self.session.text(char)
+            print_success("Testo inserito (metodo alternativo)")
+
+        # Attende che il testo inserito sia visualizzato
+        self.settle.wait(fallback=1.5)
+        return True
+
+    def adb_clear_field(self, x, y, description="", current_text=None):
+        print_info(f"Cancellando campo ({x}, {y}) {description}")
+        self.session.tap(x, y)
+        self.settle.wait(fallback=1)
+        self.delete_text(current_text)
+        print_success("Campo cancellato")
+        return True
+
+    # Inserimento di testo verificato
+    def delete_text(self, current_text):
+        """Cancella il contenuto del campo con il focus in un unico comando 'input keyevent':
+        esattamente len(testo attuale) DEL dalla fine; se il testo non è noto, seleziona tutto e cancella"""
+        if current_text is None:
+            return self.keyevent("KEYCODE_CTRL_A", "KEYCODE_DEL")
+        if not current_text:
+            return True
+        return self.keyevent("KEYCODE_MOVE_END", *["KEYCODE_DEL"] * len(current_text))
+
+    def read_field_text(self, field):
+        """Testo del campo rileggendo la gerarchia (il nodo si ritrova per element_id);
+        None se il campo non è più sulla schermata o non è leggibile (password)"""
+        if not field or field.get('password') or not field.get('element_id'):
+            return None
+        try:
+            new_data = self.capture_screen("post_fill")
+        except Exception as e:
+            print_warning(f"Verifica del testo non riuscita: {e}")
+            return None
+        elem = element_by_id(new_data, field['element_id']) if new_data else None
+        return elem.get('text', '') if elem is not None and elem.get('editable') else None
+
+    def enter_text(self, x, y, value, target, field=None):
+        """Scrive value nel campo in (x, y): cancella esattamente il testo presente (letto dalla
+        gerarchia), digita, verifica rileggendo il campo e chiude la tastiera solo se è visibile.
+        field: elemento JSON del campo (testo attuale ed element_id per la verifica)."""
+        print_info(f"Focusing campo ({x}, {y}) - campo '{target}'")
+        self.session.tap(x, y)
+        self.settle.wait(fallback=1)
+
+        current_text = field.get('text', '') if field else None
+        for attempt in range(TEXT_ENTRY_ATTEMPTS):
+            self.delete_text(current_text)
+            if not self.session.text(value):
+                # 'input text' fallito: il contenuto del campo non è noto, si ricancella tutto
+                print_warning(f"Digitazione nel campo '{target}' non riuscita"
+                              + (": nuovo tentativo" if attempt + 1 < TEXT_ENTRY_ATTEMPTS else ""))
+                current_text = None
+                continue
+            observed = self.read_field_text(field)
+            if observed is None or _same_text(observed, value):
+                break
+            print_warning(f"Il campo '{target}' contiene '{observed}' invece di '{value}'"
+                          + (": nuovo tentativo" if attempt + 1 < TEXT_ENTRY_ATTEMPTS else ""))
+            current_text = observed
+        else:
+            print_error(f"Testo non inserito correttamente nel campo '{target}'")
+            return False
+
+        self._finish_text_entry(target)
+        print_success("Testo inserito" + (" e verificato" if observed is not None else ""))
+        return True
+
+    def adb_scroll(self, direction, steps=3):
+        swipes = {
+            "up": ("Scroll verso l'alto", (500, 800, 500, 400)),
+            "down": ("Scroll verso il basso", (500, 400, 500, 800)),
+            "left": ("Scroll verso sinistra", (800, 500, 400, 500)),
+            "right": ("Scroll verso destra", (400, 500, 800, 500)),
+        }
+        if direction not in swipes:
+            print_error(f"Direzione non valida: {direction} (usa: up, down, left, right)")
+            return False
+
+        label, coords = swipes[direction]
+        print_info(f"{label} ({steps} steps)")
+        for _ in range(steps):
+            self.session.swipe(*coords, 300)
+            self.settle.wait(fallback=0.5)
+
+        print_success("Scroll completato")
+        return True
+
+    def adb_back(self):
+        print_info("Premendo tasto Indietro")
+        self.keyevent("KEYCODE_BACK")
+        print_success("Tasto Indietro premuto")
+        self.settle.wait(fallback=1)
+        return True
+
+    # Ricerca elementi nel JSON
+    def find_button(self, data, target):
+        """Cerca pulsante per testo libero (etichetta, testo, content_desc o resource_id) nell'indice
+        degli elementi: il candidato con il punteggio più alto"""
+        for elem in find_elements(data, target, editable=False):
+            if elem.get('bounds'):
+                return elem['bounds']['x'], elem['bounds']['y']
+        return None
+
+    def find_field_element(self, data, target_field, element_id=None):
+        """Cerca il campo: per element_id (opzione del prompt), poi per chiave esatta o parole intere
+        nell'indice, infine con il mapping dei resource_id noti. Restituisce l'elemento JSON o None."""
+        elem = element_by_id(data, element_id) if element_id else None
+        if elem is not None and elem.get('editable') and elem.get('bounds'):
+            return elem
+
+        # Solo chiave esatta o parole intere: un trigramma in comune ("Nome" in "Cognome") porterebbe
+        # a compilare il campo sbagliato; senza corrispondenze si passa al mapping dei resource_id
+        candidates = [e for e in find_elements(data, target_field, editable=True, fuzzy=False) if e.get('bounds')]
+        # Preferisci campi di dimensioni ragionevoli, poi qualsiasi corrispondenza
+        for elem in sorted(candidates, key=lambda e: not _size_ok(e['bounds'], 50, 20)):
+            return elem
+
+        for elem in data['elements'] if target_field in FIELD_MAPPING else []:
+            resource_id = elem.get('resource_id', '')
+            if elem.get('editable') and any(pattern in resource_id for pattern in FIELD_MAPPING[target_field]) \
+                    and _size_ok(elem.get('bounds', {}), 50, 20):
+                return elem
+        return None
+
+    def find_field(self, data, target_field, element_id=None):
+        """Coordinate (centrali, già nel JSON) del campo, vedi find_field_element"""
+        elem = self.find_field_element(data, target_field, element_id)
+        return (elem['bounds']['x'], elem['bounds']['y']) if elem is not None else None
+
+    def find_activation_button(self, data, target):
+        """Cerca un bottone clickable con il nome del target per attivare il campo"""
+        for elem in find_elements(data, target, editable=False, clickable=True):
+            if _size_ok(elem.get('bounds', {}), 20, 20):  # Bottone con dimensioni ragionevoli
+                return elem['bounds']['x'], elem['bounds']['y']
+        return None
+
+    def find_field_after_activation(self, data, target, button_coords):
+        """Riprova a cercare il campo editabile nella schermata catturata dopo l'attivazione"""
+        editables = [e for e in data['elements'] if e.get('editable')]
+
+        # Logica speciale per il telefono: dopo click, trova il campo che si è appena attivato
+        if target == 'Telefono':
+            # Strategia Samsung: il campo non si espande, ma diventa scrivibile nella stessa posizione
+            for elem in editables:
+                if 'Telefono' in elem.get('label', ''):
+                    return elem['bounds']['x'], elem['bounds']['y']
+            # Spesso su Samsung il campo input appare sotto il bottone attivatore
+            return button_coords[0], button_coords[1] + 50
+
+        # 1. Prima cerca con il nome esatto e dimensioni grandi
+        for elem in editables:
+            if target in elem.get('label', '') and _size_ok(elem.get('bounds', {}), 50, 20):
+                return elem['bounds']['x'], elem['bounds']['y']
+
+        # 2. Se non trova, cerca campi editabili con dimensioni grandi (probabilmente l'ultimo aggiunto)
+        largest_field = None
+        largest_size = 0
+        for elem in editables:
+            bounds = elem.get('bounds', {})
+            size = bounds.get('width', 0) * bounds.get('height', 0)
+            if size > largest_size and _size_ok(bounds, 100, 30):  # Campo significativo
+                largest_size = size
+                largest_field = elem
+        if largest_field:
+            return largest_field['bounds']['x'], largest_field['bounds']['y']
+
+        # 3. Come ultima risorsa, cerca per resource_id correlati al telefono
+        for elem in editables:
+            resource_id = elem.get('resource_id', '').lower()
+            if ('phone' in resource_id or 'number' in resource_id or 'edit' in resource_id) \
+                    and _size_ok(elem.get('bounds', {}), 50, 20):
+                return elem['bounds']['x'], elem['bounds']['y']
+        return None
+
+    def _finish_text_entry(self, target):
+        """Conferma l'inserimento: ENTER per le ricerche; per gli altri campi chiude la tastiera
+        solo se è visibile (un BACK a tastiera chiusa uscirebbe dal form)"""
+        if SEARCH_FIELD_PATTERN.search(target):
+            print_info("Campo di ricerca rilevato - premendo ENTER automaticamente...")
+            self.keyevent("KEYCODE_ENTER")
+            self.settle.wait(fallback=1)
+        elif self.session.keyboard_shown():
+            print_info("Campo normale compilato - nascondendo tastiera...")
+            self.keyevent("KEYCODE_BACK")
+            self.settle.wait(fallback=0.5)
+
+    def capture_screen(self, name="post_click"):
+        """Cattura una nuova schermata e la converte in JSON"""
+        new_xml, new_json = self.workspace.artifact_paths(name)
+        return self.capture.capture(new_xml, new_json, device_path="/sdcard/ui_dump_new.xml")
+
+    # Azioni di alto livello
+    def click_button(self, data, target):
+        coords = self.find_button(data, target)
+        if coords:
+            return self.adb_click(coords[0], coords[1], f"pulsante '{target}'")
+        print_error(f"Pulsante '{target}' non trovato")
+        return False
+
+    def click_element(self, data, element_id, target=""):
+        """Click sull'elemento indicato dall'opzione del prompt; se l'ID non è più nella schermata
+        si ripiega sulla ricerca per testo libero"""
+        elem = element_by_id(data, element_id)
+        if elem is None or not elem.get('bounds'):
+            print_warning(f"Elemento '{element_id}' non presente: ricerca di '{target}' per testo")
+            return self.click_button(data, target)
+        return self.adb_click(elem['bounds']['x'], elem['bounds']['y'], f"pulsante '{target}' [{element_id}]")
+
+    def choose_row(self, data, group, tried_actions=()):
+        """Riga concreta di un gruppo di elementi ripetuti: la prima mai provata, altrimenti la prima"""
+        rows = [elem for elem in group_rows(data, group) if elem.get('bounds')]
+        if not rows:
+            return None
+        return next((elem for elem in rows if f"CLICK:{button_label(elem)}" not in tried_actions), rows[0])
+
+    def click_row(self, row, group):
+        bounds = row['bounds']
+        return self.adb_click(bounds['x'], bounds['y'], f"riga '{button_label(row)}' della lista '{group}'")
+
+    def fill_field(self, data, target, value, element_id=None):
+        field = self.find_field_element(data, target, element_id)
+        if field is not None:
+            return self.enter_text(field['bounds']['x'], field['bounds']['y'], value, target, field)
+
+        print_warning(f"Campo editabile '{target}' non trovato o troppo piccolo")
+        print_info(f"Tentativo di attivare il campo cliccando sul bottone '{target}'...")
+
+        button_coords = self.find_activation_button(data, target)
+        if not button_coords:
+            print_error(f"Bottone '{target}' non trovato per attivare il campo")
+            return False
+
+        btn_x, btn_y = button_coords
+        print_info(f"Cliccando bottone '{target}' su ({btn_x}, {btn_y})...")
+        self.session.tap(btn_x, btn_y)
+        self.settle.wait(fallback=2)  # Attendi che appaia il campo
+
+        print_info("Catturando nuova schermata dopo attivazione...")
+        try:
+            new_data = self.capture_screen()
+        except Exception as e:
+            print_error(f"Errore nella cattura dopo attivazione: {e}")
+            return False
+
+        print_info("Ritentando ricerca campo editabile con nuova schermata...")
+        retry_coords = self.find_field_after_activation(new_data, target, button_coords)
+        if not retry_coords:
+            print_error(f"Campo '{target}' ancora non trovato dopo attivazione")
+            return False
+
+        retry_x, retry_y = retry_coords
+        print_success(f"Campo '{target}' trovato dopo attivazione!")
+        # Il campo attivato (se è un nodo della nuova schermata) dà testo attuale e verifica
+        field = next((elem for elem in new_data['elements'] if elem.get('editable') and elem.get('bounds')
+                      and (elem['bounds']['x'], elem['bounds']['y']) == (retry_x, retry_y)), None)
+        if not self.enter_text(retry_x, retry_y, value, target, field):
+            return False
+        print_success(f"Campo '{target}' compilato con successo!")
+        return True
+
+    def list_elements(self, data):
+        print_info("Elementi disponibili:")
+        print('PULSANTI:')
+        for i, elem in enumerate([e for e in data['elements'] if not e['editable']], 1):
+            text = elem['text'] if elem['text'] else '(senza testo)'
+            resource = elem['resource_id'].split(':')[-1] if elem['resource_id'] else 'no-id'
+            print(f'  {i}. "{text}" - {resource}')
+        print('\nCAMPI DI TESTO:')
+        for i, elem in enumerate([e for e in data['elements'] if e['editable']], 1):
+            resource = elem['resource_id'].split(':')[-1] if elem['resource_id'] else 'no-id'
+            print(f'  {i}. "{elem["label"]}" - {resource}')
+        return True
+
+    def automate_from_json(self, data, action, target="", value=""):
+        """Esegue un'azione (click_button, fill_field, list_elements) sui dati JSON"""
+        if action == "click_button":
+            return self.click_button(data, target)
+        if action == "fill_field":
+            return self.fill_field(data, target, value)
+        if action == "list_elements":
+            return self.list_elements(data)
+
+        print_error(f"Azione non valida: {action}")
+        print("Azioni disponibili:")
+        print("  click_button <nome/id>     - Clicca su un pulsante")
+        print("  fill_field <nome/id> <testo> - Riempie un campo")
+        print("  list_elements              - Lista tutti gli elementi")
+        return False
+
+
+def show_examples():
+    print(f"{BLUE}ESEMPI:{NC}")
+    print("")
+    print("./adb_automator.sh data.json list_elements")
+    print("./adb_automator.sh data.json click_button Salva")
+    print("./adb_automator.sh data.json fill_field Nome 'Mario Rossi'")
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(f"{YELLOW}LogiDroid Automator{NC}")
+        print("Automazione Android via ADB")
+        print("")
+        print("Uso: ./adb_automator.sh <json_file> <action> [target] [value]")
+        print("")
+        show_examples()
+        sys.exit(1)
+
+    json_file, action = sys.argv[1], sys.argv[2]
+    target = sys.argv[3] if len(sys.argv) > 3 else ""
+    value = sys.argv[4] if len(sys.argv) > 4 else ""
+
+    if not os.path.exists(json_file):
+        print_error(f"File JSON non trovato: {json_file}")
+        sys.exit(1)
+
+    # Verifica connessione ADB
+    if not list_devices():
+        print_error("Nessun dispositivo Android connesso via ADB")
+        sys.exit(1)
+
+    print_success("Dispositivo Android connesso")
+
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    executor = ActionExecutor()
+    sys.exit(0 if executor.automate_from_json(data, action, target, value) else 1)
+
+
+if __name__ == "__main__":
+    main()
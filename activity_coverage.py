@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Activity Coverage
+Stato della coverage delle Activity mantenuto in memoria per tutta la sessione.
+I file in test/coverage/ restano aggiornati per compatibilità con gli script esistenti.
+"""
+
+import os
+import re
+import sys
+import threading
+
+from adb_session import get_session
+from apk_manifest import (ManifestCache, ManifestError, file_sha256, installed_version, launchable_activities,
+                          read_manifest)
+from workspace import default_workspace
+
+COVERAGE_DIR = "test/coverage"
+ALL_ACTIVITIES_FILE = f"{COVERAGE_DIR}/all_activities.txt"
+EXPLORED_ACTIVITIES_FILE = f"{COVERAGE_DIR}/explored_activities.txt"
+PACKAGE_FILE = f"{COVERAGE_DIR}/current_package.txt"
+APK_FILE = f"{COVERAGE_DIR}/app.apk"
+
+ACTIVITY_PATTERN = re.compile(r'[a-zA-Z0-9_.]+/[a-zA-Z0-9_.$]+')
+
+# Activity in primo piano e finestra con il focus in un solo round-trip (solo le righe utili)
+ACTIVITY_PROBE = ("dumpsys activity activities | grep -E 'mResumedActivity|mFocusedActivity'; "
+                  "dumpsys window | grep -E 'mCurrentFocus'")
+
+
+def probe_activity(session):
+    """Interroga il dispositivo una sola volta; restituisce (resumed_activity, focused_window, righe grezze)"""
+    output, _ = session.shell(ACTIVITY_PROBE, retry=True)
+    resumed, focused = "", ""
+    for line in output.splitlines():
+        match = ACTIVITY_PATTERN.search(line)
+        if not match:
+            continue
+        if ('mResumedActivity' in line or 'mFocusedActivity' in line) and not resumed:
+            resumed = match.group(0)
+        elif 'mCurrentFocus' in line and not focused:
+            focused = match.group(0)
+    return resumed, focused, output
+
+
+def _read_lines(file_path):
+    try:
+        if os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+    except Exception:
+        pass
+    return []
+
+
+class ActivityCoverage:
+    """Tiene in memoria package target, Activity totali ed Activity esplorate"""
+
+    def __init__(self, session=None, workspace=None, shared_file=None, config=None):
+        self.session = session or get_session()
+        self.workspace = workspace or default_workspace()
+        # Manifest analizzati per package e build (sezione "manifest_cache" del config)
+        self.manifest_cache = ManifestCache(config)
+        # Manifest dell'app target (Activity con exported/intent-filter); None se si è usato dumpsys
+        self.manifest = None
+        # File condiviso tra più dispositivi in parallelo: Activity esplorate da tutti
+        self.shared_file = shared_file
+        self.package = ""
+        self.all_activities = []
+        self.explored = []
+        self._explored_set = set()
+        # record() è chiamato anche dal thread dell'ActivityTracker
+        self._lock = threading.Lock()
+        # RunStore dell'esecuzione: log di tutte le visite (impostato dall'orchestratore)
+        self.store = None
+        # Come è stata raggiunta ogni Activity la prima volta ("snapshot"/"logcat" navigando, "launch")
+        self.sources = {}
+        # True durante la fase di avvio diretto: ogni nuova Activity, anche vista da logcat, è "launch"
+        self.launching = False
+
+    @classmethod
+    def load(cls, session=None, workspace=None):
+        """Ricarica lo stato dai file di coverage (per uso da riga di comando)"""
+        coverage = cls(session, workspace)
+        try:
+            with open(coverage.workspace.package_file, 'r') as f:
+                coverage.package = f.read().strip()
+        except Exception:
+            pass
+        coverage.all_activities = _read_lines(coverage.workspace.all_activities_file)
+        for activity in _read_lines(coverage.workspace.explored_activities_file):
+            if activity not in coverage._explored_set:
+                coverage._explored_set.add(activity)
+                coverage.explored.append(activity)
+        return coverage
+
+    def initialize(self):
+        """Rileva l'app in primo piano ed estrae la lista completa delle Activity"""
+        print("📊 Inizializzando Activity Coverage...")
+        os.makedirs(self.workspace.coverage_dir, exist_ok=True)
+
+        # Trova app corrente
+        print("ℹ 🔍 Rilevando app corrente...")
+        focus_lines = [l for l in self.session.output("dumpsys", "window", retry=True).splitlines() if 'mCurrentFocus' in l]
+        match = ACTIVITY_PATTERN.search(focus_lines[0]) if focus_lines else None
+        if not match:
+            print("❌ Impossibile rilevare app corrente. Assicurati che un'app sia aperta.")
+            return False
+
+        self.package = match.group(0).split('/')[0]
+        print(f"✓ Package rilevato: {self.package}")
+        with open(self.workspace.package_file, 'w') as f:
+            f.write(f"{self.package}\n")
+
+        pm_lines = self.session.output("pm", "path", self.package, retry=True).splitlines()
+        apk_path = pm_lines[0].split(':', 1)[-1].strip() if pm_lines else ""
+        if not apk_path:
+            print(f"❌ Impossibile trovare APK per {self.package}")
+            return False
+
+        # Stessa build già analizzata: niente download dell'APK né dumpsys package
+        version_code, apk_sha256 = installed_version(self.session, self.package, apk_path)
+        self.manifest = self.manifest_cache.lookup(self.package, version_code, apk_sha256)
+        if self.manifest:
+            print(f"✓ Manifest in cache (versionCode {self.manifest['version_code']}): APK non riscaricato")
+        else:
+            self.manifest = self._manifest_from_apk(apk_path)
+
+        self.all_activities = launchable_activities(self.manifest) if self.manifest else []
+        if not self.all_activities:
+            # Manifest non disponibile: Activity dalla Activity Resolver Table di dumpsys package
+            print("ℹ 📋 Estraendo lista activity da Android system...")
+            self.all_activities = self._activities_from_dumpsys()
+        if not self.all_activities:
+            print(f"❌ Nessuna activity trovata per {self.package}")
+            return False
+
+        with open(self.workspace.all_activities_file, 'w', encoding='utf-8') as f:
+            for activity in self.all_activities:
+                f.write(f"{activity}\n")
+        print(f"✓ Trovate {len(self.all_activities)} activity totali")
+
+        # Inizializza file activity esplorate
+        self.explored = []
+        self._explored_set = set()
+        self.sources = {}
+        open(self.workspace.explored_activities_file, 'w').close()
+
+        print("✓ Activity Coverage inizializzato")
+        return True
+
+    def _manifest_from_apk(self, apk_path):
+        """Scarica l'APK, ne legge il manifest binario e lo salva in cache; None se non leggibile"""
+        print("ℹ 📱 Scaricando APK da device...")
+        if not self.session.pull(apk_path, self.workspace.apk_file, timeout=120):
+            print(f"⚠️ Download APK non riuscito: {apk_path}", file=sys.stderr)
+            return None
+        try:
+            manifest = read_manifest(self.workspace.apk_file)
+        except ManifestError as e:
+            print(f"⚠️ Manifest non leggibile ({e}), uso dumpsys", file=sys.stderr)
+            return None
+        if manifest["package"] != self.package:
+            print(f"⚠️ Manifest di {manifest['package']} invece di {self.package}, uso dumpsys", file=sys.stderr)
+            return None
+        print(f"✓ Manifest letto dall'APK: {len(manifest['activities'])} activity (versionCode {manifest['version_code']})")
+        self.manifest_cache.store(manifest, file_sha256(self.workspace.apk_file))
+        return manifest
+
+    def _activities_from_dumpsys(self):
+        dump = self.session.output("dumpsys", "package", self.package, retry=True)
+        package_re = re.escape(self.package)
+
+        # Activity Resolver Table
+        activities = set()
+        in_resolver_section = False
+        for line in dump.splitlines():
+            if "Activity Resolver Table:" in line:
+                in_resolver_section = True
+            elif "Receiver Resolver Table:" in line:
+                break
+            if in_resolver_section:
+                activities.update(re.findall(rf'{package_re}/[a-zA-Z0-9_.$]*', line))
+
+        # Se non trova activity, prova metodo alternativo
+        if not activities:
+            print("ℹ Metodo alternativo per activity...")
+            for line in dump.splitlines():
+                if "activity" in line.lower():
+                    for match in re.findall(rf'{package_re}[a-zA-Z0-9_./]*', line):
+                        if not any(x in match for x in ("Receiver", "Service", "Provider")):
+                            activities.add(match)
+        return sorted(activities)
+
+    def is_target_activity(self, activity):
+        """True se l'Activity appartiene all'app target e non è il launcher"""
+        if not activity or "launcher" in activity.lower():
+            return False
+        return not self.package or activity.startswith(self.package)
+
+    def record(self, activity, source="snapshot"):
+        """Registra un'Activity visitata; restituisce True se è nuova"""
+        # Nomi ricavati dal fingerprint (pkg/Screen_<hash>, pkg/UnknownScreen) non sono Activity
+        if not self.is_target_activity(activity) or activity.endswith("/UnknownScreen") or "/Screen_" in activity:
+            return False
+        if self.launching:
+            source = "launch"
+        if self.store is not None:
+            self.store.record_visit(activity, source)
+        # Se esiste già una entry Unknown, non aggiungerne altre
+        with self._lock:
+            if activity == "Unknown/UnknownActivity" and any("Unknown" in v for v in self.explored):
+                return False
+            if activity in self._explored_set:
+                return False
+            self._explored_set.add(activity)
+            self.explored.append(activity)
+            self.sources[activity] = source
+        try:
+            os.makedirs(self.workspace.coverage_dir, exist_ok=True)
+            with open(self.workspace.explored_activities_file, 'a', encoding='utf-8') as f:
+                f.write(f"{activity}\n")
+            if self.shared_file:
+                # Una sola write in append: righe brevi non si mescolano tra processi
+                with open(self.shared_file, 'a', encoding='utf-8') as f:
+                    f.write(f"{activity}\n")
+        except Exception as e:
+            print(f"⚠️ Errore nel salvataggio Activity: {e}", file=sys.stderr)
+        return True
+
+    def all_explored(self):
+        """Activity esplorate da questo dispositivo e, se condiviso, dagli altri dispositivi"""
+        if not self.shared_file:
+            return list(self.explored)
+        merged = list(self.explored)
+        seen = set(merged)
+        for activity in _read_lines(self.shared_file):
+            if activity not in seen and self.is_target_activity(activity):
+                seen.add(activity)
+                merged.append(activity)
+        return merged
+
+    def reached_by_launch(self):
+        """Activity raggiunte la prima volta con l'avvio diretto (le altre sono raggiunte navigando)"""
+        return [activity for activity in self.explored if self.sources.get(activity) == "launch"]
+
+    def percentage(self):
+        total = len(self.all_activities)
+        return (len(self.explored) * 100 / total) if total else 0.0
+
+    def progress_bar(self, width=20):
+        total = len(self.all_activities)
+        filled = (len(self.explored) * width // total) if total else 0
+        return "█" * filled + "░" * (width - filled)
+
+    def resumed_activity(self):
+        """Rileva l'Activity in primo piano (mResumedActivity, poi mCurrentFocus)"""
+        resumed, focused, _ = probe_activity(self.session)
+        return resumed or focused
+
+    def update(self, current_activity=None):
+        """Aggiorna la coverage con l'Activity corrente e stampa il progresso.
+        current_activity: Activity già rilevata (snapshot della cattura); se assente viene interrogato il device."""
+        if current_activity is None:
+            current_activity = self.resumed_activity()
+        if not current_activity:
+            return None
+
+        print(f"🔍 DEBUG Activity: '{current_activity}'", file=sys.stderr)
+        print(f"🔍 DEBUG Package:  '{self.package}'", file=sys.stderr)
+
+        if "launcher" in current_activity.lower():
+            print(f"🚫 Activity LAUNCHER bloccata: {current_activity}", file=sys.stderr)
+        elif current_activity.startswith(self.package):
+            if self.record(current_activity):
+                print(f"✓ 🆕 Nuova activity: {current_activity}")
+            else:
+                print(f"ℹ️ Activity già presente: {current_activity}", file=sys.stderr)
+        else:
+            print(f"❌ Activity esterna IGNORATA: {current_activity}", file=sys.stderr)
+
+        print(f"📊 Activity Coverage: {len(self.explored)}/{len(self.all_activities)} ({self.percentage():.1f}%)")
+        print(f"[{self.progress_bar()}] {self.percentage():.1f}%")
+        return current_activity
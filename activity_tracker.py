@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Activity Tracker
+Segue in background il buffer eventi di logcat ('logcat -b events') e registra ogni
+resume di Activity del package target (am_resume_activity / wm_resume_activity /
+wm_on_resume_called / am_on_resume_called). Al contrario del polling con dumpsys non
+perde le Activity rimaste in primo piano per poco tempo tra due campionamenti, e
+"Activity corrente" e "Activity viste" sono disponibili in tempo costante.
+
+Ogni nuova Activity viene passata al callback on_resume (ActivityCoverage.record),
+che aggiorna explored_activities.txt.
+
+Per i test: fake_adb.py restituisce FAKE_ADB_DIR/logcat.txt (log registrato da un device).
+
+Configurazione (config.json, sezione "activity_tracker"):
+    enabled - avvia il tracker durante il test (default: true)
+"""
+
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from adb_session import adb_command
+
+# Eventi di resume: il prefisso della riga dipende dal formato di logcat (-v brief, threadtime, ...)
+RESUME_EVENT = re.compile(
+    r'\b(am_resume_activity|wm_resume_activity|am_on_resume_called|wm_on_resume_called)'
+    r'\s*(?:\(\s*\d+\))?\s*:\s*\[(.*)\]')
+COMPONENT = re.compile(r'^[a-zA-Z0-9_.]+/[a-zA-Z0-9_.$]+$')
+CLASS_NAME = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_.$]*\.[a-zA-Z0-9_$]+$')
+MAX_RESTARTS = 3
+# Lo stesso resume produce più eventi (am_resume_activity + wm_on_resume_called)
+DUPLICATE_WINDOW = 1.0
+
+
+def parse_resume(line, package=None):
+    """Activity (formato package/classe) di una riga di resume del buffer eventi, None se la riga non è un resume.
+    package serve a ricostruire il componente quando l'evento riporta solo il nome della classe."""
+    match = RESUME_EVENT.search(line)
+    if not match:
+        return None
+    fields = [field.strip() for field in match.group(2).split(',')]
+
+    component = next((field for field in fields if COMPONENT.match(field)), None)
+    if component is None:
+        # wm_on_resume_called riporta solo il nome della classe: [token,com.example.MainActivity,reason]
+        class_name = next((field for field in fields if CLASS_NAME.match(field)), None)
+        if class_name is None or not package or not class_name.startswith(package + "."):
+            return None
+        component = f"{package}/{class_name[len(package):]}"
+
+    component_package, class_name = component.split('/', 1)
+    # Forma abbreviata come in dumpsys: com.example/.MainActivity
+    if class_name.startswith(component_package + "."):
+        component = f"{component_package}/{class_name[len(component_package):]}"
+    return component
+
+
+class ActivityTracker:
+    """Log ordinato dei resume di Activity letto da 'logcat -b events'"""
+
+    def __init__(self, serial=None, package=None, on_resume=None, command=None):
+        self.serial = serial
+        self.package = package
+        self.on_resume = on_resume
+        self.command = command or adb_command(serial) + ["logcat", "-b", "events", "-T", "1"]
+        self.resumes = []   # [(timestamp, activity)] del package target, in ordine di arrivo
+        self.seen = {}      # activity → numero di resume (ordine di prima comparsa)
+        self.events = 0
+        self._current = None
+        self._lock = threading.Lock()
+        self._process = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def current(self):
+        """Ultima Activity andata in primo piano, anche di altri package (None se non ancora nota)"""
+        return self._current
+
+    def is_target(self, activity):
+        return not self.package or activity.split('/', 1)[0] == self.package
+
+    def all_seen(self):
+        with self._lock:
+            return list(self.seen)
+
+    def has_seen(self, activity):
+        return activity in self.seen
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-tracker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def feed(self, line):
+        """Elabora una riga di logcat; restituisce l'Activity se la riga è un resume"""
+        activity = parse_resume(line, self.package)
+        if activity is None:
+            return None
+        now = time.time()
+        with self._lock:
+            self.events += 1
+            self._current = activity
+            if not self.is_target(activity):
+                return activity
+            if self.resumes and self.resumes[-1][1] == activity and now - self.resumes[-1][0] < DUPLICATE_WINDOW:
+                return activity
+            self.resumes.append((now, activity))
+            is_new = activity not in self.seen
+            self.seen[activity] = self.seen.get(activity, 0) + 1
+        if is_new and self.on_resume:
+            try:
+                self.on_resume(activity)
+            except Exception as e:
+                print(f"⚠️ Errore nel callback del tracker: {e}", file=sys.stderr)
+        return activity
+
+    def _run(self):
+        restarts = 0
+        while not self._stopped.is_set():
+            try:
+                self._process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                print(f"⚠️ Impossibile avviare logcat: {e}", file=sys.stderr)
+                return
+            for raw in iter(self._process.stdout.readline, b''):
+                self.feed(raw.decode('utf-8', errors='replace'))
+            status = self._process.wait()
+            # Uscita regolare (log registrato o stop richiesto): niente riavvio
+            if status == 0 or self._stopped.is_set() or restarts >= MAX_RESTARTS:
+                return
+            restarts += 1
+            print(f"⚠️ logcat terminato (codice {status}), riavvio {restarts}/{MAX_RESTARTS}...", file=sys.stderr)
+            time.sleep(1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resume_events": self.events,
+                "resumes": len(self.resumes),
+                "activities_seen": len(self.seen),
+            }
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+LogiDroid ADB Session
+Mantiene una shell 'adb shell' interattiva e persistente per ogni dispositivo (serial)
+e vi multiplexa i comandi usando marcatori di completamento, invece di avviare un
+nuovo processo adb per ogni tap o keyevent.
+
+Il binario adb può essere sostituito tramite la variabile d'ambiente LOGIDROID_ADB
+(ad esempio con fake_adb.py per eseguire il sistema senza dispositivo).
+"""
+
+import os
+import queue
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import uuid
+
+ADB_BINARY = os.environ.get("LOGIDROID_ADB", "adb")
+DEFAULT_TIMEOUT = 30
+# Tastiera visibile nell'output di 'dumpsys input_method' (il nome del campo cambia tra le versioni)
+IME_SHOWN = re.compile(r'\b(mInputShown|mIsInputViewShown|isInputViewShown)=true\b')
+
+
+class AdbError(Exception):
+    """Errore di comunicazione con la shell adb"""
+
+
+class CommandNotSent(AdbError):
+    """Il comando non è arrivato alla shell (connessione o scrittura fallita): ripeterlo è sicuro"""
+
+
+def adb_command(serial=None):
+    """Prefisso del comando adb, con -s <serial> se specificato"""
+    return [ADB_BINARY] + (["-s", serial] if serial else [])
+
+
+def list_devices():
+    """Restituisce i serial dei dispositivi connessi in stato 'device'"""
+    try:
+        result = subprocess.run([ADB_BINARY, "devices"], capture_output=True, text=True, timeout=10)
+    except Exception:
+        return []
+    serials = []
+    for line in result.stdout.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == "device":
+            serials.append(parts[0])
+    return serials
+
+
+class AdbSession:
+    """Shell adb persistente per un singolo dispositivo"""
+
+    def __init__(self, serial=None, timeout=DEFAULT_TIMEOUT):
+        self.serial = serial
+        self.timeout = timeout
+        self.commands_sent = 0
+        self.reconnects = 0
+        self._process = None
+        self._lines = None
+        self._lock = threading.Lock()
+
+    # Gestione della connessione
+    def _connect(self):
+        self._process = subprocess.Popen(
+            adb_command(self.serial) + ["shell"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+        self._lines = queue.Queue()
+        reader = threading.Thread(target=self._read_output, args=(self._process, self._lines), daemon=True)
+        reader.start()
+
+    @staticmethod
+    def _read_output(process, lines):
+        for raw in iter(process.stdout.readline, b''):
+            lines.put(raw.decode('utf-8', errors='replace'))
+        lines.put(None)  # EOF: la shell è terminata
+
+    def _is_alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+            except Exception:
+                pass
+            try:
+                self._process.terminate()
+                self._process.wait(timeout=2)
+            except Exception:
+                pass
+        self._process = None
+
+    def _execute(self, command, timeout):
+        marker = f"__LOGIDROID_DONE_{uuid.uuid4().hex}__"
+        try:
+            if not self._is_alive():
+                self._connect()
+            self._process.stdin.write(f"{command}; echo {marker}$?\n".encode('utf-8'))
+            self._process.stdin.flush()
+        except OSError as e:
+            raise CommandNotSent(f"scrittura sulla shell fallita ({e}): {command}")
+        self.commands_sent += 1
+
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                raise AdbError(f"timeout dopo {timeout}s: {command}")
+            if line is None:
+                raise AdbError(f"shell adb terminata durante: {command}")
+
+            index = line.find(marker)
+            if index >= 0:
+                if index > 0:
+                    output.append(line[:index])
+                status = line[index + len(marker):].strip()
+                return "".join(output), int(status) if status.lstrip('-').isdigit() else 1
+            output.append(line)
+
+    def shell(self, command, timeout=None, retry=False):
+        """Esegue una riga di comando nella shell persistente e restituisce (output, exit_code).
+        Se il comando non è arrivato alla shell riconnette e lo invia di nuovo. Dopo un timeout o
+        una shell terminata il comando potrebbe essere già stato eseguito: viene ripetuto solo con
+        retry=True (interrogazioni in sola lettura), mai per input, testo o avvii di Activity."""
+        timeout = timeout or self.timeout
+        with self._lock:
+            try:
+                return self._execute(command, timeout)
+            except (AdbError, OSError) as e:
+                # Output ormai disallineato rispetto ai marcatori: la shell va ricreata
+                self.close()
+                if not (retry or isinstance(e, CommandNotSent)):
+                    print(f"❌ Comando adb interrotto, non ripetuto: {e}", file=sys.stderr)
+                    return "", 255
+                print(f"⚠️ Sessione adb interrotta ({e}), riconnessione...", file=sys.stderr)
+                self.reconnects += 1
+                try:
+                    return self._execute(command, timeout)
+                except (AdbError, OSError) as retry_error:
+                    self.close()
+                    print(f"❌ Comando adb fallito: {retry_error}", file=sys.stderr)
+                    return "", 255
+
+    def run(self, *args, timeout=None, retry=False):
+        """Esegue un comando con argomenti separati (quotati per la shell remota)"""
+        return self.shell(" ".join(shlex.quote(str(a)) for a in args), timeout=timeout, retry=retry)
+
+    def output(self, *args, timeout=None, retry=False):
+        """Come run(), ma restituisce solo lo stdout"""
+        return self.run(*args, timeout=timeout, retry=retry)[0]
+
+    # API di input
+    def tap(self, x, y):
+        return self.run("input", "tap", x, y)[1] == 0
+
+    def swipe(self, x1, y1, x2, y2, duration=None):
+        args = ["input", "swipe", x1, y1, x2, y2] + ([duration] if duration is not None else [])
+        return self.run(*args)[1] == 0
+
+    def keyevent(self, *keycodes):
+        """Invia uno o più keyevent con un unico comando 'input keyevent'"""
+        return self.run("input", "keyevent", *keycodes)[1] == 0
+
+    def text(self, value):
+        """Digita il testo: gli spazi vanno codificati come %s per 'input text'"""
+        return self.run("input", "text", str(value).replace(" ", "%s"))[1] == 0
+
+    def keyboard_shown(self):
+        """True se la tastiera (IME) è visibile; il filtro avviene sul device per non trasferire
+        l'intero dump di input_method"""
+        output, _ = self.shell("dumpsys input_method | grep -E 'InputShown|InputViewShown'", retry=True)
+        return bool(IME_SHOWN.search(output))
+
+    # Comandi che non passano dalla shell interattiva
+    def exec_out(self, *args, timeout=None):
+        """Esegue 'adb exec-out' e restituisce lo stdout binario (b'' in caso di errore)"""
+        try:
+            result = subprocess.run(adb_command(self.serial) + ["exec-out", *[str(a) for a in args]],
+                                    capture_output=True, timeout=timeout or self.timeout)
+            return result.stdout
+        except Exception as e:
+            print(f"⚠️ adb exec-out fallito: {e}", file=sys.stderr)
+            return b''
+
+    def pull(self, remote, local, timeout=None):
+        try:
+            result = subprocess.run(adb_command(self.serial) + ["pull", remote, local],
+                                    capture_output=True, timeout=timeout or self.timeout)
+            return result.returncode == 0
+        except Exception as e:
+            print(f"⚠️ adb pull fallito: {e}", file=sys.stderr)
+            return False
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(serial=None):
+    """Restituisce la sessione condivisa per il serial indicato (creandola se necessario)"""
+    serial = serial or os.environ.get("ANDROID_SERIAL") or None
+    with _sessions_lock:
+        session = _sessions.get(serial)
+        if session is None:
+            session = AdbSession(serial)
+            _sessions[serial] = session
+        return session
+
+
+def close_all():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def main():
+    """CLI minimale per gli script bash: 'devices' oppure 'shell <comando>'"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ("devices", "shell"):
+        print("Utilizza: python3 adb_session.py devices | shell <comando>")
+        sys.exit(1)
+
+    if sys.argv[1] == "devices":
+        serials = list_devices()
+        for serial in serials:
+            print(serial)
+        sys.exit(0 if serials else 1)
+
+    output, status = get_session().shell(" ".join(sys.argv[2:]))
+    print(output, end="")
+    close_all()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
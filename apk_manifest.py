@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+LogiDroid APK Manifest
+Lettura del manifest binario (AXML) direttamente dall'APK, in Python puro: niente aapt,
+niente dumpsys. Dal manifest si ricavano package, versionCode/versionName e l'inventario
+delle Activity (anche quelle senza intent-filter, che la Activity Resolver Table di dumpsys
+non elenca) con flag exported/enabled e intent-filter.
+
+Il risultato è salvato in test/cache/manifests/<package>.json insieme a versionCode e SHA-256
+dell'APK: una nuova esecuzione sulla stessa build lo riconosce chiedendo al dispositivo solo
+versionCode e hash (un round-trip), senza riscaricare l'APK né analizzare dumpsys package.
+
+Configurazione (config.json, sezione "manifest_cache"):
+    enabled   - usa la cache dei manifest (default: true)
+    directory - cartella dei manifest salvati (default: test/cache/manifests)
+
+    python3 apk_manifest.py test/coverage/app.apk
+"""
+
+import hashlib
+import json
+import os
+import re
+import shlex
+import struct
+import sys
+import zipfile
+
+DEFAULT_MANIFEST_DIR = "test/cache/manifests"
+MANIFEST_ENTRY = "AndroidManifest.xml"
+
+# Tipi dei chunk AXML (frameworks/base/libs/androidfw/include/androidfw/ResourceTypes.h)
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_NAMESPACE_TYPE = 0x0100
+RES_XML_END_NAMESPACE_TYPE = 0x0101
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_END_ELEMENT_TYPE = 0x0103
+RES_XML_CDATA_TYPE = 0x0104
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+UTF8_FLAG = 0x100
+NO_ENTRY = 0xFFFFFFFF
+
+# Tipi dei valori degli attributi (Res_value)
+TYPE_REFERENCE = 0x01
+TYPE_STRING = 0x03
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+
+# Nomi degli attributi android:* per ID di risorsa: le build offuscate svuotano i nomi nella string pool
+ANDROID_ATTRIBUTES = {
+    0x01010003: "name",
+    0x0101000e: "enabled",
+    0x01010010: "exported",
+    0x01010202: "targetActivity",
+    0x0101021b: "versionCode",
+    0x0101021c: "versionName",
+}
+
+VERSION_CODE = re.compile(r'versionCode[:=](\d+)')
+SHA256_LINE = re.compile(r'(?m)^([0-9a-fA-F]{64})\b')
+
+
+class ManifestError(Exception):
+    """APK o manifest binario non leggibile"""
+
+
+def _string_pool(data, offset):
+    """Stringhe della string pool che inizia a offset (UTF-8 o UTF-16)"""
+    header_size, size = struct.unpack_from('<HI', data, offset + 2)
+    string_count, _, flags, strings_start = struct.unpack_from('<IIII', data, offset + 8)
+    utf8 = bool(flags & UTF8_FLAG)
+    offsets = struct.unpack_from(f'<{string_count}I', data, offset + header_size)
+    base = offset + strings_start
+    strings = []
+    for string_offset in offsets:
+        position = base + string_offset
+        if utf8:
+            # Lunghezza in caratteri e poi in byte, 1 o 2 byte ciascuna
+            for _ in range(2):
+                length = data[position]
+                if length & 0x80:
+                    length = ((length & 0x7F) << 8) | data[position + 1]
+                    position += 2
+                else:
+                    position += 1
+            strings.append(data[position:position + length].decode('utf-8', errors='replace'))
+        else:
+            length, = struct.unpack_from('<H', data, position)
+            position += 2
+            if length & 0x8000:
+                low, = struct.unpack_from('<H', data, position)
+                length = ((length & 0x7FFF) << 16) | low
+                position += 2
+            strings.append(data[position:position + length * 2].decode('utf-16-le', errors='replace'))
+    return strings
+
+
+def _attribute_value(strings, raw_value, data_type, value):
+    if raw_value != NO_ENTRY and raw_value < len(strings):
+        return strings[raw_value]
+    if data_type == TYPE_STRING:
+        return strings[value] if value < len(strings) else ""
+    if data_type == TYPE_INT_BOOLEAN:
+        return value != 0
+    if data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+        return value
+    if data_type == TYPE_REFERENCE:
+        return f"@0x{value:08x}"
+    return value
+
+
+def parse_axml(data):
+    """Albero del documento AXML: {"tag", "attributes": {nome: valore}, "children": [...]}"""
+    if len(data) < 8 or struct.unpack_from('<H', data, 0)[0] != RES_XML_TYPE:
+        raise ManifestError("manifest non in formato AXML")
+    strings, resource_ids = [], []
+    root = {"tag": None, "attributes": {}, "children": []}
+    stack = [root]
+    offset = struct.unpack_from('<H', data, 2)[0]
+    try:
+        while offset + 8 <= len(data):
+            chunk_type, header_size, size = struct.unpack_from('<HHI', data, offset)
+            if size < 8:
+                raise ManifestError(f"chunk non valido a offset {offset}")
+            body = offset + header_size
+            if chunk_type == RES_STRING_POOL_TYPE:
+                strings = _string_pool(data, offset)
+            elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+                resource_ids = struct.unpack_from(f'<{(size - header_size) // 4}I', data, body)
+            elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+                _, name, attribute_start, attribute_size, attribute_count = struct.unpack_from('<IIHHH', data, body)
+                attributes = {}
+                for index in range(attribute_count):
+                    position = body + attribute_start + index * attribute_size
+                    _, attr_name, raw_value, _, _, data_type, value = struct.unpack_from('<IIIHBBI', data, position)
+                    key = strings[attr_name] if attr_name < len(strings) else ""
+                    if not key and attr_name < len(resource_ids):
+                        key = ANDROID_ATTRIBUTES.get(resource_ids[attr_name], f"0x{resource_ids[attr_name]:08x}")
+                    attributes[key] = _attribute_value(strings, raw_value, data_type, value)
+                element = {"tag": strings[name], "attributes": attributes, "children": []}
+                stack[-1]["children"].append(element)
+                stack.append(element)
+            elif chunk_type == RES_XML_END_ELEMENT_TYPE:
+                if len(stack) > 1:
+                    stack.pop()
+            # Namespace e CDATA non servono per il manifest
+            offset += size
+    except (struct.error, IndexError) as e:
+        raise ManifestError(f"manifest troncato o corrotto: {e}")
+    if not root["children"]:
+        raise ManifestError("manifest senza elementi")
+    return root["children"][0]
+
+
+def full_class_name(package, name):
+    """Nome completo della classe (".Main" e "Main" sono relativi al package)"""
+    if name.startswith('.'):
+        return package + name
+    return name if '.' in name else f"{package}.{name}"
+
+
+def component_name(package, class_name):
+    """Forma breve usata da dumpsys e dal resto di LogiDroid (com.app/.MainActivity)"""
+    if class_name.startswith(package + '.'):
+        return f"{package}/{class_name[len(package):]}"
+    return f"{package}/{class_name}"
+
+
+def _intent_filter(element):
+    intent_filter = {"actions": [], "categories": [], "data": []}
+    for child in element["children"]:
+        if child["tag"] == "action":
+            intent_filter["actions"].append(child["attributes"].get("name"))
+        elif child["tag"] == "category":
+            intent_filter["categories"].append(child["attributes"].get("name"))
+        elif child["tag"] == "data":
+            intent_filter["data"].append({key: value for key, value in child["attributes"].items()
+                                          if isinstance(value, str)})
+    return intent_filter
+
+
+def manifest_info(root):
+    """Package, versione e Activity (alias compresi) del manifest già analizzato"""
+    if root["tag"] != "manifest":
+        raise ManifestError(f"elemento radice inatteso: {root['tag']}")
+    package = root["attributes"].get("package", "")
+    activities = []
+    for application in (child for child in root["children"] if child["tag"] == "application"):
+        for element in application["children"]:
+            if element["tag"] not in ("activity", "activity-alias"):
+                continue
+            attributes = element["attributes"]
+            name = full_class_name(package, str(attributes.get("name", "")))
+            intent_filters = [_intent_filter(child) for child in element["children"] if child["tag"] == "intent-filter"]
+            exported = attributes.get("exported")
+            target = attributes.get("targetActivity")
+            activities.append({
+                "name": name,
+                "component": component_name(package, name),
+                # Senza android:exported esplicito (o con un riferimento a risorsa) vale la regola
+                # storica: esportata se ha almeno un intent-filter
+                "exported": exported if isinstance(exported, bool) else bool(intent_filters),
+                "enabled": attributes.get("enabled") is not False,
+                "alias": element["tag"] == "activity-alias",
+                "target": component_name(package, full_class_name(package, target)) if target else None,
+                "intent_filters": intent_filters,
+            })
+    version_code = root["attributes"].get("versionCode")
+    return {
+        "package": package,
+        "version_code": version_code if isinstance(version_code, int) else None,
+        "version_name": root["attributes"].get("versionName"),
+        "activities": activities,
+    }
+
+
+def read_manifest(apk_path):
+    """Manifest dell'APK (vedi manifest_info); solleva ManifestError se non leggibile"""
+    try:
+        with zipfile.ZipFile(apk_path) as apk:
+            data = apk.read(MANIFEST_ENTRY)
+    except (OSError, KeyError, zipfile.BadZipFile) as e:
+        raise ManifestError(f"{apk_path}: {e}")
+    return manifest_info(parse_axml(data))
+
+
+def launchable_activities(manifest):
+    """Activity reali (non alias) abilitate, in forma breve: l'inventario per la coverage"""
+    return sorted({activity["component"] for activity in manifest.get("activities", [])
+                   if activity["enabled"] and not activity["alias"]})
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def installed_version(session, package, apk_path):
+    """(versionCode, SHA-256 dell'APK) dell'app installata, in un solo round-trip; None se non disponibili"""
+    output, _ = session.shell(f"pm list packages --show-versioncode {shlex.quote(package)} 2>/dev/null; "
+                              f"sha256sum {shlex.quote(apk_path)} 2>/dev/null", retry=True)
+    version_code = None
+    for line in output.splitlines():
+        # pm list filtra per sottostringa: serve la riga del package esatto
+        if line.strip().split()[0:1] == [f"package:{package}"]:
+            match = VERSION_CODE.search(line)
+            version_code = int(match.group(1)) if match else None
+    match = SHA256_LINE.search(output)
+    return version_code, match.group(1).lower() if match else None
+
+
+class ManifestCache:
+    """Manifest già analizzati, uno per package, validi finché versionCode e hash dell'APK non cambiano"""
+
+    def __init__(self, config=None, directory=None):
+        cache_config = (config or {}).get("manifest_cache", {})
+        self.enabled = cache_config.get("enabled", True)
+        self.directory = directory or cache_config.get("directory", DEFAULT_MANIFEST_DIR)
+
+    def _file(self, package):
+        return os.path.join(self.directory, f"{re.sub(r'[^A-Za-z0-9._-]', '_', package)}.json")
+
+    def lookup(self, package, version_code, apk_sha256):
+        """Manifest salvato per la build installata; None se manca o se la build è cambiata"""
+        if not self.enabled or (version_code is None and apk_sha256 is None):
+            return None
+        try:
+            with open(self._file(package), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if apk_sha256 is not None and stored.get("apk_sha256") != apk_sha256:
+            return None
+        if version_code is not None and stored.get("version_code") != version_code:
+            return None
+        return stored.get("manifest")
+
+    def store(self, manifest, apk_sha256):
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            cache_file = self._file(manifest["package"])
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"package": manifest["package"], "version_code": manifest["version_code"],
+                           "apk_sha256": apk_sha256, "manifest": manifest}, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, cache_file)
+        except Exception as e:
+            print(f"⚠️ Errore nel salvataggio del manifest: {e}", file=sys.stderr)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Uso: python3 apk_manifest.py <app.apk>", file=sys.stderr)
+        return 1
+    try:
+        manifest = read_manifest(sys.argv[1])
+    except ManifestError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"📦 {manifest['package']} (versionCode {manifest['version_code']}, versionName {manifest['version_name']})")
+    for activity in manifest["activities"]:
+        flags = ["exported" if activity["exported"] else "interna"]
+        if not activity["enabled"]:
+            flags.append("disabilitata")
+        if activity["alias"]:
+            flags.append(f"alias di {activity['target']}")
+        print(f"  {activity['component']} [{', '.join(flags)}]")
+        for intent_filter in activity["intent_filters"]:
+            print(f"      ↳ {', '.join(intent_filter['actions'] + intent_filter['categories'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
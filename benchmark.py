@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Benchmark
+Misura le prestazioni della conversione XML → JSON su gerarchie UI sintetiche.
+
+    python3 benchmark.py xml [--sizes 1000 10000 100000] [--repeat 3]
+    python3 benchmark.py labels [--text-nodes 100 300 1000 3000] [--repeat 3]
+
+Per ogni dimensione la gerarchia viene generata su file e l'estrazione viene eseguita
+in un processo separato, così il picco di memoria (RSS) è misurato in modo indipendente.
+Il benchmark delle etichette confronta la scansione lineare con l'indice spaziale.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from xml.sax.saxutils import quoteattr
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_TEXT_NODES = [100, 300, 1000, 3000]
+
+
+def generate_hierarchy(node_count, seed=42):
+    """
+    Genera una gerarchia UIAutomator sintetica con node_count nodi: contenitori annidati,
+    righe di lista clickable con testo nei figli, campi di testo con etichetta e catene
+    profonde (tipiche di WebView/Compose).
+    """
+    rng = random.Random(seed)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?><hierarchy rotation="0">']
+    count = 0
+
+    def node(attrs, children=None):
+        nonlocal count
+        count += 1
+        text = " ".join(f"{key}={quoteattr(str(value))}" for key, value in attrs.items())
+        if children is None:
+            parts.append(f"<node {text} />")
+        else:
+            parts.append(f"<node {text}>")
+            children()
+            parts.append("</node>")
+
+    def bounds(y, height, x=0, width=1080):
+        return f"[{x},{y}][{x + width},{y + height}]"
+
+    def block(index):
+        y = rng.randint(0, 2000)
+        kind = index % 4
+        if kind == 0:  # Riga di lista: contenitore clickable con testo nel nipote
+            node({"class": "android.widget.LinearLayout", "clickable": "true", "bounds": bounds(y, 120)},
+                 lambda: node({"class": "android.widget.FrameLayout", "bounds": bounds(y, 120)},
+                              lambda: node({"class": "android.widget.TextView", "text": f"Elemento {index}",
+                                            "bounds": bounds(y + 10, 60, 40, 600)})))
+        elif kind == 1:  # Campo di testo con etichetta sopra
+            node({"class": "android.widget.TextView", "text": f"Campo {index}", "bounds": bounds(y, 50, 40, 400)})
+            node({"class": "android.widget.EditText", "hint": "Inserisci", "resource-id": f"app:id/field_{index}",
+                  "bounds": bounds(y + 60, 120, 40, 1000)})
+        elif kind == 2:  # Pulsante con testo
+            node({"class": "android.widget.Button", "text": f"Azione {index}", "clickable": "true",
+                  "resource-id": f"app:id/button_{index}", "bounds": bounds(y, 100, 40, 300)})
+        else:  # Catena profonda di View (WebView/Compose)
+            depth = rng.randint(5, 30)
+
+            def chain(level):
+                if level == depth:
+                    node({"class": "android.view.View", "text": f"Nodo {index}", "bounds": bounds(y, 40)})
+                else:
+                    node({"class": "android.view.View", "bounds": bounds(y, 40)}, lambda: chain(level + 1))
+            chain(0)
+
+    def screen():
+        index = 0
+        while count < node_count:
+            block(index)
+            index += 1
+
+    node({"class": "android.widget.FrameLayout", "bounds": bounds(0, 2400)}, screen)
+    parts.append("</hierarchy>")
+    return "".join(parts).encode("utf-8"), count
+
+
+def peak_rss_mb():
+    # ru_maxrss è in kB su Linux, in byte su macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_xml_worker(xml_file, node_count, repeat):
+    """Eseguito nel processo figlio: estrae gli elementi e stampa le misure in JSON"""
+    import xml_to_json
+
+    baseline_rss = peak_rss_mb()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        elements, text_nodes = xml_to_json.extract_elements(xml_file)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(json.dumps({
+        "nodes": node_count,
+        "seconds": best,
+        "nodes_per_sec": node_count / best if best else 0,
+        "elements": len(elements),
+        "text_nodes": len(text_nodes),
+        "peak_rss_mb": peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+    }))
+
+
+def bench_xml(sizes, repeat):
+    print("📊 Benchmark estrazione XML → elementi (iterparse in streaming)")
+    print(f"{'Nodi':>10} {'File (MB)':>10} {'Tempo (ms)':>11} {'Nodi/s':>12} {'Elementi':>9} {'RSS picco (MB)':>15}")
+    for size in sizes:
+        data, node_count = generate_hierarchy(size)
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as f:
+            f.write(data)
+            xml_file = f.name
+        try:
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "xml-worker", xml_file, str(node_count), str(repeat)],
+                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+            if result.returncode != 0:
+                print(f"❌ Errore con {size} nodi: {result.stderr.strip()}")
+                continue
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{stats['nodes']:>10} {len(data) / (1024 * 1024):>10.1f} {stats['seconds'] * 1000:>11.1f} "
+                  f"{stats['nodes_per_sec']:>12,.0f} {stats['elements']:>9} {stats['peak_rss_mb']:>15.1f}")
+        finally:
+            os.remove(xml_file)
+
+
+def generate_label_screen(text_node_count, seed=42):
+    """Schermata a lista: per ogni riga una TextView, e ogni 3 righe un EditText o un pulsante senza testo"""
+    rng = random.Random(seed)
+    text_nodes, elements = [], []
+    for row in range(text_node_count):
+        y = row * 40 + rng.randint(0, 10)
+        x = rng.randint(100, 900)
+        text_nodes.append({'text': f"Etichetta {row}", 'bounds': {'x': x, 'y': y, 'width': 300, 'height': 40}})
+        if row % 3 == 0:
+            editable = row % 2 == 0
+            elements.append({'type': 'edit_text' if editable else 'button', 'text': '', 'hint': '',
+                             'content_desc': '', 'resource_id': f"app:id/e{row}",
+                             'bounds': {'x': x + rng.randint(-60, 60), 'y': y + 45, 'width': 600, 'height': 100},
+                             'clickable': not editable, 'editable': editable})
+    return text_nodes, elements
+
+
+def label_pass(text_nodes, elements, index=None):
+    """Ripete le ricerche fatte da xml_to_json: due per ogni EditText, una per ogni pulsante"""
+    import xml_to_json
+
+    for element in elements:
+        if element['editable']:
+            xml_to_json.find_label_for_edittext(element, text_nodes, index)
+            xml_to_json.find_label_for_edittext(element, text_nodes, index)
+        else:
+            xml_to_json.find_label_for_button(element, text_nodes, index)
+        xml_to_json.has_nearby_edittext(elements, element['bounds'], index=index)
+
+
+def bench_labels(sizes, repeat):
+    import xml_to_json
+
+    print("📊 Benchmark associazione etichette: scansione lineare vs indice spaziale")
+    print(f"{'TextView':>9} {'Elementi':>9} {'Lineare (ms)':>13} {'Indice (ms)':>12} {'Speedup':>8}")
+    for size in sizes:
+        text_nodes, elements = generate_label_screen(size)
+
+        linear, indexed = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            label_pass(text_nodes, elements)
+            linear.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            index = xml_to_json.SpatialIndex(text_nodes, elements)  # la costruzione è inclusa nel tempo
+            label_pass(text_nodes, elements, index)
+            indexed.append(time.perf_counter() - start)
+
+        linear_best, indexed_best = min(linear), min(indexed)
+        print(f"{size:>9} {len(elements):>9} {linear_best * 1000:>13.1f} {indexed_best * 1000:>12.1f} "
+              f"{linear_best / indexed_best if indexed_best else 0:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogiDroid - benchmark delle prestazioni")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    xml_parser = subparsers.add_parser("xml", help="Estrazione elementi da gerarchie XML sintetiche")
+    xml_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                            help="Numero di nodi delle gerarchie (default: 1000 10000 100000)")
+    xml_parser.add_argument("--repeat", type=int, default=3, help="Ripetizioni per dimensione (default: 3)")
+
+    labels_parser = subparsers.add_parser("labels", help="Associazione etichette su schermate con molte TextView")
+    labels_parser.add_argument("--text-nodes", type=int, nargs="+", default=DEFAULT_TEXT_NODES,
+                               help="Numero di TextView per schermata (default: 100 300 1000 3000)")
+    labels_parser.add_argument("--repeat", type=int, default=3, help="Ripetizioni per dimensione (default: 3)")
+
+    worker_parser = subparsers.add_parser("xml-worker")
+    worker_parser.add_argument("xml_file")
+    worker_parser.add_argument("nodes", type=int)
+    worker_parser.add_argument("repeat", type=int)
+
+    args = parser.parse_args()
+    if args.command == "xml":
+        bench_xml(args.sizes, args.repeat)
+    elif args.command == "labels":
+        bench_labels(args.text_nodes, args.repeat)
+    elif args.command == "xml-worker":
+        run_xml_worker(args.xml_file, args.nodes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Screen Capture
+Cattura la gerarchia UI in streaming ('adb exec-out uiautomator dump /dev/tty')
+e passa i byte direttamente al convertitore, senza scrivere /sdcard/ui_dump.xml,
+senza 'adb pull' e senza rileggere il file da disco.
+Il salvataggio degli artefatti (XML, JSON, screenshot) è opzionale e avviene
+in un thread separato, fuori dal percorso critico dell'iterazione.
+
+snapshot() esegue in parallelo le interrogazioni al dispositivo di un'iterazione
+(screenshot, gerarchia UI, Activity in primo piano e finestra con il focus) e
+restituisce un unico ScreenSnapshot: chi ne ha bisogno legge da lì invece di
+interrogare di nuovo il dispositivo, e la latenza è quella della sonda più lenta.
+
+Configurazione (config.json, sezione "capture"):
+    mode       - "stream" (default) oppure "file" (dump su device + pull, comportamento storico)
+    concurrent - esegue le sonde dello snapshot in parallelo (default: true)
+    save_xml   - salva l'XML in test/xml/ (default: true)
+    save_json  - salva il JSON in test/json/ (default: true)
+    cache_size - schermate convertite mantenute in cache (vedi screen_cache.py)
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import screen_cache
+import xml_to_json
+from activity_coverage import probe_activity
+from adb_session import AdbSession, get_session
+
+HIERARCHY_END = b"</hierarchy>"
+
+# Statistiche degli snapshot (per il report finale)
+CAPTURE_STATS = {
+    "snapshots": 0,
+    "wall_seconds": 0.0,       # tempo reale degli snapshot
+    "sequential_seconds": 0.0,  # somma delle durate delle singole sonde
+}
+
+
+def capture_stats():
+    """Tempi medi degli snapshot: reale e come se le sonde fossero eseguite in sequenza"""
+    count = CAPTURE_STATS["snapshots"]
+    return {
+        "snapshots": count,
+        "avg_ms": round(CAPTURE_STATS["wall_seconds"] * 1000 / count, 1) if count else 0,
+        "avg_sequential_ms": round(CAPTURE_STATS["sequential_seconds"] * 1000 / count, 1) if count else 0,
+    }
+
+
+class ScreenSnapshot:
+    """Stato del dispositivo in un istante: screenshot, gerarchia convertita, Activity e finestra con il focus"""
+
+    def __init__(self, xml_file, json_file, screenshot_file):
+        self.xml_file = xml_file
+        self.json_file = json_file
+        self.screenshot_file = screenshot_file
+        self.screenshot = b''
+        self.data = None
+        self.resumed_activity = ""
+        self.focused_window = ""
+        self.timings = {}
+        self.elapsed = 0.0
+
+    @property
+    def activity(self):
+        """Activity corrente: quella in primo piano, altrimenti quella della finestra con il focus"""
+        return self.resumed_activity or self.focused_window
+
+    @property
+    def package(self):
+        activity = self.activity
+        return activity.split('/')[0] if activity else ""
+
+
+class ArtifactWriter:
+    """Scrive i file di output in background, in ordine di arrivo"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            path, payload = self._queue.get()
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                if isinstance(payload, (bytes, bytearray)):
+                    with open(path, 'wb') as f:
+                        f.write(payload)
+                else:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        json.dump(payload, f, indent=2, ensure_ascii=False)
+            except Exception as e:
+                print(f"⚠️ Errore nel salvataggio di {path}: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def write_bytes(self, path, data):
+        self._ensure_thread()
+        self._queue.put((path, bytes(data)))
+
+    def write_json(self, path, data):
+        self._ensure_thread()
+        self._queue.put((path, data))
+
+    def flush(self):
+        """Attende che tutti i file in coda siano stati scritti"""
+        self._queue.join()
+
+
+_writer = ArtifactWriter()
+
+
+def get_artifact_writer():
+    return _writer
+
+
+def extract_hierarchy(raw):
+    """Isola l'XML dall'output di 'uiautomator dump /dev/tty' (che aggiunge un messaggio finale)"""
+    end = raw.rfind(HIERARCHY_END)
+    if end < 0:
+        return None
+    start = raw.find(b"<?xml")
+    if start < 0 or start > end:
+        start = raw.find(b"<hierarchy")
+    return raw[start:end + len(HIERARCHY_END)] if start >= 0 else None
+
+
+class ScreenCapture:
+    """Cattura gerarchia UI e screenshot di un dispositivo"""
+
+    def __init__(self, session=None, config=None, writer=None, cache=None):
+        capture_config = (config or {}).get("capture", {})
+        self.session = session or get_session()
+        self.mode = capture_config.get("mode", "stream")
+        self.save_xml = capture_config.get("save_xml", True)
+        self.save_json = capture_config.get("save_json", True)
+        self.concurrent = capture_config.get("concurrent", True)
+        self.writer = writer or get_artifact_writer()
+        self.cache = cache or (screen_cache.configure(config) if config else screen_cache.get_cache())
+        self._executor = None
+        self._probe_session = None
+        # ActivityTracker (logcat): se conosce l'Activity corrente la sonda dumpsys non serve
+        self.tracker = None
+
+    def hierarchy(self, device_path="/sdcard/ui_dump.xml", xml_file=None):
+        """Restituisce i byte della gerarchia UI corrente (None se la cattura fallisce)"""
+        if self.mode == "file":
+            # Comportamento storico: dump su device, pull e rilettura del file
+            self.session.run("uiautomator", "dump", device_path, retry=True)
+            if not xml_file or not self.session.pull(device_path, xml_file):
+                return None
+            with open(xml_file, 'rb') as f:
+                return f.read()
+        return extract_hierarchy(self.session.exec_out("uiautomator", "dump", "/dev/tty"))
+
+    def capture(self, xml_file, json_file, device_path="/sdcard/ui_dump.xml"):
+        """Cattura la gerarchia e la converte; restituisce i dati JSON (None se fallisce).
+        Se la schermata (fingerprint) è già stata convertita, riusa il risultato senza xml_to_json.
+        Gli artefatti XML/JSON vengono scritti in modo asincrono se abilitati."""
+        os.makedirs(os.path.dirname(xml_file), exist_ok=True)
+        xml_bytes = self.hierarchy(device_path, xml_file)
+        if xml_bytes is None:
+            return None
+
+        fingerprint = screen_cache.screen_fingerprint(xml_bytes)
+        data = self.cache.get(fingerprint)
+        if data is None:
+            data = xml_to_json.xml_to_json(xml_bytes, source_name=os.path.basename(xml_file))
+            data['fingerprint'] = fingerprint
+            self.cache.put(fingerprint, data)
+            artifact = data
+        else:
+            # Schermata già vista: aggiorna solo i metadati del file salvato
+            artifact = dict(data, source_file=os.path.basename(xml_file), timestamp=datetime.now().isoformat())
+
+        if self.save_xml and self.mode != "file":
+            self.writer.write_bytes(xml_file, xml_bytes)
+        if self.save_json:
+            self.writer.write_json(json_file, artifact)
+        return data
+
+    def screenshot(self, screenshot_file):
+        """Cattura lo screenshot e lo salva in background"""
+        png = self.session.exec_out("screencap", "-p")
+        if png:
+            self.writer.write_bytes(screenshot_file, png)
+        return png
+
+    def probe(self):
+        """(resumed_activity, focused_window) dal tracker logcat oppure con un solo comando
+        sulla shell dedicata alle sonde"""
+        if self.tracker is not None and self.tracker.current:
+            return self.tracker.current, ""
+        if self._probe_session is None:
+            # Shell separata: la sonda non attende i comandi in corso sulla sessione principale
+            self._probe_session = AdbSession(self.session.serial, self.session.timeout)
+        resumed, focused, _ = probe_activity(self._probe_session)
+        return resumed, focused
+
+    def _timed(self, snapshot, name, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            snapshot.timings[name] = time.perf_counter() - start
+
+    def snapshot(self, xml_file, json_file, screenshot_file, device_path="/sdcard/ui_dump.xml"):
+        """Screenshot, gerarchia (convertita) e Activity corrente in parallelo, in un unico ScreenSnapshot.
+        snapshot.data è None se la cattura della gerarchia fallisce."""
+        snapshot = ScreenSnapshot(xml_file, json_file, screenshot_file)
+        tasks = (
+            ("screenshot", self.screenshot, (screenshot_file,)),
+            ("hierarchy", self.capture, (xml_file, json_file, device_path)),
+            ("activity", self.probe, ()),
+        )
+        start = time.perf_counter()
+        if self.concurrent:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="capture")
+            futures = {name: self._executor.submit(self._timed, snapshot, name, function, *args)
+                       for name, function, args in tasks}
+            results = {name: future.result() for name, future in futures.items()}
+        else:
+            results = {name: self._timed(snapshot, name, function, *args) for name, function, args in tasks}
+
+        snapshot.screenshot = results["screenshot"] or b''
+        snapshot.data = results["hierarchy"]
+        snapshot.resumed_activity, snapshot.focused_window = results["activity"]
+
+        snapshot.elapsed = time.perf_counter() - start
+        CAPTURE_STATS["snapshots"] += 1
+        CAPTURE_STATS["wall_seconds"] += snapshot.elapsed
+        CAPTURE_STATS["sequential_seconds"] += sum(snapshot.timings.values())
+        return snapshot
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._probe_session is not None:
+            self._probe_session.close()
+            self._probe_session = None
@@ -37,6 +37,9 @@ if [ $# -eq 0 ]; then
     echo "  xml        - Rimuove solo i file XML"
     echo "  screenshots - Rimuove solo gli screenshot"
     echo "  prompts    - Rimuove solo la cronologia azioni"
+    echo "  cache      - Rimuove la cache delle decisioni LLM"
+    echo "  rundb      - Rimuove il database delle esecuzioni (run_state.db con -wal/-shm)"
+    echo "  devices    - Rimuove i dati dei test in parallelo (test/devices/)"
     echo "  legacy     - Rimuove file nelle cartelle legacy"
     echo ""
     echo "Uso: $0 <opzione>"
@@ -89,6 +92,38 @@ case "$1" in
             print_warning "Cartella test/prompts/ non esiste"
         fi
         ;;
+    "cache")
+        print_info "🧹 Rimuovendo cache decisioni LLM..."
+        if [ -f "test/cache/decision_cache.json" ] || ls test/devices/*/cache/decision_cache.json >/dev/null 2>&1; then
+            rm -f test/cache/decision_cache.json test/cache/decision_cache.json.tmp
+            rm -f test/devices/*/cache/decision_cache.json test/devices/*/cache/decision_cache.json.tmp
+            print_success "Cache decisioni rimossa"
+        else
+            print_warning "Cache decisioni non presente"
+        fi
+        ;;
+    "rundb")
+        print_info "🧹 Rimuovendo database delle esecuzioni..."
+        if [ -f "test/prompts/.test_in_progress" ]; then
+            print_error "Test in corso (test/prompts/.test_in_progress): database non rimosso"
+            exit 1
+        elif [ -f "test/cache/run_state.db" ]; then
+            rm -f test/cache/run_state.db test/cache/run_state.db-wal test/cache/run_state.db-shm
+            print_success "Database delle esecuzioni rimosso"
+        else
+            print_warning "Database test/cache/run_state.db non esiste"
+        fi
+        ;;
+    "devices")
+        print_info "🧹 Rimuovendo dati dei test in parallelo..."
+        if [ -d "test/devices" ]; then
+            rm -rf test/devices/
+            rm -f test/coverage/shared_explored.txt test/coverage/merged_report.json
+            print_success "Dati dei dispositivi rimossi"
+        else
+            print_warning "Cartella test/devices/ non esiste"
+        fi
+        ;;
     "legacy")
         print_info "🧹 Rimuovendo file nelle cartelle legacy..."
         
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Coverage Accelerator
+Fase di avvio diretto: prima dell'esplorazione con l'LLM le Activity esportate non ancora
+visitate vengono aperte con 'am start -n' (con azione, categoria e dati del primo
+intent-filter noto dal manifest), invece di raggiungerle un tocco alla volta attraverso
+i menu. L'orchestratore cattura ogni schermata aperta nella coverage, nel RunStore e nel
+grafo, poi riapre quella con più azioni da provare e da lì riparte l'LLM.
+
+Le Activity raggiunte in questa fase sono registrate con source "launch", così il report
+distingue quelle raggiunte navigando da quelle aperte direttamente.
+
+Configurazione (config.json, sezione "coverage_accelerator"):
+    enabled      - esegue la fase di avvio diretto (default: false)
+    max_launches - numero massimo di Activity avviate per esecuzione (default: 20)
+    min_interval - secondi minimi tra due avvii (default: 2)
+    timeout      - secondi di attesa per 'am start -W' (default: 15)
+"""
+
+import re
+import sys
+import time
+
+# 'am start' segnala i fallimenti (classe inesistente, Permission Denial, ...) nell'output, non nell'exit code
+LAUNCH_ERROR = re.compile(r'(?m)^(Error|.*Exception)|Status: (?!ok)')
+LAUNCHER_ACTION = "android.intent.action.MAIN"
+
+
+def intent_arguments(activity):
+    """Argomenti di 'am start' per l'Activity: -n e, se noto, il primo intent-filter utile
+    (azione diversa da MAIN, categorie, URI o MIME type dei dati)"""
+    args = ["-n", activity["component"]]
+    for intent_filter in activity.get("intent_filters", []):
+        actions = [action for action in intent_filter["actions"] if action and action != LAUNCHER_ACTION]
+        if not actions:
+            continue
+        args += ["-a", actions[0]]
+        for category in intent_filter["categories"]:
+            if category:
+                args += ["-c", category]
+        data = next((data for data in intent_filter["data"] if data.get("scheme") or data.get("mimeType")), None)
+        if data and data.get("scheme"):
+            args += ["-d", f"{data['scheme']}://{data.get('host', 'logidroid')}{data.get('path', '')}"]
+        if data and data.get("mimeType"):
+            args += ["-t", data["mimeType"]]
+        break
+    return args
+
+
+class CoverageAccelerator:
+    """Avvia direttamente le Activity esportate non ancora visitate, con un limite di frequenza"""
+
+    def __init__(self, session, coverage, config=None):
+        accelerator_config = (config or {}).get("coverage_accelerator", {})
+        self.session = session
+        self.coverage = coverage
+        self.enabled = accelerator_config.get("enabled", False)
+        self.max_launches = accelerator_config.get("max_launches", 20)
+        self.min_interval = accelerator_config.get("min_interval", 2)
+        self.timeout = accelerator_config.get("timeout", 15)
+        self._last_launch = None
+        self.counters = {"launches": 0, "failed_launches": 0, "new_activities": 0, "seconds": 0.0}
+
+    def candidates(self):
+        """Activity avviabili non ancora visitate: dal manifest le esportate e abilitate (alias esclusi);
+        senza manifest quelle della Activity Resolver Table, che hanno comunque un intent-filter"""
+        explored = set(self.coverage.all_explored())
+        if self.coverage.manifest:
+            activities = [activity for activity in self.coverage.manifest["activities"]
+                          if activity["exported"] and activity["enabled"] and not activity["alias"]]
+        else:
+            activities = [{"component": component} for component in self.coverage.all_activities]
+        return [activity for activity in activities if activity["component"] not in explored][:self.max_launches]
+
+    def _wait_turn(self):
+        """Limite di frequenza: almeno min_interval secondi tra due avvii"""
+        if self._last_launch is not None:
+            remaining = self.min_interval - (time.monotonic() - self._last_launch)
+            if remaining > 0:
+                time.sleep(remaining)
+        self._last_launch = time.monotonic()
+
+    def launch(self, activity):
+        """Avvia l'Activity e attende che sia disegnata; True se 'am start' non ha segnalato errori"""
+        self._wait_turn()
+        self.counters["launches"] += 1
+        output, status = self.session.run("am", "start", "-W", *intent_arguments(activity), timeout=self.timeout)
+        if status != 0 or LAUNCH_ERROR.search(output):
+            self.counters["failed_launches"] += 1
+            reason = next((line for line in output.splitlines() if LAUNCH_ERROR.search(line)), f"exit {status}")
+            print(f"⚠️ Avvio diretto non riuscito: {activity['component']} ({reason.strip()})", file=sys.stderr)
+            return False
+        return True
+
+    def stats(self):
+        seconds = self.counters["seconds"]
+        return {
+            **self.counters,
+            "seconds": round(seconds, 2),
+            "activities_per_minute": round(self.counters["new_activities"] * 60 / seconds, 2) if seconds else None,
+        }
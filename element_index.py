@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Element Index
+ID stabili per gli elementi della schermata e indice di ricerca normalizzato.
+
+Ogni elemento prodotto da xml_to_json riceve un element_id ricavato dalla struttura
+(suffisso del resource_id, oppure classe + etichetta, con "#n" per i duplicati in ordine
+di documento): la stessa schermata catturata di nuovo dà gli stessi ID, quindi un'opzione
+del prompt o un passo di un piano si esegue direttamente sull'elemento giusto.
+
+L'indice (chiave "lookup" del JSON) associa chiavi normalizzate (minuscole, senza accenti
+né punteggiatura) su etichetta, testo, content_desc e suffisso del resource_id agli ID:
+    ids     - element_id → posizione in data['elements']
+    exact   - chiave intera → ID
+    token   - singola parola → ID
+    trigram - trigramma di caratteri → ID
+Una ricerca per testo libero costa qualche accesso a dizionario per parola/trigramma del
+testo cercato, indipendentemente dal numero di elementi della schermata.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+
+MIN_MATCH_SCORE = 0.5   # punteggio minimo (0-1 per parole e trigrammi, 2 per la chiave esatta)
+TRIGRAM_WEIGHT = 0.9    # i trigrammi valgono poco meno delle parole intere
+ID_LABEL_LENGTH = 24    # caratteri dell'etichetta usati negli ID degli elementi senza resource_id
+
+
+def normalize(text):
+    """Chiave di confronto: minuscole, senza accenti, solo lettere e cifre separate da uno spazio"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+
+def resource_suffix(resource_id):
+    """Parte significativa del resource_id (com.app:id/save_button → save_button)"""
+    return (resource_id or '').split(':')[-1].split('/')[-1]
+
+
+def trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def element_keys(elem):
+    """Chiavi normalizzate dell'elemento, senza duplicati"""
+    keys = []
+    for value in (elem.get('label'), elem.get('text'), elem.get('content_desc'), resource_suffix(elem.get('resource_id'))):
+        key = normalize(value)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def assign_element_ids(elements):
+    """Assegna element_id stabili in ordine di documento"""
+    seen = defaultdict(int)
+    for elem in elements:
+        base = resource_suffix(elem.get('resource_id'))
+        if not base:
+            class_name = (elem.get('class_name') or elem.get('type') or 'view').split('.')[-1]
+            label = normalize(elem.get('label') or elem.get('text') or elem.get('content_desc'))
+            base = f"{class_name}:{label[:ID_LABEL_LENGTH].replace(' ', '_')}" if label else class_name
+        seen[base] += 1
+        elem['element_id'] = base if seen[base] == 1 else f"{base}#{seen[base]}"
+    return elements
+
+
+def build_lookup_index(elements):
+    """Indice {"ids", "exact", "token", "trigram"} degli elementi (serializzabile in JSON)"""
+    index = {"ids": {}, "exact": {}, "token": {}, "trigram": {}}
+
+    def add(kind, key, element_id):
+        bucket = index[kind].setdefault(key, [])
+        if not bucket or bucket[-1] != element_id:
+            bucket.append(element_id)
+
+    for position, elem in enumerate(elements):
+        element_id = elem['element_id']
+        index["ids"][element_id] = position
+        for key in element_keys(elem):
+            add("exact", key, element_id)
+            for token in key.split():
+                add("token", token, element_id)
+            for gram in trigrams(key):
+                add("trigram", gram, element_id)
+    return index
+
+
+def lookup_index(data):
+    """Indice della schermata; per JSON prodotti prima degli ID viene costruito e memorizzato in data"""
+    index = data.get('lookup')
+    if index is None:
+        if any('element_id' not in elem for elem in data.get('elements', [])):
+            assign_element_ids(data.get('elements', []))
+        index = data['lookup'] = build_lookup_index(data.get('elements', []))
+    return index
+
+
+def element_by_id(data, element_id):
+    """Elemento con l'element_id indicato (None se non è nella schermata)"""
+    position = lookup_index(data)["ids"].get(element_id)
+    return data['elements'][position] if position is not None else None
+
+
+def target_key(target):
+    """Testo libero normalizzato; "[id/save_btn]" (bottoni senza testo) diventa "save btn" """
+    target = (target or '').strip()
+    if target.startswith('[') and target.endswith(']'):
+        target = resource_suffix(target[1:-1])
+    return normalize(target)
+
+
+def find_elements(data, target, editable=None, clickable=None, min_score=MIN_MATCH_SCORE, fuzzy=True):
+    """Elementi che corrispondono al testo libero, dal più probabile: chiave esatta, poi quota di
+    parole in comune, poi quota di trigrammi in comune (a parità, ordine di documento).
+    editable/clickable (se non None) filtrano il tipo di elemento.
+    fuzzy=False esclude le corrispondenze solo per trigrammi ("Nome" non trova "Cognome"):
+    restano la chiave esatta e le parole intere."""
+    index = lookup_index(data)
+    key = target_key(target)
+    if not key:
+        return []
+    scores = defaultdict(float)
+    for element_id in index["exact"].get(key, ()):
+        scores[element_id] = 2.0
+    words = key.split()
+    word_hits = defaultdict(int)
+    for word in words:
+        for element_id in index["token"].get(word, ()):
+            word_hits[element_id] += 1
+    grams = trigrams(key)
+    gram_hits = defaultdict(int)
+    for gram in grams if fuzzy else ():
+        for element_id in index["trigram"].get(gram, ()):
+            gram_hits[element_id] += 1
+    for element_id in set(word_hits) | set(gram_hits):
+        score = max(word_hits[element_id] / len(words), TRIGRAM_WEIGHT * gram_hits[element_id] / len(grams))
+        scores[element_id] = max(scores[element_id], score)
+
+    positions = index["ids"]
+    ranked = sorted((element_id for element_id, score in scores.items() if score >= min_score),
+                    key=lambda element_id: (-scores[element_id], positions[element_id]))
+    elements = [data['elements'][positions[element_id]] for element_id in ranked]
+    return [elem for elem in elements
+            if (editable is None or bool(elem.get('editable')) == editable)
+            and (clickable is None or bool(elem.get('clickable')) == clickable)]
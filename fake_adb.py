@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Fake ADB
+Sostituto di 'adb' per eseguire LogiDroid senza dispositivo (LOGIDROID_ADB=./fake_adb.py).
+Ogni comando ricevuto viene registrato nel file FAKE_ADB_LOG (default FAKE_ADB_DIR/commands.log)
+e i comandi di sistema del dispositivo rispondono con le fixture presenti in FAKE_ADB_DIR:
+
+    FAKE_ADB_DIR/
+    ├── dumpsys_<argomenti>.txt   # es. dumpsys_window.txt, dumpsys_activity_activities.txt
+    ├── ui.xml                    # gerarchia restituita da 'uiautomator dump'
+    ├── screen.png                # screenshot restituito da 'screencap'
+    ├── logcat.txt                # output di 'logcat'
+    ├── logcat_status.txt         # exit code di 'logcat' (opzionale: simula la disconnessione)
+    └── <serial>/                 # fixture di un singolo dispositivo (opzionale, stessa struttura)
+
+Variabili d'ambiente: FAKE_ADB_DIR, FAKE_ADB_LOG, FAKE_ADB_SERIALS (separati da virgola),
+FAKE_ADB_DELAY (secondi di latenza simulata per dumpsys, screencap e uiautomator).
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+FIXTURES_DIR = os.environ.get("FAKE_ADB_DIR", "test/fake_adb")
+LOG_FILE = os.path.abspath(os.environ.get("FAKE_ADB_LOG") or os.path.join(FIXTURES_DIR, "commands.log"))
+SERIALS = [s for s in os.environ.get("FAKE_ADB_SERIALS", "emulator-5554").split(",") if s]
+
+# Funzioni shell che emulano i comandi del dispositivo: registrano il comando e
+# restituiscono il contenuto delle fixture, se presente.
+SHELL_PREAMBLE = r'''
+_fake_log() { echo "[$FAKE_ADB_SERIAL] $*" >> "$FAKE_ADB_LOG"; }
+_fake_cat() { [ -f "$FAKE_ADB_DIR/$1" ] && cat "$FAKE_ADB_DIR/$1"; return 0; }
+_fake_delay() { [ -n "$FAKE_ADB_DELAY" ] && sleep "$FAKE_ADB_DELAY"; return 0; }
+input() { _fake_log "input $*"; }
+am() { _fake_log "am $*"; echo "Status: ok"; }
+dumpsys() { _fake_log "dumpsys $*"; _fake_delay; f="dumpsys_$(echo "$*" | tr ' ' '_').txt"; if [ -f "$FAKE_ADB_DIR/$f" ]; then cat "$FAKE_ADB_DIR/$f"; else _fake_cat "dumpsys_$1.txt"; fi; }
+pm() { _fake_log "pm $*"; _fake_cat "pm_$1.txt"; }
+logcat() { _fake_log "logcat $*"; _fake_cat logcat.txt; [ -f "$FAKE_ADB_DIR/logcat_status.txt" ] && return "$(cat "$FAKE_ADB_DIR/logcat_status.txt")"; return 0; }
+screencap() { _fake_log "screencap $*"; _fake_delay; _fake_cat screen.png; }
+uiautomator() {
+    _fake_log "uiautomator $*"
+    _fake_delay
+    case "$2" in
+        /dev/tty|"") _fake_cat ui.xml; echo "UI hierchary dumped to: /dev/tty" ;;
+        *) mkdir -p "$FAKE_ADB_DIR/sdcard" && _fake_cat ui.xml > "$FAKE_ADB_DIR/sdcard/$(basename "$2")"; echo "UI hierchary dumped to: $2" ;;
+    esac
+}
+'''
+
+
+def fixtures_dir(serial):
+    """Cartella delle fixture del dispositivo: FAKE_ADB_DIR/<serial>/ se esiste, altrimenti FAKE_ADB_DIR"""
+    device_dir = os.path.join(FIXTURES_DIR, serial)
+    return device_dir if os.path.isdir(device_dir) else FIXTURES_DIR
+
+
+def log(message, serial):
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    with open(LOG_FILE, 'a', encoding='utf-8') as f:
+        f.write(f"[{serial}] {message}\n")
+
+
+def run_shell(serial, command=None):
+    """Esegue una shell locale con le funzioni di emulazione (interattiva se command è None)"""
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    env = dict(os.environ, FAKE_ADB_DIR=os.path.abspath(fixtures_dir(serial)), FAKE_ADB_SERIAL=serial,
+               FAKE_ADB_LOG=LOG_FILE)
+    if command is None:
+        # Shell interattiva: il preambolo viene inviato prima dei comandi letti da stdin
+        process = subprocess.Popen(["sh"], stdin=subprocess.PIPE, env=env)
+        process.stdin.write(SHELL_PREAMBLE.encode('utf-8'))
+        process.stdin.flush()
+        for line in sys.stdin.buffer:
+            process.stdin.write(line)
+            process.stdin.flush()
+        process.stdin.close()
+        return process.wait()
+    return subprocess.run(["sh", "-c", SHELL_PREAMBLE + command], env=env).returncode
+
+
+def main():
+    args = sys.argv[1:]
+    serial = SERIALS[0] if SERIALS else "emulator-5554"
+    if len(args) >= 2 and args[0] == "-s":
+        serial, args = args[1], args[2:]
+
+    if not args:
+        print("fake adb: nessun comando", file=sys.stderr)
+        return 1
+
+    command, rest = args[0], args[1:]
+    if command == "devices":
+        print("List of devices attached")
+        for device in SERIALS:
+            print(f"{device}\tdevice")
+        return 0
+
+    if command in ("shell", "exec-out"):
+        return run_shell(serial, " ".join(rest) if rest else None)
+
+    if command == "logcat":
+        return run_shell(serial, " ".join(["logcat"] + rest))
+
+    if command == "pull" and len(rest) == 2:
+        log(f"pull {rest[0]} {rest[1]}", serial)
+        device_dir = fixtures_dir(serial)
+        source = os.path.join(device_dir, "sdcard", os.path.basename(rest[0]))
+        if not os.path.exists(source):
+            source = os.path.join(device_dir, os.path.basename(rest[0]))
+        if not os.path.exists(source):
+            print(f"adb: error: remote object '{rest[0]}' does not exist", file=sys.stderr)
+            return 1
+        shutil.copyfile(source, rest[1])
+        return 0
+
+    log(" ".join(args), serial)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
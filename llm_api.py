@@ -4,15 +4,20 @@ LogiDroid LLM con Google Gemini 2.0 Flash + Random Injection
 Sistema intelligente di automazione UI Android con AI gratuita e azioni casuali
 """
 
-import requests
 import json
 import sys
-import subprocess
 import os
 import re
 import time
+import hashlib
+import random
+from collections import OrderedDict
 from datetime import datetime
 from random_injector import RandomActionInjector
+from prompt_generator import (generate_simple_prompt, load_action_history, commands_fragment, recent_history,
+                              record_api_prompt_tokens, button_label)
+from action_executor import ActionExecutor
+from llm_backends import get_backend
 
 def load_config():
     """Carica configurazione da config.json"""
@@ -34,11 +39,16 @@ def load_config():
 
 # Carica configurazione
 CONFIG = load_config()
-GEMINI_API_KEY = CONFIG.get("gemini_api_key")
-GEMINI_URL = CONFIG.get("api_url")
 
-# Verifica API key
-if not GEMINI_API_KEY or GEMINI_API_KEY == "your-google-gemini-api-key-here":
+# Backend LLM (sezione "llm" del config): Gemini, Ollama locale o server mock
+try:
+    LLM_BACKEND = get_backend(CONFIG)
+except ValueError as e:
+    print(f"❌ {e}")
+    sys.exit(1)
+
+# Verifica API key (solo per Gemini)
+if LLM_BACKEND.name == "gemini" and not LLM_BACKEND.check()[0]:
     print("❌ API Key Gemini non configurata!")
     print("🔑 Modifica config.json e inserisci la tua API key")
     print("📖 Ottieni la chiave da: https://makersuite.google.com/app/apikey")
@@ -46,155 +56,300 @@ if not GEMINI_API_KEY or GEMINI_API_KEY == "your-google-gemini-api-key-here":
 
 # File per memorizzare l'azione precedente (fallback di sicurezza)
 PREVIOUS_ACTION_FILE = "test/prompts/last_action.txt"
+HISTORY_FILE = "test/prompts/action_history.json"
 
-# Rate limiting - 15 richieste/minuto = 1 richiesta ogni 4 secondi
-RATE_LIMIT_FILE = "test/prompts/last_api_call.txt"
-RATE_LIMIT_DELAY = 4  # secondi tra chiamate
+# Cache delle decisioni LLM: stessa schermata + stesse opzioni + stessa cronologia recente → stessa risposta
+DECISION_CACHE_FILE = "test/cache/decision_cache.json"
 
-def enforce_rate_limit():
-    """Applica rate limiting per rispettare i limiti di Gemini API (15 req/min)"""
-    try:
-        if os.path.exists(RATE_LIMIT_FILE):
-            with open(RATE_LIMIT_FILE, 'r') as f:
-                last_call_time = float(f.read().strip())
-            
-            time_since_last = time.time() - last_call_time
-            if time_since_last < RATE_LIMIT_DELAY:
-                sleep_time = RATE_LIMIT_DELAY - time_since_last
-                print(f"⏳ Rate limiting: aspetto {sleep_time:.1f}s per rispettare i limiti API...")
-                time.sleep(sleep_time)
-    except:
-        pass  # Se c'è un errore, procedi senza delay
-    
-    # Salva timestamp chiamata corrente
-    try:
-        os.makedirs(os.path.dirname(RATE_LIMIT_FILE), exist_ok=True)
-        with open(RATE_LIMIT_FILE, 'w') as f:
-            f.write(str(time.time()))
-    except:
-        pass
-
-def call_gemini_api(prompt):
-    """Chiama Gemini 2.0 Flash via API REST con rate limiting"""
-    
-    # Applica rate limiting prima della chiamata
-    enforce_rate_limit()
-    
-    headers = {
-        'Content-Type': 'application/json',
-        'X-goog-api-key': GEMINI_API_KEY
-    }
-    
-    # ✨ Payload ottimizzato per Gemini 2.0
-    payload = {
-        "contents": [
-            {
-                "parts": [
-                    {
-                        "text": prompt
-                    }
-                ]
-            }
-        ],
-        "generationConfig": {
-            "maxOutputTokens": CONFIG.get("max_output_tokens", 50),
-            "temperature": CONFIG.get("temperature", 1.0),
-            "topP": CONFIG.get("top_p", 0.9),
-            "topK": CONFIG.get("top_k", 40),  # Parametro aggiuntivo per Gemini 2.0
-            "stopSequences": []  # Può essere usato per controllo più preciso
+class DecisionCache:
+    """
+    Cache persistente (LRU + TTL) delle risposte dell'LLM.
+    La chiave combina fingerprint della schermata, tabella delle opzioni e digest della
+    finestra di cronologia mostrata nel prompt. Le regole di esplorazione evitano che i
+    riusi portino a cicli: numero massimo di riusi per voce, nessun riuso se l'azione è
+    già ripetuta nella cronologia recente, una quota di chiamate forzate all'LLM, e
+    invalidazione delle decisioni che hanno prodotto un'azione fallita.
+
+    Configurazione (config.json, sezione "decision_cache"):
+        enabled             - attiva la cache (default: true)
+        max_entries         - numero massimo di decisioni memorizzate (default: 500)
+        ttl_seconds         - validità di una decisione (default: 3600)
+        max_hits_per_entry  - riusi massimi della stessa decisione (default: 3)
+        max_action_repeats  - non riusare se l'azione compare già N volte nella cronologia recente (default: 2)
+        exploration_rate    - probabilità di interrogare comunque l'LLM (default: 0.1)
+        save_every          - riscrive il file ogni N modifiche; il resto con flush() a fine esecuzione (default: 20)
+    """
+
+    def __init__(self, config=None, cache_file=DECISION_CACHE_FILE):
+        cache_config = (config or {}).get("decision_cache", {})
+        self.enabled = cache_config.get("enabled", True)
+        self.max_entries = cache_config.get("max_entries", 500)
+        self.ttl_seconds = cache_config.get("ttl_seconds", 3600)
+        self.max_hits_per_entry = cache_config.get("max_hits_per_entry", 3)
+        self.max_action_repeats = cache_config.get("max_action_repeats", 2)
+        self.exploration_rate = cache_config.get("exploration_rate", 0.1)
+        self.save_every = cache_config.get("save_every", 20)
+        self.cache_file = cache_file
+        self._unsaved = 0
+        self.stats_counters = {"lookups": 0, "hits": 0, "misses": 0, "bypassed": 0, "invalidated": 0, "api_calls": 0}
+        self._entries = OrderedDict()
+        if self.enabled:
+            self._load()
+
+    @staticmethod
+    def make_key(data, history, is_first_iteration=False):
+        """Chiave: fingerprint schermata + tabella opzioni + digest della cronologia recente"""
+        window = [(entry.get('action'), entry.get('success', True)) for entry in recent_history(history, is_first_iteration)]
+        payload = json.dumps([data.get('fingerprint', ''), commands_fragment(data), window], ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+                now = time.time()
+                for key, entry in entries.items():
+                    if now - entry.get("created", 0) < self.ttl_seconds:
+                        self._entries[key] = entry
+        except Exception as e:
+            print(f"⚠️ Cache decisioni non leggibile, riparto da vuota: {e}", file=sys.stderr)
+            self._entries = OrderedDict()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = f"{self.cache_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(temp_file, self.cache_file)
+            self._unsaved = 0
+        except Exception as e:
+            print(f"⚠️ Errore nel salvataggio cache decisioni: {e}", file=sys.stderr)
+
+    def _changed(self):
+        """Conta una modifica; il file intero viene riscritto solo ogni save_every modifiche"""
+        self._unsaved += 1
+        if self.save_every and self._unsaved >= self.save_every:
+            self._save()
+
+    def flush(self):
+        """Salva le modifiche non ancora scritte (a fine esecuzione)"""
+        if self.enabled and self._unsaved:
+            self._save()
+
+    def lookup(self, key, history):
+        """Restituisce la risposta memorizzata se riusabile secondo le regole di esplorazione, altrimenti None"""
+        if not self.enabled:
+            return None
+        self.stats_counters["lookups"] += 1
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry["created"] >= self.ttl_seconds:
+            if entry is not None:
+                del self._entries[key]
+            self.stats_counters["misses"] += 1
+            return None
+        
+        # Regole di esplorazione: evita che la cache riproponga sempre la stessa azione
+        recent_actions = [h.get('action') for h in history[-10:]]
+        if (entry["hits"] >= self.max_hits_per_entry
+                or recent_actions.count(entry.get("action")) >= self.max_action_repeats
+                or random.random() < self.exploration_rate):
+            self.stats_counters["bypassed"] += 1
+            return None
+        
+        entry["hits"] += 1
+        self._entries.move_to_end(key)
+        self.stats_counters["hits"] += 1
+        # Solo contatore e ordine LRU: salvati col prossimo flush, nessuna riscrittura per un hit
+        self._unsaved += 1
+        return entry["response"]
+
+    def store(self, key, response):
+        if not self.enabled:
+            return
+        self._entries[key] = {"response": response, "action": None, "created": time.time(), "hits": 0}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._changed()
+
+    def record_outcome(self, key, action, success):
+        """Associa l'azione eseguita alla decisione; le decisioni fallite non vengono riusate"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        if success:
+            entry["action"] = action
+        else:
+            del self._entries[key]
+            self.stats_counters["invalidated"] += 1
+        self._changed()
+
+    def stats(self):
+        counters = dict(self.stats_counters)
+        counters["api_calls_saved"] = counters["hits"]
+        counters["hit_rate"] = round(counters["hits"] * 100 / counters["lookups"], 1) if counters["lookups"] else 0
+        counters["entries"] = len(self._entries)
+        return counters
+
+_decision_cache = None
+
+def get_decision_cache(cache_file=DECISION_CACHE_FILE):
+    """Cache delle decisioni condivisa dal processo (caricata al primo uso da cache_file)"""
+    global _decision_cache
+    if _decision_cache is None:
+        _decision_cache = DecisionCache(CONFIG, cache_file)
+    return _decision_cache
+
+def response_schema(options, plan_steps=1):
+    """JSON schema della risposta vincolata: un codice tra quelli mostrati (più il testo per i campi),
+    oppure per i piani {"steps": [...]} con al massimo plan_steps passi"""
+    step = {
+        "type": "object",
+        "properties": {
+            "option": {"type": "string", "enum": list(options)},
+            "text": {"type": "string"},
         },
-        "safetySettings": [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH", 
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_NONE"
-            }
-        ]
+        "required": ["option"],
     }
-    
-    # ✨ AGGIUNGI SYSTEM INSTRUCTION SE PRESENTE NEL CONFIG
-    if "system_instruction" in CONFIG:
-        payload["systemInstruction"] = CONFIG["system_instruction"]
-    
+    if plan_steps <= 1:
+        return step
+    return {
+        "type": "object",
+        "properties": {"steps": {"type": "array", "items": step, "minItems": 1, "maxItems": plan_steps}},
+        "required": ["steps"],
+    }
+
+def call_llm(prompt, options, plan_steps=1):
+    """Chiama il backend LLM configurato (Gemini, Ollama o mock) con pool di connessioni keep-alive.
+    Le risposte 429/503 vengono ritentate secondo la politica del backend (per Gemini rispettando Retry-After).
+    Con llm.structured_output (default) la risposta è JSON vincolato ai codici delle opzioni
+    (responseSchema per Gemini, format per Ollama).
+    In streaming la risposta si ferma appena contiene un'opzione valida del prompt; con l'hedging
+    (llm.hedging) un backend secondario riceve lo stesso prompt se il principale tarda."""
+    schema = response_schema(options, plan_steps) if CONFIG.get("llm", {}).get("structured_output", True) else None
+    response = LLM_BACKEND.generate(prompt, accept=lambda text: early_decision(text, options, plan_steps),
+                                    schema=schema)
+    record_api_prompt_tokens(LLM_BACKEND.last_usage.get("prompt_tokens"))
+    return response
+
+# Separatori che chiudono un codice di risposta ("B.", "B " o "B)" non possono più diventare "BA")
+CODE_DELIMITERS = ' .,;)"\'*'
+# Codice già chiuso in una risposta JSON parziale: {"option": "B"
+JSON_OPTION = re.compile(r'"option"\s*:\s*"([A-Z]{1,3})"')
+
+def clean_answer(line):
+    """Riga di risposta senza premesse comuni (Scelgo:, Risposta:), virgolette e grassetto markdown"""
+    line = line.strip().strip('"\'*` ')
+    return re.sub(r'^(scelgo|risposta|comando)\s*:?\s*', '', line, flags=re.IGNORECASE).strip('"\'*` ')
+
+def resolve_option(code, text, options):
+    """Comando dell'opzione scelta (ricerca nella tabella delle opzioni), None se il codice non esiste"""
+    option = options.get(str(code or "").strip().upper())
+    if option is None:
+        return None
+    text = str(text or "").strip()
+    if option["needs_text"] and text:
+        return f"{option['command']}:{text}"
+    return option["command"]
+
+def extract_command_from_letter(response, options):
+    """Estrae comando dalla risposta testuale dell'LLM (codice o codice:testo; codici A..Z, poi AA, AB, ...)"""
+    code, _, text = clean_answer(response).partition(':')
+    return resolve_option(code, text, options)
+
+def parse_json_answer(response):
+    """Passi [{"option", "text"}] di una risposta JSON (vincolata), None se non è JSON"""
+    body = response.strip()
+    if body.startswith("```"):
+        body = body.strip('`').removeprefix('json')
     try:
-        response = requests.post(GEMINI_URL, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        if 'candidates' in result and len(result['candidates']) > 0:
-            content = result['candidates'][0]['content']['parts'][0]['text']
-            return content.strip()
-        else:
-            print("❌ Nessuna risposta valida da Gemini")
-            return None
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Errore chiamata Gemini API: {e}")
+        answer = json.loads(body)
+    except ValueError:
         return None
-    except Exception as e:
-        print(f"❌ Errore parsing risposta Gemini: {e}")
+    if isinstance(answer, dict) and isinstance(answer.get("steps"), list):
+        return [step for step in answer["steps"] if isinstance(step, dict)]
+    if isinstance(answer, dict):
+        return [answer]
+    if isinstance(answer, list):
+        return [step for step in answer if isinstance(step, dict)]
+    return None
+
+def early_decision(text, options, plan_steps=1):
+    """Risposta già completa nel testo parziale di uno stream, None se serve altro testo.
+    JSON: completo, oppure con il codice già chiuso tra virgolette (se non attende testo).
+    Testo: una riga terminata vale se contiene una risposta valida; la riga in corso solo se il
+    codice è già chiuso (separatore, oppure nessun altro codice può iniziare così) e non attende
+    testo (FILL e piani continuano fino a fine riga)."""
+    if text.lstrip().startswith(('{', '[', '```')):
+        if extract_plan(text, options, plan_steps):
+            return text
+        code = JSON_OPTION.search(text)
+        if plan_steps == 1 and code and code.group(1) in options and not options[code.group(1)]["needs_text"]:
+            return json.dumps({"option": code.group(1)})
         return None
 
-def extract_command_from_letter(response, ui_prompt):
-    """Estrae comando dalla risposta dell'LLM (lettera o lettera:testo)"""
-    response_clean = response.strip()
-    
-    # Rimuovi spiegazioni comuni
-    response_clean = re.sub(r'^(scelgo|risposta|comando):\s*', '', response_clean, flags=re.IGNORECASE)
-    response_clean = re.sub(r'^["\']?([A-Z]:?.*?)["\']?$', r'\1', response_clean)
-    
-    # Formato personalizzato: F:Mario Rossi
-    if ':' in response_clean and len(response_clean.split(':')) == 2:
-        letter, custom_text = response_clean.split(':', 1)
-        letter = letter.strip().upper()
-        custom_text = custom_text.strip()
-        
-        # Trova il comando FILL_CUSTOM corrispondente nel prompt
-        fill_custom_pattern = rf'{letter}\.\s*FILL_CUSTOM:([^(]+)'
-        match = re.search(fill_custom_pattern, ui_prompt)
-        if match:
-            field_name = match.group(1).strip()
-            return f"FILL:{field_name}:{custom_text}"
-    
-    # Formato semplice: solo lettera
-    letter = response_clean.upper()
-    if len(letter) == 1 and letter.isalpha():
-        # Estrai il comando dal prompt usando la lettera
-        # Pattern più ampio per includere BACK e altri comandi
-        pattern = rf'{letter}\.\s*(BACK|CLICK:[^(\n]+|FILL:[^(\n]+|FILL_CUSTOM:[^(\n]+)'
-        match = re.search(pattern, ui_prompt)
-        if match:
-            command = match.group(1).strip()
-            # Se è FILL_CUSTOM, restituisci il formato corretto
-            if command.startswith('FILL_CUSTOM:'):
-                return command.replace('FILL_CUSTOM:', 'FILL:')
-            return command
-    
-    return None
+    *complete_lines, current_line = text.split('\n')
+    for line in complete_lines:
+        answer = clean_answer(line)
+        if answer and extract_plan(answer, options, plan_steps):
+            return answer
+        code = re.match(r'[A-Z]{1,3}', answer)
+        if code and answer[code.end():code.end() + 1] in ('',) + tuple(CODE_DELIMITERS) \
+                and code.group() in options and not options[code.group()]["needs_text"]:
+            return code.group()
+    if plan_steps > 1:
+        return None
+
+    answer = clean_answer(current_line)
+    code = re.match(r'[A-Z]{1,3}', answer)
+    if not code or code.group() not in options or options[code.group()]["needs_text"]:
+        return None
+    following = answer[code.end():code.end() + 1]
+    if following:
+        return code.group() if following in CODE_DELIMITERS else None
+    # Codice a fine testo: potrebbe ancora allungarsi ("A" → "AB") o essere l'inizio di "BACK"
+    if any(other != code.group() and other.startswith(code.group()) for other in options) \
+            or "BACK".startswith(code.group()):
+        return None
+    return code.group()
+
+def resolve_plan(response, options, max_steps=1):
+    """Passi [(comando, element_id)] di una risposta, al massimo max_steps: JSON vincolato
+    ({"option": "F", "text": "Mario"} o {"steps": [...]}) oppure testo a piano ("F:Mario;G:Rossi;C").
+    element_id è l'elemento dell'opzione scelta (None per BACK e liste).
+    Il piano si ferma al primo passo non riconosciuto; una risposta singola dà un solo comando."""
+    steps = parse_json_answer(response)
+    if steps is None:
+        steps = [{"option": code, "text": text}
+                 for code, _, text in (clean_answer(step).partition(':') for step in response.split(';'))
+                 if code]
+    resolved = []
+    for step in steps[:max_steps]:
+        command = resolve_option(step.get("option"), step.get("text"), options)
+        if command is None:
+            break
+        resolved.append((command, options[str(step.get("option")).strip().upper()].get("element")))
+    return resolved
+
+def extract_plan(response, options, max_steps=1):
+    """Comandi di una risposta (vedi resolve_plan), senza i riferimenti agli elementi"""
+    return [command for command, _ in resolve_plan(response, options, max_steps)]
 
-def save_last_action(action, success=True, error_message=""):
-    """Salva l'ultima azione per anti-ripetizione con stato di successo/errore"""
+def save_last_action(action, success=True, error_message="", history=None, workspace=None, store=None,
+                     fingerprint=None, activity=None):
+    """Salva l'ultima azione per anti-ripetizione con stato di successo/errore.
+    Se viene passata la cronologia in memoria, la aggiorna senza rileggere il file.
+    Con il RunStore l'azione è una riga nel database e i file vengono generati a fine test (export)."""
     try:
-        # Sistema unificato action_history.json
-        history_file = "test/prompts/action_history.json"
-        os.makedirs(os.path.dirname(history_file), exist_ok=True)
+        # Sistema unificato action_history.json (nel workspace del dispositivo, se indicato)
+        history_file = workspace.history_file if workspace else HISTORY_FILE
+        previous_action_file = workspace.last_action_file if workspace else PREVIOUS_ACTION_FILE
         
         # Carica cronologia esistente
-        history = []
-        if os.path.exists(history_file):
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
+        if history is None:
+            history = store.history() if store is not None else load_action_history(history_file)
         
         # Aggiungi la nuova azione con status
         entry = {
@@ -208,174 +363,221 @@ def save_last_action(action, success=True, error_message=""):
         
         # Mantieni solo le ultime 100 azioni (backup più ampio)
         if len(history) > 100:
-            history = history[-100:]
+            del history[:-100]
+
+        if store is not None:
+            store.record_action(action, success, entry["screen"], fingerprint, activity, entry["timestamp"])
+            return
         
         # Salva cronologia aggiornata
+        os.makedirs(os.path.dirname(history_file), exist_ok=True)
         with open(history_file, 'w', encoding='utf-8') as f:
             json.dump(history, f, indent=2, ensure_ascii=False)
             
         # Fallback di sicurezza
         status_text = "SUCCESS" if success else f"ERROR: {error_message}"
-        with open(PREVIOUS_ACTION_FILE, 'w') as f:
+        with open(previous_action_file, 'w') as f:
             f.write(f"{action} | {status_text}")
             
     except Exception as e:
         print(f"Errore nel salvare azione: {e}")
 
-def main():
-    if len(sys.argv) < 2:
-        print("Utilizza: python3 llm_api.py <json_file>")
-        return
-    
-    json_file = sys.argv[1]
-    print(f"📁 Analizzando: {json_file}")
-    
-    # 🎲 INIZIALIZZA RANDOM INJECTOR
-    random_injector = RandomActionInjector(frequency=6)  # Ogni 6 iterazioni
-    
-    # Verifica se è la prima iterazione
-    history_file = "test/prompts/action_history.json"
-    is_first_iteration = True
-    history = []
-    
-    if os.path.exists(history_file) and os.path.getsize(history_file) > 0:
-        try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-                is_first_iteration = len(history) == 0
-        except Exception as e:
-            print(f"⚠️ Error loading history: {e}")
-            is_first_iteration = True
-    
-    # 🎲 CONTROLLO RANDOM INJECTION PRIMA DELL'LLM
-    if not is_first_iteration and random_injector.should_inject_random():
-        print("🎲 " + "="*60)
-        print("🎲 RANDOM INJECTION TRIGGERED - SKIPPING LLM THIS ITERATION")
-        print("🎲 " + "="*60)
-        
-        # Esegui ciclo random completo
-        new_json_file = random_injector.full_random_cycle()
+def execute_command(command_line, data, executor, history=None, element_id=None):
+    """Esegue il comando estratto sul dispositivo (history serve a scegliere righe di liste non ancora provate).
+    element_id: elemento dell'opzione scelta, su cui si agisce direttamente; senza (comandi in testo
+    libero, percorsi ripetuti dal grafo) il target si cerca nell'indice degli elementi.
+    Restituisce (action_performed, success, error_message) oppure None se il comando non è valido."""
+    if command_line == "BACK":
+        # Comando BACK - pressione tasto back Android
+        action_performed = "BACK"
+        print(f"\n⬅️ Azione: Premere tasto BACK")
+        run = lambda: executor.keyevent("KEYCODE_BACK")
         
-        if new_json_file:
-            print(f"✅ Random injection successful!")
-            print(f"📱 New screen captured: {new_json_file}")
-            print("🔄 Next iteration will analyze the new screen with LLM")
-            
-            # IMPORTANTE: Richiama se stesso con la nuova schermata
-            print("🔄 Restarting analysis with new screen...")
-            subprocess.run(["python3", "llm_api.py", new_json_file])
-            return
+    elif command_line.startswith("CLICK:"):
+        target = command_line[6:].strip()
+        target = re.sub(r'\s*\([^)]*\)', '', target)
+        target = target.rstrip('.,!?;').strip()
+        action_performed = f"CLICK:{target}"
+        print(f"\n👆 Azione: Premere '{target}'")
+        if element_id:
+            run = lambda: executor.click_element(data, element_id, target)
         else:
-            print("❌ Random injection failed, continuing with normal flow...")
+            run = lambda: executor.click_button(data, target)
+        
+    elif command_line.startswith("CLICK_ROW:"):
+        # Riga di una lista: l'esecutore sceglie una riga concreta, preferibilmente mai provata
+        group = command_line[10:].strip()
+        tried_actions = {entry.get('action') for entry in history or []}
+        row = executor.choose_row(data, group, tried_actions)
+        if row is None:
+            print(f"❌ Lista '{group}' non trovata")
+            return None
+        target = button_label(row)
+        action_performed = f"CLICK:{target}"
+        print(f"\n👆 Azione: Premere la riga '{target}' della lista '{group}'")
+        run = lambda: executor.click_row(row, group)
+        
+    elif command_line.startswith("FILL:"):
+        parts = command_line[5:].split(":", 1)
+        if len(parts) < 2:
+            print("❌ Formato FILL non valido")
+            return None
+        target = re.sub(r'\s*\([^)]*\)', '', parts[0].strip()).strip()
+        value = parts[1].strip().rstrip('.,!?;').strip()
+        action_performed = f"FILL:{target}:{value}"
+        print(f"\n✏️ Azione: Compilare '{target}' con '{value}'")
+        run = lambda: executor.fill_field(data, target, value, element_id)
+    else:
+        print(f"❓ Comando non riconosciuto: {command_line}")
+        return None
     
-    # Continua con normale workflow LLM solo se non c'è stata random injection
+    # Esecuzione
+    print("⚡ Eseguendo...")
+    try:
+        success = bool(run())
+    except Exception as e:
+        print(f"⚠️ {e}")
+        success = False
+    error_message = "" if success else "Comando fallito o elemento non trovato"
+    return action_performed, success, error_message
+
+def run_llm_step(json_file, data, is_first_iteration, history, executor, coverage=None, decision_cache=None,
+                 workspace=None, snapshot=None, store=None, plan=None):
+    """Un passo sistematico: prompt → LLM (o cache delle decisioni) → comando → esecuzione → cronologia.
+    snapshot: ScreenSnapshot della schermata corrente (Activity già rilevata, nessuna query al device).
+    store: RunStore in cui registrare l'azione (se None si aggiornano i file della cronologia).
+    plan: lista in cui aggiungere i passi successivi [(comando, element_id)] di un piano (sezione "planning");
+    li esegue il chiamante, verificando la schermata dopo ogni passo. Se None si esegue un solo comando.
+    Restituisce l'azione eseguita, oppure None se il passo non ha prodotto un'azione."""
+    decision_cache = decision_cache or get_decision_cache()
+    planning = CONFIG.get("planning", {})
+    plan_steps = max(1, planning.get("max_steps", 4)) if plan is not None and planning.get("enabled", False) else 1
     
     # Genera prompt UI
     print("📱 Generando prompt interfaccia...")
-    cmd = ["python3", "prompt_generator.py", json_file, str(is_first_iteration).lower()]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"❌ Errore: {result.stderr}")
-        return
-    
-    ui_prompt = result.stdout
+    try:
+        ui_prompt, options = generate_simple_prompt(json_file, is_first_iteration, data=data, history=history,
+                                                    coverage=coverage, session=executor.session, snapshot=snapshot,
+                                                    token_budget=CONFIG.get("prompt", {}).get("token_budget"),
+                                                    plan_steps=plan_steps, with_options=True)
+    except Exception as e:
+        print(f"❌ Errore: {e}")
+        return None
     
     print("=" * 60)
-    print("🧠 DOMANDA A GEMINI 2.0 FLASH:")
+    print(f"🧠 DOMANDA A {LLM_BACKEND.label.upper()}:")
     print("=" * 60)
     print(ui_prompt)
     print("=" * 60)
     
-    # Chiamata a Gemini 2.0 Flash
-    print("🤖 Gemini sta analizzando...")
-    llm_response = call_gemini_api(ui_prompt)
+    # Stessa schermata con la stessa cronologia recente: riusa la decisione già presa
+    cache_key = DecisionCache.make_key(data, history, is_first_iteration)
+    llm_response = decision_cache.lookup(cache_key, history)
+    from_cache = llm_response is not None
+    
+    if from_cache:
+        print(f"♻️ Decisione riusata dalla cache (chiamata a {LLM_BACKEND.label} evitata)")
+    else:
+        # Chiamata al backend LLM configurato
+        print(f"🤖 {LLM_BACKEND.label} sta analizzando...")
+        decision_cache.stats_counters["api_calls"] += 1
+        llm_response = call_llm(ui_prompt, options, plan_steps)
+        if LLM_BACKEND.last_decision_seconds is not None:
+            # Tempo dalla richiesta alla prima decisione utilizzabile (in streaming, prima della fine)
+            print(f"⏱️ Decisione in {LLM_BACKEND.last_decision_seconds * 1000:.0f}ms")
+            if store is not None:
+                store.record_timing("llm_decision", LLM_BACKEND.last_decision_seconds)
     
     if not llm_response:
-        print("❌ Nessuna risposta da Gemini")
-        return
+        print(f"❌ Nessuna risposta da {LLM_BACKEND.label}")
+        return None
     
     print("=" * 60)
-    print("💭 DECISIONE GEMINI:")
+    print(f"💭 DECISIONE {LLM_BACKEND.label.upper()}:")
     print("=" * 60)
     print(llm_response)
     print("=" * 60)
     
-    # Estrai comando dalla risposta a lettera
-    command_line = extract_command_from_letter(llm_response, ui_prompt)
+    # Risolvi il comando (o il piano di comandi) nella tabella delle opzioni mostrate
+    steps = resolve_plan(llm_response, options, plan_steps)
+    commands = [command for command, _ in steps]
     
-    if not command_line:
+    if not commands:
         print(f"❓ Formato non riconosciuto: {llm_response}")
         print("ℹ️ Atteso: lettera (A) o lettera:testo (F:Mario)")
-        return
+        return None
     
+    command_line = commands[0]
     print(f"🎯 Comando estratto: {command_line}")
-    
-    # Processa ed esegui comando
-    if command_line == "BACK":
-        # Comando BACK - pressione tasto back Android
-        command = "adb shell input keyevent KEYCODE_BACK"
-        action_performed = "BACK"
-        
-        print(f"\n⬅️ Azione: Premere tasto BACK")
-        print(f"🔧 Comando: {command}")
-        
-    elif command_line.startswith("CLICK:"):
-        target = command_line[6:].strip()
-        target = re.sub(r'\s*\([^)]*\)', '', target)
-        target = target.rstrip('.,!?;').strip()
-        
-        command = f"./adb_automator.sh {json_file} click_button '{target}'"
-        action_performed = f"CLICK:{target}"
-        
-        print(f"\n👆 Azione: Premere '{target}'")
-        print(f"🔧 Comando: {command}")
-        
-    elif command_line.startswith("FILL:"):
-        parts = command_line[5:].split(":", 1)
-        if len(parts) >= 2:
-            target = parts[0].strip()
-            value = parts[1].strip()
-            target = re.sub(r'\s*\([^)]*\)', '', target).strip()
-            value = value.rstrip('.,!?;').strip()
-            
-            command = f"./adb_automator.sh {json_file} fill_field '{target}' '{value}'"
-            action_performed = f"FILL:{target}:{value}"
-            
-            print(f"\n✏️ Azione: Compilare '{target}' con '{value}'")
-            print(f"🔧 Comando: {command}")
-        else:
-            print("❌ Formato FILL non valido")
-            return
-    else:
-        print(f"❓ Comando non riconosciuto: {command_line}")
-        return
-    
-    # Esecuzione
-    print("⚡ Eseguendo...")
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-    print(result.stdout)
-    if result.stderr:
-        print(f"⚠️ {result.stderr}")
-    
-    # Controllo del successo dell'operazione
-    success = result.returncode == 0
-    error_message = ""
-    
-    # Controlla se ci sono messaggi di errore specifici nell'output
-    output_text = result.stdout + result.stderr
-    if not success or "non trovato" in output_text.lower() or "errore" in output_text.lower():
-        success = False
-        error_message = "Comando fallito o elemento non trovato"
+    if len(commands) > 1:
+        print(f"🧩 Piano di {len(commands)} passi: {' → '.join(commands)}")
+        plan.extend(steps[1:])
+    if not from_cache:
+        decision_cache.store(cache_key, llm_response)
+    
+    outcome = execute_command(command_line, data, executor, history, element_id=steps[0][1])
+    if outcome is None:
+        return None
+    action_performed, success, error_message = outcome
+    decision_cache.record_outcome(cache_key, action_performed, success)
     
     # Salva azione per cronologia CON stato di successo/errore
-    save_last_action(action_performed, success, error_message)
+    save_last_action(action_performed, success, error_message, history, workspace, store,
+                     fingerprint=data.get('fingerprint'), activity=snapshot.activity if snapshot else None)
     
     if not success:
         print(f"❌ Azione fallita: {action_performed}")
         print(f"🚫 Motivo: {error_message}")
     else:
         print(f"✅ Azione completata: {action_performed}")
+    return action_performed
+
+def run_random_injection(random_injector, history):
+    """Esegue il ciclo random e restituisce lo ScreenSnapshot della nuova schermata, o None"""
+    print("🎲 " + "="*60)
+    print("🎲 RANDOM INJECTION TRIGGERED - SKIPPING LLM THIS ITERATION")
+    print("🎲 " + "="*60)
+    
+    # Esegui ciclo random completo
+    snapshot = random_injector.full_random_cycle(history)
+    
+    if not snapshot:
+        print("❌ Random injection failed, continuing with normal flow...")
+        return None
+    
+    print(f"✅ Random injection successful!")
+    print(f"📱 New screen captured: {snapshot.json_file}")
+    print("🔄 Restarting analysis with new screen...")
+    return snapshot
+
+def main():
+    if len(sys.argv) < 2:
+        print("Utilizza: python3 llm_api.py <json_file>")
+        return
+    
+    json_file = sys.argv[1]
+    print(f"📁 Analizzando: {json_file}")
+    
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    # 🎲 INIZIALIZZA RANDOM INJECTOR
+    random_injector = RandomActionInjector(frequency=6)  # Ogni 6 iterazioni
+    
+    # Verifica se è la prima iterazione
+    history = load_action_history(HISTORY_FILE)
+    is_first_iteration = len(history) == 0
+    
+    # 🎲 CONTROLLO RANDOM INJECTION PRIMA DELL'LLM
+    snapshot = None
+    if not is_first_iteration and random_injector.should_inject_random():
+        snapshot = run_random_injection(random_injector, history)
+        if snapshot:
+            # Analizza la nuova schermata nello stesso processo
+            json_file, data = snapshot.json_file, snapshot.data
+    
+    run_llm_step(json_file, data, is_first_iteration, history, ActionExecutor(), snapshot=snapshot)
+    get_decision_cache().flush()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+"""
+LogiDroid LLM Backends
+Interfaccia comune verso i modelli che scelgono le azioni:
+
+- gemini: Google Gemini via API REST (generateContent), con rate limiting per API key;
+- ollama: modello locale servito da Ollama (/api/generate), senza limite di richieste al minuto;
+- mock:   server finto del repository (mock_llm_server.py, protocollo Ollama), per misurare
+          l'intero ciclo offline.
+
+Ogni backend usa una requests.Session con un pool di connessioni keep-alive (niente nuovo
+handshake TCP/TLS a ogni chiamata) e ha una propria politica di timeout e tentativi.
+
+Configurazione (config.json, sezione "llm"):
+    backend - "gemini", "ollama" o "mock" (default: gemini)
+    structured_output - risposta JSON vincolata ai codici delle opzioni mostrate (Gemini
+                        responseSchema, Ollama format con JSON schema, da Ollama 0.5) (default: true)
+    gemini / ollama / mock - impostazioni del singolo backend:
+        url         - endpoint (gemini: api_url; ollama: http://localhost:11434; mock: http://127.0.0.1:8765)
+        model       - modello (ollama, mock)
+        timeout     - secondi per richiesta (default: 30 gemini, 120 ollama, 10 mock)
+        max_retries - tentativi aggiuntivi dopo errori di rete o risposte 429/503
+                      (default: rate_limit.max_retries per gemini, 2 ollama, 1 mock)
+        pool_size   - connessioni mantenute aperte (default: 4)
+        stream      - risposta in streaming (streamGenerateContent / Ollama stream): lo stream
+                      viene chiuso appena il testo contiene una decisione valida (default: false)
+    hedging - richieste "hedged" contro le code di latenza: se il backend principale non ha dato
+              una risposta valida entro il percentile delle sue latenze, lo stesso prompt parte
+              verso un secondo backend (o una seconda API key Gemini); vince il primo comando
+              valido e l'altra richiesta viene annullata (entrambe contano nei rispettivi limiti):
+        enabled          - attiva l'hedging (default: false)
+        secondary        - backend secondario: "gemini", "ollama" o "mock" (default: ollama)
+        api_key          - seconda API key se anche il secondario è Gemini
+        percentile       - percentile delle latenze del principale usato come scadenza (default: 95)
+        min_samples      - latenze da osservare prima di usare il percentile (default: 10)
+        initial_deadline - scadenza in secondi finché i campioni non bastano (default: 5)
+        min_deadline     - scadenza minima in secondi (default: 0.5)
+        window           - ultime latenze considerate per il percentile (default: 100)
+
+    python3 llm_backends.py check   # verifica che il backend configurato sia raggiungibile
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RETRYABLE_STATUS, RATE_LIMIT_STATS, backoff_delay, estimate_tokens, get_rate_limiter
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+DEFAULT_MOCK_URL = "http://127.0.0.1:8765"
+REPORTED_PERCENTILES = (50, 95, 99)
+
+
+def make_session(pool_size=DEFAULT_POOL_SIZE):
+    """Session HTTP con pool di connessioni keep-alive (i tentativi li gestisce il backend)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def percentile(samples, pct):
+    """Percentile (nearest-rank) di una lista di valori, None se vuota"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def latency_percentiles(samples):
+    """{"p50", "p95", "p99"} in millisecondi di una lista di durate in secondi"""
+    return {f"p{pct}": round(percentile(samples, pct) * 1000, 1) if samples else None
+            for pct in REPORTED_PERCENTILES}
+
+
+def gemini_schema(schema):
+    """JSON schema nel formato di responseSchema di Gemini (tipi OpenAPI in maiuscolo)"""
+    if isinstance(schema, dict):
+        return {key: value.upper() if key == "type" and isinstance(value, str) else gemini_schema(value) for key, value in schema.items()}
+    if isinstance(schema, list):
+        return [gemini_schema(item) for item in schema]
+    return schema
+
+
+def system_text(config):
+    """Testo delle istruzioni di sistema (formato Gemini: {"parts": [{"text": ...}]})"""
+    instruction = config.get("system_instruction")
+    if not instruction:
+        return ""
+    return "\n".join(part.get("text", "") for part in instruction.get("parts", []))
+
+
+class LLMBackend:
+    """Chiamata HTTP con pool di connessioni, timeout e tentativi; i backend definiscono il protocollo"""
+
+    name = None
+    label = None
+    default_timeout = 30
+    default_max_retries = 2
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.settings = self.config.get("llm", {}).get(self.name, {})
+        self.timeout = self.settings.get("timeout", self.default_timeout)
+        self.max_retries = self.settings.get("max_retries", self.default_max_retries)
+        self.stream = self.settings.get("stream", False)
+        self.session = make_session(self.settings.get("pool_size", DEFAULT_POOL_SIZE))
+        self.last_usage = {}
+        self.last_decision_seconds = None
+        self.counters = {"requests": 0, "retries": 0, "errors": 0, "early_stops": 0, "latency_seconds": 0.0}
+        # Durata di ogni chiamata a generate() andata a buon fine (tentativi compresi)
+        self.decision_latencies = []
+        # Con l'hedging una chiamata perdente può finire mentre è in corso la successiva
+        self._stats_lock = threading.Lock()
+
+    # Protocollo del backend
+    def endpoint(self):
+        raise NotImplementedError
+
+    def headers(self):
+        return {'Content-Type': 'application/json'}
+
+    def payload(self, prompt, schema=None):
+        """Corpo della richiesta; schema (JSON schema) vincola la forma della risposta"""
+        raise NotImplementedError
+
+    def parse(self, result):
+        """(testo della risposta, {"prompt_tokens", "total_tokens"}) dal JSON restituito"""
+        raise NotImplementedError
+
+    # Streaming
+    def stream_endpoint(self):
+        return self.endpoint()
+
+    def stream_payload(self, prompt, schema=None):
+        return self.payload(prompt, schema)
+
+    def parse_chunk(self, line):
+        """(frammento di testo, token usati o None) da una riga dello stream"""
+        raise NotImplementedError
+
+    # Politica di attesa e tentativi (Gemini la condivide con il rate limiter)
+    def before_request(self, prompt):
+        """Attesa prima di ogni tentativo; restituisce l'id della richiesta passato poi ad after_response()"""
+        return None
+
+    def retry_delay(self, attempt, response=None):
+        return backoff_delay(attempt, 0.5, 10)
+
+    def wait_before_retry(self, delay):
+        time.sleep(delay)
+
+    def after_response(self, usage, request_id=None):
+        pass
+
+    def generate(self, prompt, accept=None, cancel=None, schema=None):
+        """Risposta testuale del modello al prompt (None in caso di errore); vedi request()"""
+        text, self.last_usage = self.request(prompt, accept, cancel, schema)
+        return text
+
+    def request(self, prompt, accept=None, cancel=None, schema=None):
+        """(risposta testuale, token usati) della singola chiamata; testo None in caso di errore.
+        Non tocca last_usage: con l'hedging più chiamate sullo stesso backend si sovrappongono.
+        In modalità streaming accept(testo_parziale) viene chiamata a ogni frammento: appena
+        restituisce una risposta valida lo stream viene chiuso e si restituisce quella.
+        cancel (threading.Event) annulla la chiamata: niente altri tentativi, stream chiuso (None);
+        una richiesta non in streaming già inviata non si può interrompere e arriva comunque in fondo.
+        schema: JSON schema della risposta (output vincolato), se il backend lo supporta."""
+        streaming = self.stream and accept is not None
+        payload = self.stream_payload(prompt, schema) if streaming else self.payload(prompt, schema)
+        url = self.stream_endpoint() if streaming else self.endpoint()
+        call_started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            if cancel is not None and cancel.is_set():
+                return None, {}
+            # Id per chiamata: con l'hedging più richieste dello stesso backend sono in volo insieme
+            request_id = self.before_request(prompt)
+            started = time.perf_counter()
+            error = None
+            try:
+                response = self.session.post(url, headers=self.headers(), json=payload, timeout=self.timeout,
+                                             stream=streaming)
+            except requests.exceptions.RequestException as e:
+                error = e
+
+            if error is not None:
+                self._record_request(started)
+                self._count("errors")
+                if attempt < self.max_retries:
+                    delay = self.retry_delay(attempt)
+                    self._count("retries")
+                    print(f"⚠️ Errore di rete con {self.label}: nuovo tentativo tra {delay:.1f}s "
+                          f"({attempt + 1}/{self.max_retries})")
+                    if cancel is None:
+                        time.sleep(delay)
+                    elif cancel.wait(delay):
+                        return None, {}
+                    continue
+                if cancel is None or not cancel.is_set():
+                    print(f"❌ Errore chiamata {self.label}: {error}")
+                return None, {}
+
+            if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                self._record_request(started)
+                delay = self.retry_delay(attempt, response)
+                response.close()
+                self._count("retries")
+                print(f"⚠️ {self.label} ha risposto {response.status_code}: nuovo tentativo tra {delay:.1f}s "
+                      f"({attempt + 1}/{self.max_retries})")
+                self.wait_before_retry(delay)
+                continue
+            try:
+                response.raise_for_status()
+                if streaming:
+                    text, usage = self._read_stream(response, accept, cancel)
+                else:
+                    text, usage = self.parse(response.json())
+            except requests.exceptions.RequestException as e:
+                self._count("errors")
+                print(f"❌ Errore chiamata {self.label}: {e}")
+                return None, {}
+            except Exception as e:
+                self._count("errors")
+                print(f"❌ Errore parsing risposta {self.label}: {e}")
+                return None, {}
+            finally:
+                self._record_request(started)
+            self.after_response(usage, request_id)
+            if cancel is not None and cancel.is_set() and streaming:
+                return None, usage
+            if not text:
+                print(f"❌ Nessuna risposta valida da {self.label}")
+                return None, usage
+            with self._stats_lock:
+                self.decision_latencies.append(time.perf_counter() - call_started)
+            return text.strip(), usage
+        return None, {}
+
+    def _read_stream(self, response, accept, cancel=None):
+        """Legge lo stream riga per riga fermandosi alla prima decisione valida (o all'annullamento)"""
+        text, usage = "", {}
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if cancel is not None and cancel.is_set():
+                    break
+                if not line:
+                    continue
+                piece, chunk_usage = self.parse_chunk(line)
+                usage.update(chunk_usage or {})
+                if not piece:
+                    continue
+                text += piece
+                decision = accept(text)
+                if decision:
+                    self._count("early_stops")
+                    return decision, usage
+        finally:
+            # Chiudere lo stream a metà interrompe la generazione lato server
+            response.close()
+        return text, usage
+
+    def _count(self, counter, amount=1):
+        with self._stats_lock:
+            self.counters[counter] += amount
+
+    def _record_request(self, started):
+        """Conta la richiesta e il tempo fino alla decisione (o alla risposta completa)"""
+        elapsed = time.perf_counter() - started
+        self.last_decision_seconds = elapsed
+        with self._stats_lock:
+            self.counters["requests"] += 1
+            self.counters["latency_seconds"] += elapsed
+
+    def check(self):
+        """(raggiungibile, messaggio) per la verifica dei prerequisiti"""
+        return True, f"{self.label}: nessuna verifica necessaria"
+
+    def stats(self):
+        with self._stats_lock:
+            return self._stats()
+
+    def _stats(self):
+        requests_count = self.counters["requests"]
+        return {
+            "backend": self.name,
+            "requests": requests_count,
+            "retries": self.counters["retries"],
+            "errors": self.counters["errors"],
+            "streaming": self.stream,
+            "early_stops": self.counters["early_stops"],
+            "avg_latency_ms": round(self.counters["latency_seconds"] * 1000 / requests_count, 1) if requests_count else 0.0,
+            "decision_latency_ms": latency_percentiles(self.decision_latencies),
+        }
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini via API REST, con i limiti RPM/TPM condivisi tra processi (rate_limiter.py)"""
+
+    name = "gemini"
+    label = "Gemini"
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.api_key = self.config.get("gemini_api_key")
+        self.url = self.settings.get("url", self.config.get("api_url"))
+        self.rate_limiter = get_rate_limiter(self.api_key, self.config)
+        self.max_retries = self.settings.get("max_retries", self.rate_limiter.max_retries)
+
+    def endpoint(self):
+        return self.url
+
+    def headers(self):
+        return {'Content-Type': 'application/json', 'X-goog-api-key': self.api_key}
+
+    def payload(self, prompt, schema=None):
+        # ✨ Payload ottimizzato per Gemini 2.0
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "maxOutputTokens": self.config.get("max_output_tokens", 50),
+                "temperature": self.config.get("temperature", 1.0),
+                "topP": self.config.get("top_p", 0.9),
+                "topK": self.config.get("top_k", 40),  # Parametro aggiuntivo per Gemini 2.0
+                "stopSequences": []  # Può essere usato per controllo più preciso
+            },
+            "safetySettings": [
+                {"category": category, "threshold": "BLOCK_NONE"}
+                for category in ("HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH",
+                                 "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT")
+            ]
+        }
+        if schema is not None:
+            payload["generationConfig"]["responseMimeType"] = "application/json"
+            payload["generationConfig"]["responseSchema"] = gemini_schema(schema)
+        # ✨ AGGIUNGI SYSTEM INSTRUCTION SE PRESENTE NEL CONFIG
+        if "system_instruction" in self.config:
+            payload["systemInstruction"] = self.config["system_instruction"]
+        return payload
+
+    def parse(self, result):
+        usage = result.get('usageMetadata', {})
+        text = None
+        if result.get('candidates'):
+            text = result['candidates'][0]['content']['parts'][0]['text']
+        return text, {"prompt_tokens": usage.get('promptTokenCount'), "total_tokens": usage.get('totalTokenCount')}
+
+    def stream_endpoint(self):
+        # Server-Sent Events: una riga "data: {...}" per frammento
+        url = self.url.replace(":generateContent", ":streamGenerateContent")
+        return url + ("&" if "?" in url else "?") + "alt=sse"
+
+    def parse_chunk(self, line):
+        if not line.startswith("data:"):
+            return None, None
+        result = json.loads(line[5:])
+        text, usage = self.parse(result)
+        return text, {key: value for key, value in usage.items() if value}
+
+    def before_request(self, prompt):
+        # Token stimati: prompt + istruzioni di sistema + massimo output
+        estimated_tokens = (estimate_tokens(prompt)
+                            + estimate_tokens(json.dumps(self.config.get("system_instruction", "")))
+                            + self.config.get("max_output_tokens", 50))
+        return self.rate_limiter.acquire(estimated_tokens)
+
+    def retry_delay(self, attempt, response=None):
+        return self.rate_limiter.retry_delay(attempt, response)
+
+    def wait_before_retry(self, delay):
+        # Il blocco vale anche per gli altri processi: l'attesa avviene nel prossimo acquire()
+        RATE_LIMIT_STATS["rate_limited_responses"] += 1
+        RATE_LIMIT_STATS["retries"] += 1
+        self.rate_limiter.penalize(delay)
+
+    def after_response(self, usage, request_id=None):
+        self.rate_limiter.record_usage(request_id, usage.get("total_tokens"))
+
+    def check(self):
+        if not self.api_key or self.api_key == "your-google-gemini-api-key-here":
+            return False, "API Key Gemini non configurata in config.json"
+        return True, "Gemini: API key configurata"
+
+
+class OllamaBackend(LLMBackend):
+    """Modello locale servito da Ollama: nessun limite di richieste al minuto"""
+
+    name = "ollama"
+    label = "Ollama"
+    default_timeout = 120
+    default_url = DEFAULT_OLLAMA_URL
+    default_model = "llama3.1"
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.url = self.settings.get("url", self.default_url).rstrip('/')
+        self.model = self.settings.get("model", self.default_model)
+
+    def endpoint(self):
+        return f"{self.url}/api/generate"
+
+    def payload(self, prompt, schema=None):
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "system": system_text(self.config),
+            "stream": False,
+            # Il modello resta caricato tra una chiamata e l'altra
+            "keep_alive": self.settings.get("keep_alive", "10m"),
+            "options": {
+                "num_predict": self.config.get("max_output_tokens", 50),
+                "temperature": self.config.get("temperature", 1.0),
+                "top_p": self.config.get("top_p", 0.9),
+                "top_k": self.config.get("top_k", 40),
+            },
+        }
+        if schema is not None:
+            payload["format"] = schema
+        return payload
+
+    def parse(self, result):
+        prompt_tokens = result.get('prompt_eval_count')
+        total_tokens = (prompt_tokens or 0) + (result.get('eval_count') or 0)
+        return result.get('response'), {"prompt_tokens": prompt_tokens, "total_tokens": total_tokens or None}
+
+    def stream_payload(self, prompt, schema=None):
+        return dict(self.payload(prompt, schema), stream=True)
+
+    def parse_chunk(self, line):
+        # Una riga JSON per frammento; l'ultima ("done": true) riporta i token usati
+        result = json.loads(line)
+        if result.get('done'):
+            return result.get('response'), self.parse(result)[1]
+        return result.get('response'), None
+
+    def check(self):
+        try:
+            response = self.session.get(f"{self.url}/api/tags", timeout=5)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return False, f"{self.label} non disponibile su {self.url}"
+        models = [model.get('name', '') for model in response.json().get('models', [])]
+        if self.model not in models and f"{self.model}:latest" not in models:
+            return False, f"Modello '{self.model}' non presente in {self.label} (ollama pull {self.model})"
+        return True, f"{self.label}: modello {self.model} su {self.url}"
+
+
+class MockBackend(OllamaBackend):
+    """Server finto del repository (mock_llm_server.py), stesso protocollo di Ollama"""
+
+    name = "mock"
+    label = "Mock LLM"
+    default_timeout = 10
+    default_max_retries = 1
+    default_url = DEFAULT_MOCK_URL
+    default_model = "mock"
+
+
+class HedgedBackend:
+    """Backend principale affiancato da un secondario che parte solo se il principale tarda:
+    stessa interfaccia di LLMBackend (generate, label, last_usage, last_decision_seconds, stats)"""
+
+    def __init__(self, primary, secondary, config=None):
+        hedging = (config or {}).get("llm", {}).get("hedging", {})
+        self.primary = primary
+        self.secondary = secondary
+        self.name = primary.name
+        self.label = primary.label
+        self.stream = primary.stream
+        self.percentile = hedging.get("percentile", 95)
+        self.min_samples = hedging.get("min_samples", 10)
+        self.initial_deadline = hedging.get("initial_deadline", 5.0)
+        self.min_deadline = hedging.get("min_deadline", 0.5)
+        # Latenze recenti del principale da solo, su cui si calcola la scadenza
+        self.recent = deque(maxlen=hedging.get("window", 100))
+        self.last_usage = {}
+        self.last_decision_seconds = None
+        self.decision_latencies = []
+        # Latenze del principale da solo: annullato a metà stream conta il tempo fino all'annullamento
+        self.primary_latencies = []
+        self.counters = {"calls": 0, "hedged": 0, "secondary_wins": 0, "cancelled": 0, "censored": 0}
+        # Il principale perdente (non in streaming non si interrompe) registra la sua latenza
+        # dal proprio thread, anche mentre è già in corso la chiamata successiva
+        self._lock = threading.Lock()
+
+    def deadline(self):
+        """Secondi di attesa del principale prima di inviare il prompt anche al secondario"""
+        with self._lock:
+            if len(self.recent) < self.min_samples:
+                return self.initial_deadline
+            return max(self.min_deadline, percentile(self.recent, self.percentile))
+
+    def generate(self, prompt, accept=None, schema=None):
+        """Prima risposta valida tra principale e secondario. Una risposta completa è valida se
+        accept la riconosce come decisione (la riga finale è chiusa: si aggiunge "\n")."""
+        self.counters["calls"] += 1
+        started = time.perf_counter()
+        results = queue.Queue()
+        cancels = [threading.Event(), threading.Event()]
+
+        def run(index, backend):
+            # Token della singola chiamata: last_usage del backend può appartenere a un'altra
+            text, usage = backend.request(prompt, accept=accept, cancel=cancels[index], schema=schema)
+            elapsed = time.perf_counter() - started
+            if index == 0:
+                # Senza hedging la chiamata sarebbe durata così; se annullata prima della fine
+                # (stream chiuso, tentativi interrotti) è solo un limite inferiore
+                with self._lock:
+                    self.primary_latencies.append(elapsed)
+                    if text is None and cancels[0].is_set():
+                        self.counters["censored"] += 1
+                    else:
+                        self.recent.append(elapsed)
+            results.put((index, text, elapsed, usage))
+
+        def launch(index, backend):
+            threading.Thread(target=run, args=(index, backend), daemon=True).start()
+
+        launch(0, self.primary)
+        deadline = self.deadline()
+        pending, hedged = 1, False
+        while pending:
+            timeout = None if hedged else max(0.0, started + deadline - time.perf_counter())
+            try:
+                index, text, elapsed, usage = results.get(timeout=timeout)
+            except queue.Empty:
+                print(f"⏳ {self.primary.label} non ha risposto entro {deadline * 1000:.0f}ms: "
+                      f"stesso prompt a {self.secondary.label}")
+                hedged = True
+                self.counters["hedged"] += 1
+                launch(1, self.secondary)
+                pending += 1
+                continue
+            pending -= 1
+            if text and (accept is None or accept(text + "\n")):
+                if pending:
+                    cancels[1 - index].set()
+                    self.counters["cancelled"] += 1
+                if index == 1:
+                    self.counters["secondary_wins"] += 1
+                    print(f"🏁 Risposta da {self.secondary.label} dopo {elapsed * 1000:.0f}ms (hedging)")
+                self.last_usage = usage
+                self.last_decision_seconds = elapsed
+                self.decision_latencies.append(elapsed)
+                return text
+            if not hedged:
+                # Il principale ha fallito prima della scadenza: il secondario parte subito
+                hedged = True
+                self.counters["hedged"] += 1
+                launch(1, self.secondary)
+                pending += 1
+        self.last_usage = {}
+        self.last_decision_seconds = None
+        return None
+
+    def check(self):
+        ok, message = self.primary.check()
+        secondary_ok, secondary_message = self.secondary.check()
+        return ok, f"{message} (hedging verso {secondary_message if secondary_ok else 'secondario non disponibile'})"
+
+    def stats(self):
+        stats = self.primary.stats()
+        deadline = self.deadline()
+        with self._lock:
+            stats["hedging"] = dict(
+                self.counters,
+                secondary=self.secondary.stats(),
+                deadline_ms=round(deadline * 1000, 1),
+                decision_latency_ms={
+                    "with_hedging": latency_percentiles(self.decision_latencies),
+                    "without_hedging": latency_percentiles(list(self.primary_latencies)),
+                },
+            )
+        return stats
+
+
+BACKENDS = {backend.name: backend for backend in (GeminiBackend, OllamaBackend, MockBackend)}
+
+
+def get_backend(config):
+    """Backend scelto in config.json (sezione "llm", chiave "backend"), con l'eventuale secondario
+    per l'hedging (chiave "hedging")"""
+    llm_config = config.get("llm", {})
+    name = llm_config.get("backend", "gemini")
+    if name not in BACKENDS:
+        raise ValueError(f"Backend LLM sconosciuto: '{name}' (disponibili: {', '.join(BACKENDS)})")
+    primary = BACKENDS[name](config)
+    hedging = llm_config.get("hedging", {})
+    if not hedging.get("enabled", False):
+        return primary
+
+    secondary_name = hedging.get("secondary", "ollama")
+    if secondary_name not in BACKENDS:
+        raise ValueError(f"Backend LLM secondario sconosciuto: '{secondary_name}' (disponibili: {', '.join(BACKENDS)})")
+    secondary_config = config
+    if secondary_name == name:
+        # Stesso backend: ha senso solo con un'altra API key (e quindi un altro rate limiter)
+        if name != "gemini" or not hedging.get("api_key") or hedging["api_key"] == config.get("gemini_api_key"):
+            raise ValueError("L'hedging richiede un backend secondario diverso o una seconda API key Gemini")
+        secondary = GeminiBackend(dict(config, gemini_api_key=hedging["api_key"]))
+        secondary.label = "Gemini (seconda chiave)"
+        return HedgedBackend(primary, secondary, config)
+    if secondary_name == "gemini" and hedging.get("api_key"):
+        secondary_config = dict(config, gemini_api_key=hedging["api_key"])
+    return HedgedBackend(primary, BACKENDS[secondary_name](secondary_config), config)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "check":
+        print("Uso: python3 llm_backends.py check")
+        return 1
+    try:
+        with open("config.json", 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        backend = get_backend(config)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    ok, message = backend.check()
+    print(f"{'✓' if ok else '❌'} {message}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
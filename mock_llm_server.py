@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Mock LLM Server
+Server HTTP finto per misurare l'intero ciclo (cattura → prompt → LLM → esecuzione) senza
+rete e senza quota: legge le opzioni dal prompt (righe "A. BACK", "B. CLICK:Salva", ...)
+e ne sceglie una. Risponde con il protocollo di Ollama (/api/generate, /api/tags) e con
+quello di Gemini (...:generateContent, ...:streamGenerateContent), così funziona con i backend
+"mock", "ollama" e "gemini".
+
+Se la richiesta vincola l'output con un JSON schema (format di Ollama, responseSchema di Gemini)
+la risposta è JSON: {"option": "B"} oppure {"steps": [...]} per i piani.
+
+In streaming la risposta arriva un frammento alla volta (--token-delay secondi tra l'uno e
+l'altro), seguita da --chatter parole di spiegazione come fanno i modelli "loquaci": serve a
+verificare che il client chiuda lo stream appena ha la decisione.
+
+    python3 mock_llm_server.py [--port 8765] [--latency 0.2] [--strategy random|first|back] [--seed 42]
+                               [--token-delay 0.05] [--chatter 40]
+
+Connessioni keep-alive (HTTP/1.1) come i server reali: il pool del client viene riusato.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import cycle, islice
+
+DEFAULT_PORT = 8765
+OPTION_LINE = re.compile(r'(?m)^([A-Z]{1,3})\.\s*(BACK|CLICK_ROW:|CLICK:|FILL_CUSTOM:|FILL:)')
+SAMPLE_TEXTS = ["Mario", "Rossi", "Test", "prova@example.com", "3331234567", "Nota di prova"]
+CHATTER_WORDS = ("perché", "questa", "opzione", "porta", "a", "una", "schermata", "non", "ancora", "esplorata")
+
+
+def choose_answer(prompt, strategy="random", rng=random):
+    """Risposta nel formato atteso dal prompt: un codice (B) o codice:testo per i campi (F:Mario)"""
+    options = OPTION_LINE.findall(prompt)
+    if not options:
+        return "A"
+    if strategy == "back":
+        code, kind = options[0]
+    elif strategy == "first":
+        # Prima opzione diversa da BACK (il prompt mette in testa quelle mai provate)
+        code, kind = next((option for option in options if option[1] != "BACK"), options[0])
+    else:
+        code, kind = rng.choice(options)
+    if kind == "FILL_CUSTOM:":
+        return f"{code}:{rng.choice(SAMPLE_TEXTS)}"
+    return code
+
+
+def json_answer(answer, schema):
+    """Risposta testuale ("F:Mario", "B") nel formato JSON richiesto dallo schema"""
+    code, _, text = answer.partition(':')
+    step = {"option": code, **({"text": text} if text else {})}
+    properties = schema.get("properties") or {}
+    if "steps" in properties:
+        return json.dumps({"steps": [step]})
+    return json.dumps(step)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "LogiDroidMockLLM/1.0"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return {}
+
+    def do_GET(self):
+        if self.path.rstrip('/') == "/api/tags":
+            self._send_json(200, {"models": [{"name": name} for name in ("mock", "mock:latest")]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, content_type, pieces, render):
+        """Invia i frammenti con Transfer-Encoding: chunked, uno ogni token_delay secondi"""
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for index, piece in enumerate(pieces):
+                if index and self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+                self._send_chunk(render(piece, index == len(pieces) - 1))
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Il client ha chiuso lo stream appena trovata la decisione
+            with self.server.lock:
+                self.server.streams_closed_early += 1
+            self.close_connection = True
+
+    def do_POST(self):
+        request = self._read_json()
+        server = self.server
+        path = self.path.split('?')[0].rstrip('/')
+        if path == "/api/generate":
+            prompt = request.get("prompt", "")
+            streaming = request.get("stream", True)  # come Ollama: streaming se non indicato
+            schema = request.get("format") if isinstance(request.get("format"), dict) else None
+        elif path.endswith(":generateContent") or path.endswith(":streamGenerateContent"):
+            prompt = "".join(part.get("text", "") for content in request.get("contents", [])
+                             for part in content.get("parts", []))
+            streaming = path.endswith(":streamGenerateContent")
+            schema = request.get("generationConfig", {}).get("responseSchema")
+        else:
+            self._send_json(404, {"error": "not found"})
+            return
+
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            answer = choose_answer(prompt, server.strategy, server.rng)
+            server.requests += 1
+        prompt_tokens = max(1, len(prompt) // 4)
+        if schema:
+            answer = json_answer(answer, schema)
+
+        if streaming:
+            if schema:
+                # Output vincolato: solo il JSON, pochi caratteri per frammento come i token
+                pieces = [answer[start:start + 4] for start in range(0, len(answer), 4)]
+            else:
+                pieces = [answer] + [f" {word}" for word in islice(cycle(CHATTER_WORDS), server.chatter)]
+            if path == "/api/generate":
+                self._stream('application/x-ndjson', pieces, lambda piece, last: (json.dumps(
+                    {"model": request.get("model", "mock"), "response": piece, "done": last,
+                     **({"prompt_eval_count": prompt_tokens, "eval_count": len(pieces)} if last else {})})
+                    + "\n").encode('utf-8'))
+            else:
+                self._stream('text/event-stream', pieces, lambda piece, last: ("data: " + json.dumps({
+                    "candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}],
+                    **({"usageMetadata": {"promptTokenCount": prompt_tokens,
+                                          "totalTokenCount": prompt_tokens + len(pieces)}} if last else {})})
+                    + "\r\n\r\n").encode('utf-8'))
+            return
+
+        if path == "/api/generate":
+            self._send_json(200, {"model": request.get("model", "mock"), "response": answer, "done": True,
+                                  "prompt_eval_count": prompt_tokens, "eval_count": 1})
+        else:
+            self._send_json(200, {
+                "candidates": [{"content": {"parts": [{"text": answer}], "role": "model"}}],
+                "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": 1,
+                                  "totalTokenCount": prompt_tokens + 1},
+            })
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, strategy="random", seed=None, verbose=False, token_delay=0.0,
+                 chatter=0):
+        super().__init__(address, MockLLMHandler)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.chatter = chatter
+        self.streams_closed_early = 0
+        self.strategy = strategy
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogiDroid - server LLM finto per test e benchmark offline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="Secondi di attesa simulati per risposta")
+    parser.add_argument("--strategy", choices=["random", "first", "back"], default="random",
+                        help="Come scegliere l'opzione (default: random)")
+    parser.add_argument("--seed", type=int, help="Seme per scelte riproducibili")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="Secondi tra due frammenti di una risposta in streaming")
+    parser.add_argument("--chatter", type=int, default=0,
+                        help="Parole di spiegazione dopo la risposta in streaming (default: 0)")
+    parser.add_argument("--verbose", action="store_true", help="Stampa ogni richiesta")
+    args = parser.parse_args()
+
+    server = MockLLMServer((args.host, args.port), args.latency, args.strategy, args.seed, args.verbose,
+                           args.token_delay, args.chatter)
+    print(f"🧪 Mock LLM in ascolto su http://{args.host}:{args.port} (strategia: {args.strategy}, "
+          f"latenza: {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"🧪 Mock LLM arrestato dopo {server.requests} richieste "
+              f"({server.streams_closed_early} stream chiusi in anticipo dal client)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
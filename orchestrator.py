@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Orchestrator
+Processo unico e residente che esegue l'intero ciclo di test:
+cattura → conversione XML/JSON → prompt → LLM → esecuzione.
+Configurazione, cronologia e coverage restano in memoria per tutta la sessione,
+evitando l'avvio di un interprete Python e la rilettura dei JSON ad ogni passo.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import llm_api
+from action_executor import ActionExecutor
+from adb_session import close_all, get_session
+from capture import ScreenCapture, capture_stats
+from activity_coverage import ActivityCoverage
+from activity_tracker import ActivityTracker
+from coverage_accelerator import CoverageAccelerator
+from prompt_generator import available_actions, load_action_history, prompt_stats
+from random_injector import RandomActionInjector
+from rate_limiter import rate_limit_stats
+from run_store import get_run_store
+from screen_cache import layout_fingerprint
+from state_graph import StateGraph
+from ui_settle import UISettleDetector, wait_stats
+from workspace import Workspace, default_workspace
+
+
+class LogiDroidOrchestrator:
+    """Esegue le iterazioni di test mantenendo lo stato in memoria"""
+
+    def __init__(self, iterations=50, max_failures=5, serial=None, workspace=None, shared_coverage_file=None):
+        self.iterations = iterations
+        self.max_failures = max_failures
+        self.config = llm_api.CONFIG
+        # Cartelle della sessione: test/ oppure quelle del singolo dispositivo (esecuzione parallela)
+        self.workspace = workspace or default_workspace()
+        # Database delle esecuzioni (azioni, visite, schermate, tempi); None = solo file
+        self.store = get_run_store(self.config)
+
+        # Una sola shell adb persistente condivisa da tutti i componenti
+        self.session = get_session(serial or self.config.get("device_serial"))
+        self.settle = UISettleDetector(self.session, self.config)
+        self.capture = ScreenCapture(self.session, self.config)
+        self.coverage = ActivityCoverage(self.session, self.workspace, shared_coverage_file, self.config)
+        # Avvio diretto delle Activity esportate (sezione "coverage_accelerator" del config)
+        self.accelerator = CoverageAccelerator(self.session, self.coverage, self.config)
+        self.executor = ActionExecutor(self.session, self.settle, self.capture, self.workspace)
+        self.random_injector = RandomActionInjector(frequency=6, config=self.config, session=self.session,
+                                                    settle=self.settle, capture=self.capture,
+                                                    workspace=self.workspace, store=self.store)
+        self.decision_cache = llm_api.get_decision_cache(self.workspace.decision_cache_file)
+        self.tracker = None
+        self.history = []
+        # Grafo schermate/azioni e ultima azione in attesa della schermata di arrivo (fingerprint, azione, esito)
+        self.graph = None
+        self.pending_transition = None
+        self.replay_stats = {"replays": 0, "replayed_steps": 0, "divergences": 0}
+        # Piani di più azioni per chiamata LLM (sezione "planning" del config)
+        self.plan_stats = {"plans": 0, "planned_steps": 0, "executed_steps": 0, "divergences": 0}
+
+        self.successes = 0
+        self.failures = 0
+        self.started = None
+
+    def start_session(self):
+        """Prepara cartelle e cronologia; pulisce la memoria solo all'inizio di un nuovo test"""
+        self.workspace.create_dirs()
+
+        resume = os.path.exists(self.workspace.test_in_progress_marker)
+        if not resume:
+            for stale in ("action_history.json", "last_action.txt", "test_strategy.txt"):
+                path = os.path.join(self.workspace.prompts_dir, stale)
+                if os.path.exists(path):
+                    os.remove(path)
+            open(self.workspace.test_in_progress_marker, 'w').close()
+            print("ℹ Cronologia pulita per nuovo test")
+
+        if self.store is None:
+            self.history = load_action_history(self.workspace.history_file)
+            return
+        run_id = self.store.start_run(self.session.serial, self.coverage.package, self.workspace.root, resume)
+        self.store.set_app_activities(self.coverage.all_activities)
+        self.coverage.store = self.store
+        self.history = self.store.history()
+        print(f"ℹ 🗄️ Esecuzione #{run_id} registrata in {self.store.path}")
+
+    def start_graph(self):
+        """Carica il grafo di esplorazione del package (warm start dalle esecuzioni precedenti)"""
+        if not self.config.get("state_graph", {}).get("enabled", True):
+            return
+        self.graph = StateGraph(self.coverage.package, self.config).load()
+        if self.graph.loaded_nodes:
+            print(f"ℹ 🗺️ Grafo di esplorazione caricato: {self.graph.loaded_nodes} schermate note")
+
+    def observe_screen(self, data, activity=None):
+        """Aggiorna il grafo con la schermata corrente (e chiude la transizione dell'azione precedente)"""
+        if self.graph is None:
+            return
+        fingerprint = data.get('fingerprint')
+        if self.pending_transition is not None:
+            source, action, success = self.pending_transition
+            self.graph.record_transition(source, action, success, fingerprint)
+            self.pending_transition = None
+        self.graph.observe(fingerprint, activity, available_actions(data))
+
+    def last_action_outcome(self):
+        """(azione, esito) dell'ultima voce di cronologia"""
+        if not self.history:
+            return None, False
+        return self.history[-1].get("action"), self.history[-1].get("success", False)
+
+    def replay_to_frontier(self, snapshot, iteration):
+        """Se la schermata non ha azioni nuove e c'è un percorso noto verso una che ne ha,
+        lo ripercorre senza chiamare l'LLM. Restituisce lo snapshot finale."""
+        if self.graph is None:
+            return snapshot
+        path = self.graph.path_to_frontier(snapshot.data.get('fingerprint'))
+        if not path:
+            return snapshot
+
+        print(f"🗺️ Percorso noto verso azioni inesplorate: {' → '.join(action for _, action, _ in path)}")
+        self.replay_stats["replays"] += 1
+        for source, action, expected in path:
+            outcome = llm_api.execute_command(action, snapshot.data, self.executor)
+            if outcome is None:
+                break
+            action_performed, success, error_message = outcome
+            llm_api.save_last_action(action_performed, success, error_message, self.history, self.workspace,
+                                     self.store, fingerprint=source, activity=snapshot.activity)
+            self.pending_transition = (source, action_performed, success)
+            self.replay_stats["replayed_steps"] += 1
+            self.settle.wait(fallback=2)
+
+            new_snapshot = self.capture_screen(iteration)
+            if new_snapshot is None:
+                # Nessuna schermata da confrontare: l'LLM ripartirà dallo snapshot successivo
+                self.pending_transition = None
+                return snapshot
+            snapshot = new_snapshot
+            self.coverage.update(snapshot.activity)
+            self.observe_screen(snapshot.data, snapshot.activity)
+            if not success or snapshot.data.get('fingerprint') != expected:
+                print(f"⚠️ Percorso interrotto: dopo '{action}' la schermata non è quella attesa")
+                self.replay_stats["divergences"] += 1
+                break
+        return snapshot
+
+    def execute_plan(self, steps, data, iteration):
+        """Esegue i passi successivi di un piano dell'LLM ([(comando, element_id)]). Prima di ogni passo
+        la schermata deve avere ancora la struttura su cui il piano è stato scritto (stesso
+        layout_fingerprint, quindi stessi element_id): se diverge, i passi rimanenti vengono scartati
+        e l'iterazione successiva chiede un nuovo piano."""
+        self.plan_stats["plans"] += 1
+        self.plan_stats["planned_steps"] += len(steps)
+        expected_layout = layout_fingerprint(data['elements'])
+        for step, element_id in steps:
+            self.settle.wait(fallback=1)
+            snapshot = self.capture_screen(iteration)
+            if snapshot is None:
+                return
+            self.coverage.update(snapshot.activity)
+            self.observe_screen(snapshot.data, snapshot.activity)
+            if layout_fingerprint(snapshot.data['elements']) != expected_layout:
+                print(f"⚠️ Piano interrotto: la schermata è cambiata prima di '{step}'")
+                self.plan_stats["divergences"] += 1
+                return
+
+            outcome = llm_api.execute_command(step, snapshot.data, self.executor, self.history, element_id)
+            if outcome is None:
+                return
+            action_performed, success, error_message = outcome
+            llm_api.save_last_action(action_performed, success, error_message, self.history, self.workspace,
+                                     self.store, fingerprint=snapshot.data.get('fingerprint'),
+                                     activity=snapshot.activity)
+            self.pending_transition = (snapshot.data.get('fingerprint'), action_performed, success)
+            self.plan_stats["executed_steps"] += 1
+            if not success:
+                print(f"❌ Piano interrotto: passo fallito {action_performed}")
+                return
+            print(f"✅ Passo del piano completato: {action_performed}")
+
+    def accelerate_coverage(self):
+        """Avvia direttamente le Activity esportate non ancora visitate e cattura ogni schermata nella
+        coverage, nel RunStore e nel grafo; poi riapre quella con più azioni da provare, da cui
+        riparte l'esplorazione con l'LLM"""
+        if not self.accelerator.enabled:
+            return
+        candidates = self.accelerator.candidates()
+        if not candidates:
+            return
+        print(f"🚀 Avvio diretto di {len(candidates)} Activity esportate non ancora visitate...")
+        started = time.perf_counter()
+        explored_before = len(self.coverage.explored)
+        richest, richest_actions, current = None, 0, None
+        self.coverage.launching = True
+        try:
+            for activity in candidates:
+                if not self.accelerator.launch(activity):
+                    continue
+                self.settle.wait(fallback=2)
+                snapshot = self.capture_screen(0)
+                if snapshot is None:
+                    continue
+                current = activity
+                self.coverage.update(snapshot.activity)
+                if self.store is not None:
+                    self.store.record_screen(snapshot.data.get('fingerprint'), snapshot.activity)
+                # La schermata non è l'arrivo di un'azione: nessuna transizione nel grafo
+                self.pending_transition = None
+                self.observe_screen(snapshot.data, snapshot.activity)
+                if self.graph is not None:
+                    untried = len(self.graph.untried(snapshot.data.get('fingerprint')))
+                else:
+                    untried = len(available_actions(snapshot.data))
+                if untried > richest_actions:
+                    richest, richest_actions = activity, untried
+        finally:
+            self.coverage.launching = False
+
+        if richest is not None and richest is not current:
+            print(f"🚀 Ripartenza dalla schermata con più azioni da provare: {richest['component']} "
+                  f"({richest_actions} azioni)")
+            if self.accelerator.launch(richest):
+                self.settle.wait(fallback=2)
+        elapsed = time.perf_counter() - started
+        self.accelerator.counters["new_activities"] += len(self.coverage.explored) - explored_before
+        self.accelerator.counters["seconds"] += elapsed
+        self.timing("coverage_accelerator", elapsed)
+        print(f"🚀 Avvio diretto completato: {self.accelerator.counters['new_activities']} Activity nuove "
+              f"in {elapsed:.1f}s")
+
+    def start_tracker(self):
+        """Avvia il tracker delle Activity da logcat: ogni nuova Activity entra subito nella coverage"""
+        if not self.config.get("activity_tracker", {}).get("enabled", True):
+            return
+        self.tracker = ActivityTracker(self.session.serial, self.coverage.package, on_resume=self.on_tracked_activity)
+        self.tracker.start()
+        self.capture.tracker = self.tracker
+        print("ℹ 📡 Tracker Activity da logcat avviato")
+
+    def on_tracked_activity(self, activity):
+        if self.coverage.record(activity, source="logcat"):
+            print(f"✓ 🆕 Nuova activity (logcat): {activity}")
+
+    def timing(self, name, seconds):
+        """Registra la durata di una fase nel RunStore (se attivo)"""
+        if self.store is not None:
+            self.store.record_timing(name, seconds)
+
+    def capture_screen(self, iteration):
+        """Snapshot dell'iterazione: screenshot, gerarchia UI convertita e Activity corrente,
+        catturati in parallelo. Restituisce lo ScreenSnapshot (None se la cattura fallisce)."""
+        stamp = self.workspace.stamp()
+        xml_file, json_file = self.workspace.artifact_paths("current", stamp)
+        screenshot_file = self.workspace.screenshot_path(stamp)
+
+        try:
+            snapshot = self.capture.snapshot(xml_file, json_file, screenshot_file)
+            self.timing("snapshot", snapshot.elapsed)
+        except Exception as e:
+            print(f"❌ Errore nella conversione JSON (iterazione {iteration}): {e}")
+            return None
+        if snapshot.data is None:
+            print(f"❌ Errore nella cattura dell'interfaccia (iterazione {iteration})")
+            return None
+
+        return snapshot
+
+    def run_iteration(self, iteration):
+        print(f"🔄 Iterazione {iteration}/{self.iterations}")
+        started = time.perf_counter()
+
+        # 1. Snapshot della schermata corrente (anche l'Activity per la coverage)
+        snapshot = self.capture_screen(iteration)
+        if not snapshot:
+            return False
+        self.coverage.update(snapshot.activity)
+        json_file, data = snapshot.json_file, snapshot.data
+        if self.store is not None:
+            self.store.record_screen(data.get('fingerprint'), snapshot.activity)
+        self.observe_screen(data, snapshot.activity)
+
+        # 2. Schermata già esaurita: torna verso azioni inesplorate lungo un percorso noto (senza LLM)
+        snapshot = self.replay_to_frontier(snapshot, iteration)
+        json_file, data = snapshot.json_file, snapshot.data
+
+        # 3. Random injection oppure passo sistematico con l'LLM
+        is_first_iteration = len(self.history) == 0
+        if not is_first_iteration and self.random_injector.should_inject_random():
+            source = data.get('fingerprint')
+            new_snapshot = llm_api.run_random_injection(self.random_injector, self.history)
+            if new_snapshot:
+                # Il prompt usa lo snapshot della schermata di arrivo (Activity compresa)
+                snapshot = new_snapshot
+                json_file, data = snapshot.json_file, snapshot.data
+                self.coverage.update(snapshot.activity)
+                if self.store is not None:
+                    self.store.record_screen(data.get('fingerprint'), snapshot.activity)
+                random_action, _ = self.last_action_outcome()
+                self.pending_transition = (source, random_action, True)
+                self.observe_screen(data, snapshot.activity)
+
+        print("ℹ 🤖 Chiamata LLM con rate limiting...")
+        step_started = time.perf_counter()
+        plan = []
+        action = llm_api.run_llm_step(json_file, data, is_first_iteration, self.history,
+                                      self.executor, self.coverage, self.decision_cache, self.workspace, snapshot,
+                                      self.store, plan)
+        self.timing("llm_step", time.perf_counter() - step_started)
+        if action:
+            # La schermata di arrivo è quella dello snapshot successivo
+            self.pending_transition = (data.get('fingerprint'), action, self.last_action_outcome()[1])
+            # Passi successivi del piano (stessa chiamata LLM), solo se il primo è riuscito
+            if plan and self.last_action_outcome()[1]:
+                self.execute_plan(plan, data, iteration)
+
+        # Attende che l'app abbia reagito (le pause fisse da 1s + 2s restano solo come fallback)
+        self.settle.wait(fallback=3)
+
+        # La coverage dopo l'azione viene aggiornata dallo snapshot dell'iterazione successiva
+        self.timing("iteration", time.perf_counter() - started)
+        print(f"✓ Iterazione {iteration} completata")
+        return True
+
+    def run(self):
+        print("=================================================")
+
+        # Inizializza Activity Coverage
+        if not self.coverage.initialize():
+            return 1
+
+        self.started = time.perf_counter()
+        self.start_session()
+        self.start_graph()
+        self.start_tracker()
+        self.accelerate_coverage()
+
+        for i in range(1, self.iterations + 1):
+            try:
+                ok = self.run_iteration(i)
+            except Exception as e:
+                print(f"❌ Errore inatteso (iterazione {i}): {e}")
+                ok = False
+
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+                # Se ci sono troppi errori consecutivi, fermati
+                if self.failures > self.max_failures:
+                    print("❌ Troppi errori consecutivi, test interrotto")
+                    break
+
+            # Mostra progresso ogni 10 iterazioni
+            if i % 10 == 0:
+                print(f"ℹ Progresso: {i}/{self.iterations} - Successi: {self.successes}, Fallimenti: {self.failures}")
+
+        # Activity raggiunta dall'ultima azione (non c'è uno snapshot successivo)
+        if self.successes:
+            self.coverage.update()
+        if self.graph is not None:
+            self.graph.save()
+        self.decision_cache.flush()
+
+        if self.tracker is not None:
+            self.tracker.stop()
+        if self.store is not None:
+            # File storici (cronologia, Activity) generati una sola volta dal database
+            self.store.export(self.workspace)
+            self.store.end_run()
+        self.final_report()
+        self.capture.writer.flush()
+        self.capture.close()
+        close_all()
+
+        # Rimuovi marker di test in corso
+        if os.path.exists(self.workspace.test_in_progress_marker):
+            os.remove(self.workspace.test_in_progress_marker)
+        return 0
+
+    def build_report(self):
+        total_iterations = self.successes + self.failures
+        return {
+            "package": self.coverage.package,
+            "serial": self.session.serial,
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "test_iterations": total_iterations,
+            "successful_iterations": self.successes,
+            "failed_iterations": self.failures,
+            "success_rate": round(self.successes * 100 / total_iterations, 2) if total_iterations else 0,
+            "total_activities": len(self.coverage.all_activities),
+            "explored_activities": len(self.coverage.explored),
+            "coverage_percentage": round(self.coverage.percentage(), 1),
+            "explored_activity_list": list(self.coverage.explored),
+            "coverage_sources": self.coverage_sources(),
+            "ui_wait": wait_stats(),
+            "capture": capture_stats(),
+            "activity_tracker": self.tracker.stats() if self.tracker else None,
+            "timings": self.store.timing_stats() if self.store else None,
+            "exploration": self.exploration_stats(),
+            "prompt": prompt_stats(),
+            "conversion_cache": self.capture.cache.stats(),
+            "decision_cache": self.decision_cache.stats(),
+            "rate_limit": rate_limit_stats(),
+            "llm": llm_api.LLM_BACKEND.stats(),
+        }
+
+    def coverage_sources(self):
+        """Activity raggiunte navigando e con l'avvio diretto, con il ritmo di scoperta di ciascuna fase"""
+        launched = self.coverage.reached_by_launch()
+        navigation = [activity for activity in self.coverage.explored if activity not in launched]
+        accelerator = self.accelerator.stats()
+        elapsed = time.perf_counter() - self.started if self.started is not None else 0
+        navigation_seconds = elapsed - accelerator["seconds"]
+        return {
+            "navigation": navigation,
+            "direct_launch": launched,
+            "navigation_activities_per_minute": (round(len(navigation) * 60 / navigation_seconds, 2)
+                                                 if navigation_seconds > 0 else None),
+            "accelerator": accelerator,
+        }
+
+    def exploration_stats(self):
+        """Nuove Activity per chiamata LLM (non per iterazione) e uso del grafo"""
+        llm_calls = self.decision_cache.stats_counters["api_calls"]
+        new_activities = len(self.coverage.explored)
+        return {
+            "llm_calls": llm_calls,
+            "new_activities": new_activities,
+            "new_activities_per_llm_call": round(new_activities / llm_calls, 3) if llm_calls else None,
+            "graph": self.graph.stats() if self.graph else None,
+            **self.replay_stats,
+            "planning": self.plan_stats,
+        }
+
+    def final_report(self):
+        """Stampa il report finale e lo salva in test/coverage/final_report.json"""
+        report = self.build_report()
+
+        print("📊 Report Finale Activity Coverage")
+        print("📊 🎯 ACTIVITY COVERAGE FINALE")
+        print(f"📊 Activity totali nell'app: {report['total_activities']}")
+        print(f"📊 Activity esplorate: {report['explored_activities']}")
+        print(f"📊 Copertura: {report['coverage_percentage']}%")
+        print(f"[{self.coverage.progress_bar(30)}] {report['coverage_percentage']}%")
+
+        if self.coverage.explored:
+            print("")
+            print("📊 ✅ Activity Esplorate:")
+            launched = set(report['coverage_sources']['direct_launch'])
+            for activity in self.coverage.explored:
+                print(f"  ✓ {activity}{' (avvio diretto)' if activity in launched else ''}")
+
+        os.makedirs(self.workspace.coverage_dir, exist_ok=True)
+        report_file = self.workspace.final_report_file
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        print("")
+        print("=================================================")
+        print("🎯 TEST COMPLETATO")
+        print(f"Iterazioni riuscite: {self.successes}")
+        print(f"Iterazioni fallite: {self.failures}")
+        print(f"Tasso di successo: {report['success_rate']:.0f}%")
+        print(f"⏳ Attesa UI totale: {report['ui_wait']['total_seconds']}s "
+              f"({report['ui_wait']['settle_waits']} attese adattive, {report['ui_wait']['timeouts']} timeout, "
+              f"{report['ui_wait']['fallback_sleeps']} pause fisse)")
+        exploration = report['exploration']
+        print(f"🗺️ Esplorazione: {exploration['new_activities']} Activity nuove con {exploration['llm_calls']} "
+              f"chiamate LLM ({exploration['new_activities_per_llm_call']} per chiamata), "
+              f"{exploration['replayed_steps']} passi ripercorsi senza LLM")
+        sources = report['coverage_sources']
+        if sources['accelerator']['launches']:
+            accelerator = sources['accelerator']
+            print(f"🚀 Avvio diretto: {len(sources['direct_launch'])} Activity con {accelerator['launches']} avvii "
+                  f"({accelerator['failed_launches']} non riusciti, {accelerator['activities_per_minute']}/min); "
+                  f"navigando: {len(sources['navigation'])} Activity "
+                  f"({sources['navigation_activities_per_minute']}/min)")
+        planning = exploration['planning']
+        if planning['plans']:
+            print(f"🧩 Piani: {planning['plans']} piani, {planning['executed_steps']}/{planning['planned_steps']} "
+                  f"passi extra eseguiti senza chiamare l'LLM, {planning['divergences']} interrotti")
+        print(f"📸 Snapshot: {report['capture']['avg_ms']}ms in media "
+              f"({report['capture']['avg_sequential_ms']}ms se le sonde fossero in sequenza)")
+        print(f"📏 Prompt: {report['prompt']['avg_tokens']} token stimati in media "
+              f"(max {report['prompt']['max_tokens']}, {report['prompt']['truncated_prompts']} troncati per il budget)")
+        print(f"♻️ Cache conversioni: {report['conversion_cache']['hits']} schermate riusate "
+              f"({report['conversion_cache']['hit_rate']}% hit rate)")
+        print(f"🧠 Cache decisioni: {report['decision_cache']['api_calls_saved']} chiamate LLM evitate "
+              f"({report['decision_cache']['hit_rate']}% hit rate, {report['decision_cache']['api_calls']} chiamate)")
+        print(f"🤖 LLM ({report['llm']['backend']}): {report['llm']['requests']} richieste, "
+              f"{report['llm']['avg_latency_ms']}ms di latenza media, {report['llm']['retries']} ritentate")
+        hedging = report['llm'].get('hedging')
+        if hedging:
+            with_hedging = hedging['decision_latency_ms']['with_hedging']
+            without_hedging = hedging['decision_latency_ms']['without_hedging']
+            print(f"⏳ Hedging: {hedging['hedged']}/{hedging['calls']} chiamate duplicate, "
+                  f"{hedging['secondary_wins']} vinte dal secondario; P50/P95/P99 "
+                  f"{with_hedging['p50']}/{with_hedging['p95']}/{with_hedging['p99']}ms "
+                  f"(senza hedging {without_hedging['p50']}/{without_hedging['p95']}/{without_hedging['p99']}ms)")
+        print(f"🚦 Rate limiting: {report['rate_limit']['wait_seconds']}s di attesa, "
+              f"{report['rate_limit']['rate_limited_responses']} risposte 429/503 ritentate")
+        print("")
+        print("📁 File generati in:")
+        print(f"  Screenshots: {self.workspace.screenshots_dir}/")
+        print(f"  XML: {self.workspace.xml_dir}/")
+        print(f"  JSON: {self.workspace.json_dir}/")
+        print(f"  Cronologia: {self.workspace.prompts_dir}/")
+        print(f"  Coverage: {self.workspace.coverage_dir}/")
+        print("")
+        print(f"✓ Report coverage salvato: {report_file}")
+        print(f"ℹ Activity esplorate salvate in: {self.workspace.explored_activities_file}")
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogiDroid - orchestratore del ciclo di test automatico")
+    parser.add_argument("--iterations", type=int, default=50, help="Numero di iterazioni (default: 50)")
+    parser.add_argument("--max-failures", type=int, default=5,
+                        help="Interrompe il test oltre questo numero di fallimenti (default: 5)")
+    parser.add_argument("--serial", help="Serial del dispositivo adb (default: device_serial in config.json)")
+    parser.add_argument("--workspace", help="Cartella dei file della sessione (default: test)")
+    parser.add_argument("--shared-coverage", help="File delle Activity esplorate condiviso tra più dispositivi")
+    args = parser.parse_args()
+
+    orchestrator = LogiDroidOrchestrator(iterations=args.iterations, max_failures=args.max_failures,
+                                         serial=args.serial,
+                                         workspace=Workspace(args.workspace) if args.workspace else None,
+                                         shared_coverage_file=args.shared_coverage)
+    sys.exit(orchestrator.run())
+
+
+if __name__ == "__main__":
+    main()
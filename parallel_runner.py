@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Parallel Runner
+Esplora la stessa app su più emulatori/dispositivi contemporaneamente: per ogni serial
+viene avviato un orchestrator.py con il proprio workspace (test/devices/<serial>/:
+artefatti, cronologia, coverage), mentre
+
+- le Activity esplorate confluiscono nel file condiviso test/coverage/shared_explored.txt,
+  così ogni dispositivo sa cosa hanno già visitato gli altri;
+- la quota LLM è unica: tutti i processi usano lo stesso stato del rate limiter
+  (test/cache/rate_limit), quindi RPM/TPM valgono per l'insieme dei dispositivi.
+
+Durante l'esecuzione e alla fine la coverage viene unita in test/coverage/merged_report.json.
+
+    python3 parallel_runner.py [--serials emulator-5554 emulator-5556] [--iterations 50]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from adb_session import list_devices
+from workspace import DEFAULT_ROOT, Workspace
+
+SHARED_COVERAGE_FILE = os.path.join(DEFAULT_ROOT, "coverage", "shared_explored.txt")
+MERGED_REPORT_FILE = os.path.join(DEFAULT_ROOT, "coverage", "merged_report.json")
+ORCHESTRATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "orchestrator.py")
+
+
+def read_lines(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+class DeviceWorker:
+    """Processo orchestrator.py di un singolo dispositivo"""
+
+    def __init__(self, serial, workspace):
+        self.serial = serial
+        self.workspace = workspace
+        self.process = None
+        self.log_file = os.path.join(workspace.root, "run.log")
+
+    def start(self, iterations, max_failures, shared_coverage_file):
+        self.workspace.create_dirs()
+        command = [sys.executable, ORCHESTRATOR, "--serial", self.serial,
+                   "--workspace", self.workspace.root, "--shared-coverage", shared_coverage_file,
+                   "--iterations", str(iterations), "--max-failures", str(max_failures)]
+        env = dict(os.environ, ANDROID_SERIAL=self.serial, PYTHONUNBUFFERED="1")
+        with open(self.log_file, 'w', encoding='utf-8') as log:
+            self.process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+        print(f"🚀 {self.serial}: avviato (log: {self.log_file})")
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def exit_code(self):
+        return self.process.poll() if self.process else None
+
+    def stop(self):
+        if self.running:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def merge_coverage(workers, started_at):
+    """Unisce la coverage dei workspace: unione delle Activity, contributo per dispositivo, Activity/ora"""
+    all_activities, explored = [], []
+    all_seen, explored_seen = set(), set()
+    devices = {}
+
+    for worker in workers:
+        device_all = read_lines(worker.workspace.all_activities_file)
+        device_explored = read_lines(worker.workspace.explored_activities_file)
+        new_for_union = 0
+        for activity in device_all:
+            if activity not in all_seen:
+                all_seen.add(activity)
+                all_activities.append(activity)
+        for activity in device_explored:
+            if activity not in explored_seen:
+                explored_seen.add(activity)
+                explored.append(activity)
+                new_for_union += 1
+        devices[worker.serial] = {
+            "workspace": worker.workspace.root,
+            "explored_activities": len(device_explored),
+            "first_discoveries": new_for_union,
+            "running": worker.running,
+            "exit_code": worker.exit_code,
+        }
+
+    elapsed = max(time.time() - started_at, 1e-6)
+    total = len(all_activities)
+    # Le schermate senza Activity propria (package/Screen_xxx) non contano nella percentuale
+    covered = len(explored_seen & all_seen)
+    return {
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "devices": len(workers),
+        "elapsed_seconds": round(elapsed, 1),
+        "total_activities": total,
+        "explored_activities": len(explored),
+        "coverage_percentage": round(covered * 100 / total, 1) if total else 0.0,
+        "activities_per_hour": round(len(explored) * 3600 / elapsed, 1),
+        "explored_activity_list": explored,
+        "per_device": devices,
+    }
+
+
+def save_report(report, report_file=MERGED_REPORT_FILE):
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+    temp_file = f"{report_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, report_file)
+
+
+def run(serials, iterations, max_failures, report_interval):
+    os.makedirs(os.path.dirname(SHARED_COVERAGE_FILE), exist_ok=True)
+    open(SHARED_COVERAGE_FILE, 'w').close()
+
+    workers = [DeviceWorker(serial, Workspace.for_device(serial)) for serial in serials]
+    started_at = time.time()
+    for worker in workers:
+        worker.start(iterations, max_failures, SHARED_COVERAGE_FILE)
+
+    try:
+        last_report = time.time()
+        while any(worker.running for worker in workers):
+            time.sleep(1)
+            if time.time() - last_report >= report_interval:
+                last_report = time.time()
+                report = merge_coverage(workers, started_at)
+                save_report(report)
+                active = sum(1 for worker in workers if worker.running)
+                print(f"📊 Coverage unita: {report['explored_activities']}/{report['total_activities']} "
+                      f"({report['coverage_percentage']}%) - {report['activities_per_hour']} Activity/ora "
+                      f"- dispositivi attivi: {active}/{len(workers)}")
+    except KeyboardInterrupt:
+        print("\n⚠️ Interruzione richiesta: arresto dei dispositivi...")
+        for worker in workers:
+            worker.stop()
+
+    report = merge_coverage(workers, started_at)
+    save_report(report)
+
+    print("")
+    print("📊 🎯 COVERAGE UNITA")
+    print(f"📊 Dispositivi: {report['devices']}")
+    print(f"📊 Activity esplorate: {report['explored_activities']}/{report['total_activities']} "
+          f"({report['coverage_percentage']}%)")
+    print(f"📊 Activity/ora: {report['activities_per_hour']}")
+    for serial, stats in report['per_device'].items():
+        status = "✓" if stats['exit_code'] == 0 else "❌"
+        print(f"  {status} {serial}: {stats['explored_activities']} Activity "
+              f"({stats['first_discoveries']} scoperte per primo)")
+    print(f"✓ Report unito salvato: {MERGED_REPORT_FILE}")
+    return 0 if all(worker.exit_code == 0 for worker in workers) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogiDroid - test in parallelo su più dispositivi")
+    parser.add_argument("--serials", nargs="+", help="Serial dei dispositivi (default: tutti quelli di 'adb devices')")
+    parser.add_argument("--iterations", type=int, default=50, help="Iterazioni per dispositivo (default: 50)")
+    parser.add_argument("--max-failures", type=int, default=5, help="Fallimenti consecutivi prima di fermarsi")
+    parser.add_argument("--report-interval", type=float, default=30,
+                        help="Secondi tra due aggiornamenti del report unito (default: 30)")
+    args = parser.parse_args()
+
+    serials = args.serials or list_devices()
+    if not serials:
+        print("❌ Nessun dispositivo connesso. Verifica con 'adb devices'.")
+        return 1
+    print(f"ℹ Dispositivi: {', '.join(serials)}")
+    return run(serials, args.iterations, args.max_failures, args.report_interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,8 +8,21 @@ Con sistema di memoria delle azioni precedenti per mantenere il filo conduttore
 import json
 import sys
 import os
-import subprocess
 import re
+import time
+
+import screen_cache
+from adb_session import get_session
+from apk_manifest import ManifestError, launchable_activities, read_manifest
+from element_index import lookup_index
+from rate_limiter import estimate_tokens
+
+RECENT_HISTORY_WINDOW = 20  # azioni recenti mostrate all'LLM
+COMMANDS_SHARE = 0.6          # quota del budget di token riservata ai comandi
+VISITED_SUMMARY_TOKENS = 60   # spazio minimo lasciato al riassunto delle Activity esplorate
+# Dimensioni dei prompt generati (token stimati) e token contati dall'API
+PROMPT_STATS = {"calls": 0, "total_tokens": 0, "max_tokens": 0, "last_tokens": 0, "truncated": 0,
+                "hidden_options": 0, "api_prompt_tokens": 0, "api_calls": 0}
 
 def load_action_history(history_file: str = "test/prompts/action_history.json") -> list:
     """Carica la cronologia delle azioni precedenti dal file history_file"""
@@ -21,17 +34,23 @@ def load_action_history(history_file: str = "test/prompts/action_history.json")
         pass
     return []
 
-def get_current_activity():
-    """Rileva l'Activity corrente tramite ADB con metodi multipli"""
+def get_current_activity(session=None, data=None, snapshot=None):
+    """Rileva l'Activity corrente tramite ADB con metodi multipli
+    (data: schermata corrente, usata per il fingerprint se l'Activity non è rilevabile;
+    snapshot: ScreenSnapshot dell'iterazione, se presente il dispositivo non viene interrogato)"""
+    if snapshot is not None:
+        activity = snapshot.activity
+        if activity and "launcher" not in activity.lower():
+            return activity
+        return generate_screen_fingerprint(snapshot.package or "unknown", data)
+
+    session = session or get_session()
     try:
         # Metodo 1: Focus corrente
-        result = subprocess.run(
-            ["adb", "shell", "dumpsys", "activity", "activities"],
-            capture_output=True, text=True, timeout=10
-        )
+        activities_dump = session.output("dumpsys", "activity", "activities", timeout=10, retry=True)
         
         # Cerca il pattern dell'Activity corrente (salta launcher)
-        for line in result.stdout.split('\n'):
+        for line in activities_dump.split('\n'):
             if 'mCurrentFocus' in line or 'mFocusedActivity' in line:
                 # Estrae il nome dell'Activity dal pattern
                 # Esempio: mCurrentFocus=Window{abc123 u0 com.example.app/com.example.MainActivity}
@@ -43,7 +62,7 @@ def get_current_activity():
                         return activity
         
         # Metodo 2: Lista attività correnti (salta launcher)
-        for line in result.stdout.split('\n'):
+        for line in activities_dump.split('\n'):
             if 'TaskRecord' in line and 'A=' in line:
                 match = re.search(r'A=([a-zA-Z0-9_.]+/[a-zA-Z0-9_.]+Activity)', line)
                 if match:
@@ -53,12 +72,9 @@ def get_current_activity():
                         return activity
         
         # Metodo 3: Top Activity
-        result2 = subprocess.run(
-            ["adb", "shell", "dumpsys", "activity", "top"],
-            capture_output=True, text=True, timeout=10
-        )
+        top_dump = session.output("dumpsys", "activity", "top", timeout=10, retry=True)
         
-        for line in result2.stdout.split('\n'):
+        for line in top_dump.split('\n'):
             if 'ACTIVITY' in line and '/' in line:
                 match = re.search(r'([a-zA-Z0-9_.]+)/([a-zA-Z0-9_.]+)', line)
                 if match:
@@ -68,13 +84,10 @@ def get_current_activity():
                         return activity
         
         # Metodo 4: Package name + Screen fingerprint
-        package_result = subprocess.run(
-            ["adb", "shell", "dumpsys", "window", "windows"],
-            capture_output=True, text=True, timeout=10
-        )
+        windows_dump = session.output("dumpsys", "window", "windows", timeout=10, retry=True)
         
         current_package = "unknown"
-        for line in package_result.stdout.split('\n'):
+        for line in windows_dump.split('\n'):
             if 'mCurrentFocus' in line:
                 package_match = re.search(r'([a-zA-Z0-9_.]+)/', line)
                 if package_match:
@@ -82,56 +95,29 @@ def get_current_activity():
                     break
         
         # Se il package è noto, genera un ID schermata basato sui contenuti
-        return generate_screen_fingerprint(current_package)
+        return generate_screen_fingerprint(current_package, data)
                     
     except Exception as e:
         print(f"⚠️ Errore nel rilevamento Activity: {e}", file=sys.stderr)
     
-    return generate_screen_fingerprint("unknown")
+    return generate_screen_fingerprint("unknown", data)
 
-def generate_screen_fingerprint(package_name):
-    """Genera un identificativo unico per la schermata corrente basato sui contenuti UI
-    nel caso nopn si riesca a rilevare l'Activity esatta."""
+def generate_screen_fingerprint(package_name, data=None):
+    """Genera un identificativo stabile per la schermata corrente basato sui contenuti UI
+    nel caso non si riesca a rilevare l'Activity esatta.
+    Usa il fingerprint della gerarchia normalizzata (deterministico tra iterazioni ed esecuzioni)
+    calcolato in fase di cattura; in sua assenza quello degli elementi convertiti."""
     try:
-        # Usa l'ultimo file JSON generato per creare un fingerprint
-        json_files = []
-        json_dir = "test/json"
-        
-        if os.path.exists(json_dir):
-            for file in os.listdir(json_dir):
-                if file.startswith("result_current_") and file.endswith(".json"):
-                    json_files.append(os.path.join(json_dir, file))
-        
-        if json_files:
-            # Prendi il file più recente
-            latest_json = max(json_files, key=os.path.getctime)
-            
-            with open(latest_json, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-                # Crea fingerprint basato sui primi 3 elementi visibili
-                elements = data.get('elements', [])
-                visible_elements = []
-                
-                for elem in elements[:5]:  # Prime 5 per essere sicuri
-                    text = elem.get('text', '').strip()
-                    content_desc = elem.get('content_desc', '').strip()
-                    resource_id = elem.get('resource_id', '').strip()
-                    
-                    if text:
-                        visible_elements.append(text)
-                    elif content_desc:
-                        visible_elements.append(content_desc)
-                    elif resource_id:
-                        visible_elements.append(resource_id.split(':')[-1])
-                
-                if visible_elements:
-                    # Crea ID unico basato sui contenuti
-                    content_hash = hash(tuple(visible_elements[:3]))  # Usa primi 3 elementi
-                    return f"{package_name}/Screen_{abs(content_hash) % 10000}"
+        fingerprint = None
+        if data:
+            fingerprint = data.get('fingerprint') or screen_cache.elements_fingerprint(data.get('elements', []))
+        if not fingerprint:
+            # Ultima schermata catturata da questo processo
+            fingerprint = screen_cache.get_cache().last_fingerprint
+        if fingerprint:
+            return f"{package_name}/Screen_{fingerprint[:8]}"
         
         # Fallback: usa timestamp
-        import time
         return f"{package_name}/Screen_{int(time.time()) % 10000}"
         
     except Exception as e:
@@ -153,7 +139,20 @@ def get_all_activities_from_apk(apk_path: str = "test/coverage/app.apk"):
             except Exception as e:
                 print(f"⚠️ Errore lettura {activities_file}: {e}", file=sys.stderr)
         
-        # METODO 2: Estrazione dinamica da device Android (come auto_test.sh)
+        # METODO 2: Manifest binario dell'APK (senza aapt né device)
+        if os.path.exists(apk_path):
+            print(f"🔍 Tentativo estrazione da APK: {apk_path}", file=sys.stderr)
+            try:
+                activities = launchable_activities(read_manifest(apk_path))
+                if activities:
+                    print(f"✅ Trovate {len(activities)} activity dal manifest dell'APK", file=sys.stderr)
+                    return activities
+            except ManifestError as e:
+                print(f"⚠️ Errore lettura manifest: {e}", file=sys.stderr)
+        else:
+            print(f"⚠️ APK non trovato: {apk_path}", file=sys.stderr)
+
+        # METODO 3: Estrazione dinamica da device Android (come auto_test.sh)
         print("🔍 Estraendo activity direttamente da device Android...", file=sys.stderr)
         try:
             # Ottieni package corrente
@@ -166,13 +165,11 @@ def get_all_activities_from_apk(apk_path: str = "test/coverage/app.apk"):
             
             if package_name:
                 # Metodo principale: Activity Resolver Table (come auto_test.sh)
-                result = subprocess.run([
-                    "adb", "shell", "dumpsys", "package", package_name
-                ], capture_output=True, text=True, timeout=30)
+                package_dump, status = get_session().run("dumpsys", "package", package_name, timeout=30, retry=True)
                 
-                if result.returncode == 0:
+                if status == 0:
                     # Estrai da Activity Resolver Table
-                    lines = result.stdout.split('\n')
+                    lines = package_dump.split('\n')
                     in_resolver_section = False
                     activities = []
                     
@@ -213,35 +210,6 @@ def get_all_activities_from_apk(apk_path: str = "test/coverage/app.apk"):
         except Exception as e:
             print(f"⚠️ Errore estrazione dinamica: {e}", file=sys.stderr)
         
-        # METODO 3: AAPT (se APK esiste)
-        if os.path.exists(apk_path):
-            print(f"🔍 Tentativo estrazione da APK: {apk_path}", file=sys.stderr)
-            try:
-                result = subprocess.run(
-                    ["aapt", "dump", "badging", apk_path],
-                    capture_output=True, text=True, timeout=30
-                )
-                
-                activities = []
-                for line in result.stdout.split('\n'):
-                    if 'activity' in line.lower():
-                        # Estrae nomi Activity dal dump aapt
-                        match = re.search(r"name='([^']+)'", line)
-                        if match:
-                            activities.append(match.group(1))
-                            
-                if activities:
-                    unique_activities = list(set(activities))  # Rimuove duplicati
-                    print(f"✅ Trovate {len(unique_activities)} activity da AAPT", file=sys.stderr)
-                    return unique_activities
-                    
-            except FileNotFoundError:
-                print("⚠️ aapt non installato", file=sys.stderr)
-            except Exception as e:
-                print(f"⚠️ Errore AAPT: {e}", file=sys.stderr)
-        else:
-            print(f"⚠️ APK non trovato: {apk_path}", file=sys.stderr)
-            
         # METODO 4: Fallback su lista manuale esistente
         return load_manual_activities_list()
         
@@ -317,11 +285,16 @@ def save_current_activity(activity: str, file_path: str = "test/coverage/explore
         print(f"⚠️ Errore nel salvataggio Activity: {e}", file=sys.stderr)
     return False
 
-def calculate_activity_coverage():
-    """Calcola la percentuale di coverage delle Activity"""
+def calculate_activity_coverage(coverage=None):
+    """Calcola la percentuale di coverage delle Activity.
+    Se viene passato lo stato in memoria (ActivityCoverage) non rilegge i file."""
     try:
-        all_activities = get_all_activities_from_apk()
-        visited_activities = load_visited_activities()
+        if coverage is not None:
+            all_activities = coverage.all_activities
+            visited_activities = coverage.explored
+        else:
+            all_activities = get_all_activities_from_apk()
+            visited_activities = load_visited_activities()
         
         # ✨ DEBUG: Mostra cosa stiamo contando
         print(f"🔍 Debug Coverage:", file=sys.stderr)
@@ -337,7 +310,8 @@ def calculate_activity_coverage():
             return 0, 0, 0, "APK non disponibile"
         
         # Salva la lista completa delle Activity per riferimento
-        save_all_activities_reference(all_activities)
+        if coverage is None:
+            save_all_activities_reference(all_activities)
         
         # ✨ MIGLIORAMENTO: Rimuovi duplicati e conta correttamente
         unique_visited = list(set(visited_activities))  # Rimuove duplicati
@@ -370,25 +344,8 @@ def save_all_activities_reference(activities: list, file_path: str = "test/cover
     except Exception as e:
         print(f"⚠️ Errore nel salvataggio riferimento Activity: {e}", file=sys.stderr)
 
-def generate_simple_prompt(json_file: str, is_first_iteration: bool = False) -> str:
-    """Genera un prompt semplice che mostra gli elementi disponibili """
-    
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        raise Exception(f"Errore nel caricamento JSON: {e}")
-    
-    # Carica la cronologia delle azioni precedenti
-    history = load_action_history()
-    
-    # ✨ NUOVA FUNZIONALITÀ: Tracking Activity Coverage
-    current_activity = get_current_activity()
-    save_current_activity(current_activity)  # Salva se nuova
-    
-    # Calcola e mostra coverage delle Activity
-    coverage_percentage, visited_count, total_count, status = calculate_activity_coverage()
-    
+def collect_controls(data: dict):
+    """Bottoni (etichette) e campi di testo (etichetta con stato) della schermata"""
     # Separa bottoni e campi di testo
     buttons = []
     text_fields = []
@@ -418,18 +375,327 @@ def generate_simple_prompt(json_file: str, is_first_iteration: bool = False) ->
                     field_id = f"{label} (VUOTO)"
             
             text_fields.append(field_id)
-        elif elem['clickable']:  # Bottoni clickable
-            button_text = elem.get('text', '').strip()
-            if not button_text:
-                content_desc = elem.get('content_desc', '').strip()
-                resource_id = elem.get('resource_id', '')
-                if content_desc:
-                    button_text = content_desc  # Usa content_desc se disponibile
-                elif resource_id:
-                    button_text = f"[{resource_id.split(':')[-1]}]"
-                else:
-                    button_text = "[bottone]"
-            buttons.append(button_text)
+        elif elem['clickable'] and not elem.get('group'):  # Bottoni clickable (le righe di liste sono nei gruppi)
+            buttons.append(button_label(elem))
+    return buttons, text_fields
+
+def button_label(elem: dict) -> str:
+    """Etichetta di un bottone come compare nel comando CLICK"""
+    button_text = elem.get('text', '').strip()
+    if not button_text:
+        content_desc = elem.get('content_desc', '').strip()
+        resource_id = elem.get('resource_id', '')
+        if content_desc:
+            button_text = content_desc  # Usa content_desc se disponibile
+        elif resource_id:
+            button_text = f"[{resource_id.split(':')[-1]}]"
+        else:
+            button_text = "[bottone]"
+    return button_text
+
+def group_rows(data: dict, group: str) -> list:
+    """Righe (elementi) di un gruppo di elementi ripetuti, in ordine di schermata"""
+    return [elem for elem in data['elements'] if elem.get('group') == group]
+
+PRIORITY_BUTTON_KEYWORDS = ["salva", "save", "ok", "conferma", "annulla", "cancel", "indietro", "back", "fine", "done"]
+
+def prioritize_buttons(buttons: list) -> list:
+    """Bottoni importanti (salva, ok, annulla...) prima degli altri, mantenendo l'ordine"""
+    priority_buttons = []
+    normal_buttons = []
+    for button in buttons:
+        button_lower = button.lower()
+        if any(keyword in button_lower for keyword in PRIORITY_BUTTON_KEYWORDS):
+            priority_buttons.append(button)
+        else:
+            normal_buttons.append(button)
+    return priority_buttons + normal_buttons
+
+def available_actions(data: dict) -> list:
+    """Azioni eseguibili senza testo libero sulla schermata (BACK e CLICK); per i gruppi
+    di righe ripetute ogni riga è un'azione distinta (è quella che viene registrata)"""
+    buttons, _ = collect_controls(data)
+    actions = ["BACK"] + [f"CLICK:{button}" for button in prioritize_buttons(buttons)]
+    for group in data.get('groups', []):
+        for elem in group_rows(data, group['name']):
+            action = f"CLICK:{button_label(elem)}"
+            if action not in actions:
+                actions.append(action)
+    return actions
+
+def option_id(index: int) -> str:
+    """Codice dell'opzione: A..Z, poi AA, AB, ... (come le colonne di un foglio di calcolo)"""
+    code = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        code = chr(ord('A') + remainder) + code
+    return code
+
+def build_screen_options(data: dict) -> list:
+    """Opzioni della schermata in ordine di presentazione: [(comando, nota, azioni coperte)].
+    Le azioni coperte servono a capire se l'opzione è già stata provata (None: il comando stesso)."""
+    buttons, text_fields = collect_controls(data)
+    
+    # Aggiunta del tasto BACK tra le opzioni
+    options = [("BACK", "torna alla schermata precedente", None)]
+    
+    # Aggiungi comandi CLICK per i bottoni con prioritizzazione intelligente (mostra tutti)
+    for button in prioritize_buttons(buttons):
+        options.append((f"CLICK:{button}", None, None))
+    
+    # Una sola opzione per ogni lista di righe ripetute: la riga concreta la sceglie l'esecutore
+    for group in data.get('groups', []):
+        samples = ", ".join(f"'{sample}'" for sample in group['samples'])
+        note = f"una riga della lista, {group['count']} elementi" + (f", es. {samples}" if samples else "")
+        covers = [f"CLICK:{button_label(elem)}" for elem in group_rows(data, group['name'])]
+        options.append((f"CLICK_ROW:{group['name']}", note, covers))
+    
+    # Aggiungi comandi FILL per i campi di testo
+    for field in text_fields[:10]:  # Max 10 campi (aumentato da 5)
+        clean_field = field.split(' (')[0]  # Rimuovi (VUOTO)/(COMPILATO)
+        options.append((f"FILL_CUSTOM:{clean_field}", "scrivi {id}:TuoTesto", None))
+    return options
+
+def screen_options(data: dict) -> list:
+    """Opzioni della schermata, riusate se già costruite per lo stesso fingerprint"""
+    return screen_cache.get_cache().fragment(data.get('fingerprint'), lambda: build_screen_options(data))
+
+def option_tried(command: str, tried_actions: set, covers: list = None) -> bool:
+    """True se l'azione dell'opzione compare già nella cronologia recente
+    (per i gruppi di righe: se tutte le righe sono già state provate)"""
+    if covers:
+        return all(action in tried_actions for action in covers)
+    if command.startswith("FILL_CUSTOM:"):
+        prefix = f"FILL:{command[len('FILL_CUSTOM:'):]}:"
+        return any(action.startswith(prefix) for action in tried_actions)
+    return command in tried_actions
+
+def rank_options(options: list, history_window: list = None) -> list:
+    """BACK resta la prima opzione; seguono le opzioni mai provate, poi quelle già presenti in cronologia"""
+    tried_actions = {entry.get('action', '') for entry in (history_window or [])}
+    if not tried_actions:
+        return list(options)
+    head, rest = options[:1], options[1:]
+    untried = [option for option in rest if not option_tried(option[0], tried_actions, option[2])]
+    tried = [option for option in rest if option_tried(option[0], tried_actions, option[2])]
+    return head + untried + tried
+
+def build_commands_section(options: list, token_budget: int = None):
+    """Sezione dei comandi (opzioni A, B, ... AA, AB) entro token_budget.
+    Restituisce (testo, opzioni mostrate)."""
+    header = "📱 COMANDI DISPONIBILI - SCEGLI UNO:\n\n"
+    footer_size = estimate_tokens("\n💡 RISPOSTA RICHIESTA: Scrivi solo UN codice (A-ZZ)\n"
+                                  "⚠️ NON aggiungere spiegazioni, scrivi solo il codice scelto.\n\n"
+                                  "… altre 999 opzioni non mostrate\n")
+    lines = []
+    used = estimate_tokens(header) + footer_size
+    for index, (command, note, _) in enumerate(options):
+        code = option_id(index)
+        line = f"{code}. {command}" + (f" ({note.replace('{id}', code)})" if note else "") + "\n"
+        cost = estimate_tokens(line)
+        # BACK è sempre presente, le altre opzioni finché il budget lo consente
+        if token_budget is not None and lines and used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+
+    prompt = header + "".join(lines)
+    omitted = len(options) - len(lines)
+    if omitted:
+        prompt += f"… altre {omitted} opzioni non mostrate\n"
+    last_code = option_id(len(lines) - 1)
+    single = len(last_code) == 1
+    prompt += f"\n💡 RISPOSTA RICHIESTA: Scrivi solo UN{'A lettera' if single else ' codice'} (A-{last_code})\n"
+    prompt += f"⚠️ NON aggiungere spiegazioni, scrivi solo {'la lettera scelta' if single else 'il codice scelto'}.\n\n"
+    return prompt, len(lines)
+
+def field_label(elem: dict) -> str:
+    """Nome del campo di testo come compare nel comando FILL"""
+    return elem.get('label', elem.get('text', elem.get('content_desc', 'Campo'))).split(' (')[0]
+
+def option_element(data: dict, command: str):
+    """element_id dell'elemento a cui si riferisce il comando (None per BACK e liste)"""
+    kind, _, target = command.partition(':')
+    lookup_index(data)  # assegna gli ID ai JSON prodotti prima degli element_id
+    for elem in data.get('elements', []):
+        if kind == "CLICK" and elem['clickable'] and not elem['editable'] and not elem.get('group') \
+                and button_label(elem) == target:
+            return elem['element_id']
+        if kind == "FILL_CUSTOM" and elem['editable'] and field_label(elem) == target:
+            return elem['element_id']
+    return None
+
+def option_table(data: dict, options: list) -> dict:
+    """Opzioni mostrate all'LLM come tabella codice → comando tipizzato:
+    {"B": {"command": "CLICK:Salva", "type": "CLICK", "target": "Salva", "needs_text": False,
+    "element": element_id dell'elemento}}. La risposta si risolve con una ricerca nel dizionario,
+    senza rileggere il testo del prompt (etichette con parentesi o a capo non danno problemi)."""
+    table = {}
+    for index, (command, _, _) in enumerate(options):
+        kind, _, target = command.partition(':')
+        needs_text = kind == "FILL_CUSTOM"
+        table[option_id(index)] = {
+            "command": f"FILL:{target}" if needs_text else command,
+            "type": "FILL" if needs_text else kind,
+            "target": target,
+            "needs_text": needs_text,
+            "element": option_element(data, command),
+        }
+    return table
+
+def plan_hint(plan_steps: int) -> str:
+    """Istruzioni per la risposta con un piano di più azioni (modalità pianificazione)"""
+    return (f"🧩 PIANO: puoi indicare fino a {plan_steps} codici separati da ';' (es. F:Mario;G:Rossi;C), "
+            "eseguiti in sequenza su QUESTA schermata. Usalo per compilare più campi e poi confermare; "
+            "l'azione che cambia schermata deve essere l'ultima.\n\n")
+
+def build_commands_fragment(data: dict) -> str:
+    """Sezione dei comandi disponibili (opzioni A, B, C...) senza limite di budget"""
+    return build_commands_section(build_screen_options(data))[0]
+
+def commands_fragment(data: dict) -> str:
+    """Sezione dei comandi della schermata (ordine di presentazione, senza budget)"""
+    return build_commands_section(screen_options(data))[0]
+
+def recent_history(history: list, is_first_iteration: bool = False) -> list:
+    """Finestra di cronologia inclusa nel prompt (vuota alla prima iterazione)"""
+    if is_first_iteration or not history:
+        return []
+    return history[-RECENT_HISTORY_WINDOW:]
+
+def compress_history(actions: list) -> list:
+    """Run-length della cronologia: azioni consecutive uguali (stesso esito) → [azione, esito, ripetizioni]"""
+    runs = []
+    for action_data in actions:
+        action = action_data.get('action', 'N/A')
+        success = action_data.get('success', True)  # Default True per retrocompatibilità
+        if runs and runs[-1][0] == action and runs[-1][1] == success:
+            runs[-1][2] += 1
+        else:
+            runs.append([action, success, 1])
+    return runs
+
+def build_history_section(recent_actions: list, token_budget: int = None):
+    """Sezione delle azioni recenti entro token_budget: se non basta, si scartano prima le azioni
+    riuscite più vecchie (quelle fallite sono le più utili da ricordare). Restituisce (testo, troncata)."""
+    if not recent_actions:
+        return "", False
+    runs = compress_history(recent_actions)
+    failed_count = sum(count for _, success, count in runs if not success)
+
+    def render(kept_runs, omitted):
+        text = "🚫 AZIONI RECENTI DA VARIARE:\n"
+        if omitted:
+            text += f"… {omitted} azioni precedenti omesse\n"
+        for action, success, count in kept_runs:
+            repeats = f" (×{count})" if count > 1 else ""
+            if not success:
+                text += f"❌ {action}{repeats} (FALLITA - NON RIPETERE!)\n"
+            else:
+                text += f"• {action}{repeats}\n"
+        if failed_count:
+            text += f"\n🚨 ATTENZIONE: {failed_count} azioni fallite sopra - NON ripeterle!\n"
+        text += "\n⚠️ Prova a scegliere qualcosa di diverso se possibile.\n\n"
+        return text
+
+    text = render(runs, 0)
+    truncated = False
+    while token_budget is not None and estimate_tokens(text) > token_budget and runs:
+        # Prima la più vecchia riuscita, poi (se servisse ancora spazio) la più vecchia in assoluto
+        drop = next((index for index, run in enumerate(runs) if run[1]), 0)
+        runs = runs[:drop] + runs[drop + 1:]
+        truncated = True
+        omitted = len(recent_actions) - sum(count for _, _, count in runs)
+        text = render(runs, omitted) if runs else ""
+    return text, truncated
+
+def build_visited_section(visited_activities: list, token_budget: int = None):
+    """Activity già esplorate entro token_budget: elenco completo se entra, altrimenti riassunto su
+    una riga con il conteggio. Restituisce (testo, riassunta)."""
+    if not visited_activities:
+        return "\n🆕 PRIMA ESPLORAZIONE - Nessuna activity ancora visitata\n", False
+    # Mostra solo il nome della classe per brevità
+    names = [activity.split('/')[-1] if '/' in activity else activity for activity in visited_activities]
+    text = "\n🏃‍♂️ ACTIVITY GIÀ ESPLORATE:\n"
+    text += "".join(f"✅ {name}\n" for name in names)
+    text += "🎯 OBIETTIVO: Esplora nuove sezioni non ancora visitate!\n"
+    if token_budget is None or estimate_tokens(text) <= token_budget:
+        return text, False
+
+    header = f"\n🏃‍♂️ ACTIVITY GIÀ ESPLORATE ({len(names)}): "
+    footer = "\n🎯 OBIETTIVO: Esplora nuove sezioni non ancora visitate!\n"
+    shown = []
+    for name in names:
+        candidate = ", ".join(shown + [name]) + f" (+{len(names) - len(shown) - 1} altre)"
+        if shown and estimate_tokens(header + candidate + footer) > token_budget:
+            break
+        shown.append(name)
+    others = len(names) - len(shown)
+    return header + ", ".join(shown) + (f" (+{others} altre)" if others else "") + footer, True
+
+def record_prompt_size(prompt: str, token_budget: int, shown_options: int, total_options: int, truncated: bool):
+    """Aggiorna PROMPT_STATS e stampa la dimensione stimata del prompt"""
+    tokens = estimate_tokens(prompt)
+    PROMPT_STATS["calls"] += 1
+    PROMPT_STATS["total_tokens"] += tokens
+    PROMPT_STATS["max_tokens"] = max(PROMPT_STATS["max_tokens"], tokens)
+    PROMPT_STATS["last_tokens"] = tokens
+    if truncated:
+        PROMPT_STATS["truncated"] += 1
+    if shown_options < total_options:
+        PROMPT_STATS["hidden_options"] += total_options - shown_options
+    budget = f"budget {token_budget}" if token_budget else "senza budget"
+    print(f"📏 Prompt: {tokens} token stimati ({budget}, opzioni {shown_options}/{total_options})", file=sys.stderr)
+
+def record_api_prompt_tokens(tokens):
+    """Token del prompt contati dall'API (usageMetadata.promptTokenCount)"""
+    if tokens:
+        PROMPT_STATS["api_prompt_tokens"] += tokens
+        PROMPT_STATS["api_calls"] += 1
+
+def prompt_stats() -> dict:
+    calls = PROMPT_STATS["calls"]
+    api_calls = PROMPT_STATS["api_calls"]
+    return {
+        "prompts": calls,
+        "avg_tokens": round(PROMPT_STATS["total_tokens"] / calls, 1) if calls else 0.0,
+        "max_tokens": PROMPT_STATS["max_tokens"],
+        "last_tokens": PROMPT_STATS["last_tokens"],
+        "truncated_prompts": PROMPT_STATS["truncated"],
+        "hidden_options": PROMPT_STATS["hidden_options"],
+        "avg_api_prompt_tokens": round(PROMPT_STATS["api_prompt_tokens"] / api_calls, 1) if api_calls else None,
+    }
+
+def generate_simple_prompt(json_file: str, is_first_iteration: bool = False,
+                           data: dict = None, history: list = None, coverage=None, session=None,
+                           snapshot=None, token_budget: int = None, plan_steps: int = 1, with_options: bool = False):
+    """Genera un prompt semplice che mostra gli elementi disponibili.
+    L'orchestratore passa dati, cronologia e coverage già in memoria per evitare riletture da disco.
+    Con token_budget le sezioni vengono ordinate per utilità e troncate per restare nel budget.
+    Con plan_steps > 1 l'LLM può rispondere con un piano di più azioni separate da ';'.
+    Con with_options restituisce (prompt, tabella delle opzioni mostrate, vedi option_table)."""
+    
+    if data is None:
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            raise Exception(f"Errore nel caricamento JSON: {e}")
+    
+    # Carica la cronologia delle azioni precedenti
+    if history is None:
+        history = load_action_history()
+    
+    # ✨ NUOVA FUNZIONALITÀ: Tracking Activity Coverage
+    current_activity = get_current_activity(session, data, snapshot)
+    if coverage is not None:
+        coverage.record(current_activity)
+    else:
+        save_current_activity(current_activity)  # Salva se nuova
+    
+    # Calcola e mostra coverage delle Activity
+    coverage_percentage, visited_count, total_count, status = calculate_activity_coverage(coverage)
     
     # ✨ INIZIO PROMPT CON INFORMAZIONI DINAMICHE
     prompt = ""
@@ -438,12 +704,13 @@ def generate_simple_prompt(json_file: str, is_first_iteration: bool = False) ->
     prompt += "📊 STATO ESPLORAZIONE APP:\n"
     
     # ✨ VERIFICA SE ACTIVITY È DELL'APP TARGET
-    target_package = ""
-    try:
-        with open("test/coverage/current_package.txt", 'r') as f:
-            target_package = f.read().strip()
-    except Exception:
-        pass
+    target_package = coverage.package if coverage is not None else ""
+    if coverage is None:
+        try:
+            with open("test/coverage/current_package.txt", 'r') as f:
+                target_package = f.read().strip()
+        except Exception:
+            pass
     
     # Controlla se l'activity corrente appartiene all'app target
     is_external_activity = target_package and not current_activity.startswith(target_package)
@@ -495,95 +762,33 @@ def generate_simple_prompt(json_file: str, is_first_iteration: bool = False) ->
     else:
         prompt += f"⚠️ Coverage Status: {status}\n"
     
-    # ✨ AGGIUNGI LISTA ACTIVITY ESPLORATE
-    visited_activities = load_visited_activities()
-    if visited_activities:
-        prompt += "\n🏃‍♂️ ACTIVITY GIÀ ESPLORATE:\n"
-        for activity in visited_activities:
-            # Mostra solo il nome della classe per brevità
-            activity_name = activity.split('/')[-1] if '/' in activity else activity
-            prompt += f"✅ {activity_name}\n"
-        prompt += "🎯 OBIETTIVO: Esplora nuove sezioni non ancora visitate!\n"
-    else:
-        prompt += "\n🆕 PRIMA ESPLORAZIONE - Nessuna activity ancora visitata\n"
-    
-    prompt += "\n"
-    
+    # Budget: i comandi hanno una quota fissa (la mappatura codice → comando non dipende dal resto
+    # del prompt, così resta valida per la cache delle decisioni); la cronologia usa il resto e la
+    # lista delle Activity esplorate, la meno utile, quello che avanza
+    ranked_options = rank_options(screen_options(data), recent_history(history, is_first_iteration))
+    commands_budget = int(token_budget * COMMANDS_SHARE) if token_budget else None
+    commands_section, shown_options = build_commands_section(ranked_options, commands_budget)
+    if plan_steps > 1:
+        commands_section += plan_hint(plan_steps)
+    remaining = token_budget - estimate_tokens(prompt) - estimate_tokens(commands_section) if token_budget else None
+
+    # Con più dispositivi in parallelo include anche le Activity scoperte dagli altri
+    visited_activities = coverage.all_explored() if coverage is not None else load_visited_activities()
+    visited_reserve = min(VISITED_SUMMARY_TOKENS, max(remaining, 0)) if remaining is not None else None
+
     # Aggiungi cronologia solo se NON è la prima iterazione
-    if not is_first_iteration and history:
-        prompt += "🚫 AZIONI RECENTI DA VARIARE:\n"
-        recent_actions = history[-20:]  # Ultime 20 azioni per contesto molto ampio
-        
-        failed_actions = []
-        successful_actions = []
-        
-        for action_data in recent_actions:
-            action = action_data.get('action', 'N/A')
-            success = action_data.get('success', True)  # Default True per retrocompatibilità
-            
-            if not success:
-                failed_actions.append(action)
-                prompt += f"❌ {action} (FALLITA - NON RIPETERE!)\n"
-            else:
-                successful_actions.append(action)
-                prompt += f"• {action}\n"
-        
-        if failed_actions:
-            prompt += f"\n🚨 ATTENZIONE: {len(failed_actions)} azioni fallite sopra - NON ripeterle!\n"
-        
-        prompt += "\n⚠️ Prova a scegliere qualcosa di diverso se possibile.\n\n"
-    
-    prompt += "📱 COMANDI DISPONIBILI - SCEGLI UNO:\n\n"
+    recent_actions = recent_history(history, is_first_iteration)  # Ultime 20 azioni per contesto molto ampio
+    history_section, history_truncated = build_history_section(
+        recent_actions, remaining - visited_reserve if remaining is not None else None)
+    if remaining is not None:
+        remaining -= estimate_tokens(history_section)
+    visited_section, visited_truncated = build_visited_section(visited_activities, remaining)
 
-    command_options = [] # Lista dei comandi disponibili
-    option_letter = 'A'
-    
-    # Aggiunta del tasto BACK tra le opzioni
-    command_options.append("BACK")
-    prompt += f"{option_letter}. BACK (torna alla schermata precedente)\n"
-    option_letter = chr(ord(option_letter) + 1)
-    
-    # Aggiungi comandi CLICK per i bottoni con prioritizzazione intelligente
-    if buttons:
-        # Prioritizza bottoni importanti
-        priority_keywords = ["salva", "save", "ok", "conferma", "annulla", "cancel", "indietro", "back", "fine", "done"]
-        
-        # Separa bottoni prioritari e normali
-        priority_buttons = []
-        normal_buttons = []
-        
-        for button in buttons:
-            button_lower = button.lower()
-            if any(keyword in button_lower for keyword in priority_keywords):
-                priority_buttons.append(button)
-            else:
-                normal_buttons.append(button)
-        
-        # Combina prioritari + normali, senza limite (mostra tutti)
-        selected_buttons = priority_buttons + normal_buttons
-        
-        for button in selected_buttons:  # Mostra tutti i bottoni
-            command = f"CLICK:{button}"
-            command_options.append(command)
-            prompt += f"{option_letter}. {command}\n"
-            option_letter = chr(ord(option_letter) + 1)
-    
-    # Aggiungi comandi FILL per i campi di testo
-    if text_fields:
-        for field in text_fields[:10]:  # Max 10 campi (aumentato da 5)
-            clean_field = field.split(' (')[0]  # Rimuovi (VUOTO)/(COMPILATO)
-            
-            # Aggiungi solo opzione per testo personalizzato 
-            if option_letter <= 'Z':
-                command = f"FILL_CUSTOM:{clean_field}"
-                command_options.append(command)
-                prompt += f"{option_letter}. FILL_CUSTOM:{clean_field} (scrivi {option_letter}:TuoTesto)\n"
-                option_letter = chr(ord(option_letter) + 1)
-
-    prompt += f"\n💡 RISPOSTA RICHIESTA: Scrivi solo UNA lettera (A-{chr(ord(option_letter)-1)})\n"
-    
-    prompt += "⚠️ NON aggiungere spiegazioni, scrivi solo la lettera scelta.\n\n"
-     
+    prompt += visited_section + "\n" + history_section + commands_section
+    record_prompt_size(prompt, token_budget, shown_options, len(ranked_options),
+                       history_truncated or visited_truncated or shown_options < len(ranked_options))
+    if with_options:
+        return prompt, option_table(data, ranked_options[:shown_options])
     return prompt
 
 def main():
@@ -4,22 +4,38 @@ LogiDroid Random Action Injector
 Sistema di iniezione azioni casuali per rompere pattern monotoni dell'LLM
 """
 
+import json
 import random
-import subprocess
-import time
 import os
 from datetime import datetime
 
+from adb_session import get_session
+from capture import ScreenCapture
+from ui_settle import UISettleDetector
+from workspace import default_workspace
+
 class RandomActionInjector:
-    def __init__(self, frequency=6):
+    def __init__(self, frequency=6, config=None, session=None, settle=None, capture=None, workspace=None,
+                 store=None):
         """
         Inizializza il sistema di random injection
         
         Args:
             frequency (int): Ogni quante iterazioni iniettare azione random
+            config (dict): Configurazione già caricata (se None legge config.json)
+            session (AdbSession): Sessione adb persistente (se None usa quella condivisa)
+            settle (UISettleDetector): Rilevatore di UI stabile usato dopo le azioni
+            capture (ScreenCapture): Cattura della gerarchia UI (se None ne crea una)
+            workspace (Workspace): Cartelle della sessione (se None usa test/)
+            store (RunStore): Database dell'esecuzione (se None la cronologia va su file)
         """
         # Carica configurazione da config.json
-        self.config = self._load_config()
+        self.config = config if config is not None else self._load_config()
+        self.workspace = workspace or default_workspace()
+        self.store = store
+        self.session = session or get_session()
+        self.settle = settle or UISettleDetector(self.session, self.config)
+        self.capture = capture or ScreenCapture(self.session, self.config)
         
         # Usa configurazione da file se disponibile, altrimenti usa parametro
         random_config = self.config.get("random_injection", {})
@@ -29,6 +45,9 @@ class RandomActionInjector:
         # Carica contatore persistente
         self.action_count = self._load_action_count()
         
+        # Dati JSON dell'ultima schermata catturata da full_random_cycle
+        self.last_screen_data = None
+        
         # Lista azioni configurabile - Solo swipe verticali
         default_actions = ["SWIPE_UP", "SWIPE_DOWN"]
         self.random_actions = random_config.get("actions", default_actions)
@@ -42,7 +61,7 @@ class RandomActionInjector:
     def _load_action_count(self):
         """Carica il contatore persistente dalle iterazioni precedenti"""
         try:
-            count_file = "test/prompts/random_action_count.txt"
+            count_file = self.workspace.random_count_file
             if os.path.exists(count_file):
                 with open(count_file, 'r') as f:
                     count = int(f.read().strip())
@@ -54,7 +73,7 @@ class RandomActionInjector:
     def _save_action_count(self):
         """Salva il contatore per la prossima iterazione"""
         try:
-            count_file = "test/prompts/random_action_count.txt"
+            count_file = self.workspace.random_count_file
             os.makedirs(os.path.dirname(count_file), exist_ok=True)
             with open(count_file, 'w') as f:
                 f.write(str(self.action_count))
@@ -64,7 +83,6 @@ class RandomActionInjector:
     def _load_config(self):
         """Carica configurazione da config.json"""
         try:
-            import json
             with open('config.json', 'r', encoding='utf-8') as f:
                 return json.load(f)
         except:
@@ -118,41 +136,46 @@ class RandomActionInjector:
         try:
             if action == "SWIPE_UP":
                 # Swipe dal centro-basso verso centro-alto
-                subprocess.run(["adb", "shell", "input", "swipe", "540", "1500", "540", "500"], check=True)
+                if not self.session.swipe(540, 1500, 540, 500):
+                    print(f"❌ Error executing random action {action}")
+                    return False
                 print("⬆️ Executed: SWIPE UP")
                 
             elif action == "SWIPE_DOWN":
                 # Swipe dal centro-alto verso centro-basso
-                subprocess.run(["adb", "shell", "input", "swipe", "540", "500", "540", "1500"], check=True)
+                if not self.session.swipe(540, 500, 540, 1500):
+                    print(f"❌ Error executing random action {action}")
+                    return False
                 print("⬇️ Executed: SWIPE DOWN")
                 
             else:
                 print(f"❌ Unknown random action: {action}")
                 return False
                 
-            # Attesa per stabilizzazione UI dopo azione random
+            # Attesa per stabilizzazione UI dopo azione random (3s solo come fallback)
             print("⏳ Waiting for UI stabilization after random action...")
-            time.sleep(3)  # 3 secondi per stabilizzazione
+            waited = self.settle.wait(fallback=3)
+            print(f"✅ UI stable after {waited:.2f}s")
             
             return True
             
-        except subprocess.CalledProcessError as e:
-            print(f"❌ Error executing random action {action}: {e}")
-            return False
         except Exception as e:
             print(f"❌ Unexpected error in random action {action}: {e}")
             return False
     
-    def full_random_cycle(self):
+    def full_random_cycle(self, history=None):
         """
         Esegue un ciclo completo di random injection:
         1. Seleziona azione random
         2. Esegue l'azione
         3. Cattura nuova schermata
-        4. Converte in JSON
+        4. Converte in JSON (nello stesso processo) e rileva l'Activity, in un unico ScreenSnapshot
+        
+        Args:
+            history (list): Cronologia in memoria da aggiornare (opzionale)
         
         Returns:
-            str: Path al nuovo file JSON generato, None se errore
+            ScreenSnapshot: Nuova schermata (json_file, data, Activity), None se errore
         """
         print("🎲 " + "="*50)
         print("🎲 STARTING RANDOM INJECTION CYCLE")
@@ -166,71 +189,74 @@ class RandomActionInjector:
             return None
         
         # 2. Cattura nuova schermata dopo azione random
-        timestamp = int(time.time())
-        xml_file = f"test/xml/random_{timestamp}.xml"
-        json_file = f"test/json/result_random_{timestamp}.json"
+        stamp = self.workspace.stamp()
+        xml_file, json_file = self.workspace.artifact_paths("random", stamp)
+        screenshot_file = self.workspace.screenshot_path(stamp)
         
         print("📸 Capturing new screen after random action...")
         
         try:
-            # Cattura XML
-            subprocess.run(["adb", "shell", "uiautomator", "dump", "/sdcard/ui_dump_random.xml"], check=True)
-            subprocess.run(["adb", "pull", "/sdcard/ui_dump_random.xml", xml_file], check=True)
-            
-            # Conversione XML → JSON
-            subprocess.run(["python3", "xml_to_json.py", xml_file, json_file], check=True)
+            # Gerarchia, screenshot e Activity insieme: chi usa la schermata non interroga di nuovo il device
+            snapshot = self.capture.snapshot(xml_file, json_file, screenshot_file,
+                                             device_path="/sdcard/ui_dump_random.xml")
+            if snapshot.data is None:
+                print("❌ Error capturing screen after random action: UI dump failed")
+                return None
+            self.last_screen_data = snapshot.data
             
             print(f"✅ Random cycle completed! New screen: {json_file}")
             
             # Reset action count per evitare random consecutivi
             self.action_count = 0
+            self._save_action_count()
             
             # Salva azione random nella history per l'LLM
-            self._save_random_action_to_history(random_action)
+            self._save_random_action_to_history(random_action, history)
             
-            return json_file
+            return snapshot
             
-        except subprocess.CalledProcessError as e:
-            print(f"❌ Error capturing screen after random action: {e}")
-            return None
         except Exception as e:
             print(f"❌ Unexpected error in random cycle: {e}")
             return None
     
-    def _save_random_action_to_history(self, action):
+    def _save_random_action_to_history(self, action, history=None):
         """
         Salva l'azione random nella cronologia per l'LLM
         
         Args:
             action (str): Azione random eseguita
+            history (list): Cronologia in memoria (se None viene letta dal file)
         """
         try:
-            import json
-            
-            history_file = "test/prompts/action_history.json"
+            history_file = self.workspace.history_file
             os.makedirs(os.path.dirname(history_file), exist_ok=True)
             
             # Carica cronologia esistente
-            history = []
-            if os.path.exists(history_file):
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    history = json.load(f)
+            if history is None:
+                history = self.store.history() if self.store is not None else []
+                if self.store is None and os.path.exists(history_file):
+                    with open(history_file, 'r', encoding='utf-8') as f:
+                        history = json.load(f)
             
             # Aggiungi azione random
-            history.append({
+            entry = {
                 "timestamp": datetime.now().isoformat(),
                 "action": f"RANDOM:{action}",
                 "success": True,
                 "screen": f"Random action executed: {action}"
-            })
+            }
+            history.append(entry)
             
             # Mantieni solo le ultime 100 azioni (backup più ampio)
             if len(history) > 100:
-                history = history[-100:]
+                del history[:-100]
             
-            # Salva cronologia aggiornata
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, indent=2, ensure_ascii=False)
+            # Salva cronologia aggiornata (una riga nel database, oppure riscrittura del file)
+            if self.store is not None:
+                self.store.record_action(entry["action"], True, entry["screen"], timestamp=entry["timestamp"])
+            else:
+                with open(history_file, 'w', encoding='utf-8') as f:
+                    json.dump(history, f, indent=2, ensure_ascii=False)
                 
             print(f"💾 Random action saved to history: RANDOM:{action}")
             
@@ -255,7 +281,7 @@ if __name__ == "__main__":
         if injector.should_inject_random():
             result = injector.full_random_cycle()
             if result:
-                print(f"✅ Random cycle successful: {result}")
+                print(f"✅ Random cycle successful: {result.json_file}")
             else:
                 print("❌ Random cycle failed")
         else:
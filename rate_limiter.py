@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Rate Limiter
+Limite delle richieste all'LLM con finestra scorrevole di 60 secondi per API key,
+condiviso tra processi diversi (più esecuzioni o più dispositivi in parallelo) tramite
+un file di stato protetto da lock (fcntl). Rispetta sia le richieste al minuto (RPM)
+sia i token al minuto (TPM), così si può usare tutta la quota senza superarla.
+
+Dopo un errore 429 (o 503) la pausa richiesta dal server (Retry-After o retryDelay di
+Gemini) viene registrata nello stato condiviso: anche gli altri processi aspettano.
+In assenza di indicazioni si usa un backoff esponenziale con jitter.
+
+Configurazione (config.json):
+    rate_limit_delay  - secondi tra due chiamate; se "rpm" non è indicato, rpm = 60 / rate_limit_delay
+    rate_limit:
+        rpm           - richieste al minuto per API key (default: 60 / rate_limit_delay)
+        tpm           - token al minuto per API key (default: 1000000, 0 = nessun limite)
+        min_interval  - intervallo minimo tra due richieste in secondi (default: 0)
+        max_retries   - tentativi aggiuntivi dopo 429/503 (default: 5)
+        backoff_base  - primo intervallo di backoff in secondi (default: 1)
+        backoff_max   - backoff massimo in secondi (default: 60)
+        state_dir     - cartella del file di stato condiviso (default: test/cache/rate_limit)
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: il lock resta valido solo tra i thread dello stesso processo
+    fcntl = None
+
+WINDOW_SECONDS = 60
+DEFAULT_STATE_DIR = "test/cache/rate_limit"
+RETRYABLE_STATUS = (429, 503)
+
+# Statistiche condivise da tutti i limiter del processo (per il report finale)
+RATE_LIMIT_STATS = {
+    "requests": 0,
+    "wait_seconds": 0.0,
+    "throttled": 0,
+    "retries": 0,
+    "rate_limited_responses": 0,
+}
+
+
+def rate_limit_stats():
+    """Copia arrotondata delle statistiche del limiter"""
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in RATE_LIMIT_STATS.items()}
+
+
+def estimate_tokens(text):
+    """Stima grossolana dei token di un testo (circa 4 caratteri per token)"""
+    return max(1, len(text or "") // 4)
+
+
+def parse_retry_after(value):
+    """Secondi indicati da un header Retry-After (numero di secondi o data HTTP), None se assente"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay_from_body(body):
+    """Pausa suggerita da Gemini nel corpo dell'errore (RetryInfo.retryDelay, es. "37s")"""
+    try:
+        details = body.get("error", {}).get("details", [])
+    except AttributeError:
+        return None
+    for detail in details:
+        match = re.match(r'^(\d+(?:\.\d+)?)s$', str(detail.get("retryDelay", "")))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Backoff esponenziale con jitter completo: uniforme in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RateLimiter:
+    """Finestra scorrevole RPM/TPM per una API key, condivisa tra processi"""
+
+    def __init__(self, api_key, config=None):
+        config = config or {}
+        limit_config = config.get("rate_limit", {})
+        delay = config.get("rate_limit_delay", 4)
+        self.rpm = limit_config.get("rpm", int(WINDOW_SECONDS / delay) if delay else 0)
+        self.tpm = limit_config.get("tpm", 1000000)
+        self.min_interval = limit_config.get("min_interval", 0)
+        self.max_retries = limit_config.get("max_retries", 5)
+        self.backoff_base = limit_config.get("backoff_base", 1.0)
+        self.backoff_max = limit_config.get("backoff_max", 60.0)
+
+        state_dir = limit_config.get("state_dir", DEFAULT_STATE_DIR)
+        key_id = hashlib.sha1((api_key or "").encode('utf-8')).hexdigest()[:12]
+        self.state_file = os.path.join(state_dir, f"{key_id}.json")
+        self.lock_file = os.path.join(state_dir, f"{key_id}.lock")
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked_state(self):
+        """Lock esclusivo (thread + processi) sullo stato condiviso; salva lo stato all'uscita"""
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        with self._thread_lock, open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = self._read_state()
+                yield state
+                temp_file = f"{self.state_file}.{os.getpid()}.tmp"
+                with open(temp_file, 'w') as f:
+                    json.dump(state, f)
+                os.replace(temp_file, self.state_file)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        now = time.time()
+        state["requests"] = [r for r in state.get("requests", []) if now - r[0] < WINDOW_SECONDS]
+        state.setdefault("blocked_until", 0)
+        return state
+
+    def _wait_time(self, state, tokens, now):
+        """Secondi da attendere prima di poter inviare una richiesta da 'tokens' token (0 = subito)"""
+        requests = state["requests"]
+        wait = max(0.0, state["blocked_until"] - now)
+        if requests and self.min_interval:
+            wait = max(wait, requests[-1][0] + self.min_interval - now)
+        if self.rpm and len(requests) >= self.rpm:
+            # Si libera un posto quando scade la richiesta più vecchia oltre il limite
+            wait = max(wait, requests[len(requests) - self.rpm][0] + WINDOW_SECONDS - now)
+        if self.tpm:
+            used = sum(r[1] for r in requests)
+            for request in requests:
+                timestamp, request_tokens = request[0], request[1]
+                if used + tokens <= self.tpm:
+                    break
+                used -= request_tokens
+                wait = max(wait, timestamp + WINDOW_SECONDS - now)
+        return wait
+
+    def acquire(self, tokens=1):
+        """Attende finché la richiesta rientra nei limiti, poi la registra.
+        Restituisce l'id della richiesta da passare a record_usage() a risposta ricevuta."""
+        waited = 0.0
+        request_id = uuid.uuid4().hex
+        while True:
+            with self._locked_state() as state:
+                now = time.time()
+                wait = self._wait_time(state, tokens, now)
+                if wait <= 0:
+                    # [timestamp, token, id]: l'id distingue le chiamate sovrapposte (anche di altri processi)
+                    state["requests"].append([now, tokens, request_id])
+                    break
+            if waited == 0:
+                RATE_LIMIT_STATS["throttled"] += 1
+                print(f"⏳ Rate limiting: aspetto {wait:.1f}s per rispettare i limiti API...")
+            # Riprova dopo l'attesa (nel frattempo altri processi possono aver usato la quota)
+            time.sleep(min(wait, 5.0))
+            waited += min(wait, 5.0)
+        RATE_LIMIT_STATS["requests"] += 1
+        RATE_LIMIT_STATS["wait_seconds"] += waited
+        return request_id
+
+    def record_usage(self, request_id, actual_tokens):
+        """Sostituisce la stima dei token della richiesta request_id (restituito da acquire()) con il consumo
+        reale riportato dall'API; se la richiesta è già uscita dalla finestra non c'è nulla da correggere"""
+        if not actual_tokens or request_id is None:
+            return
+        with self._locked_state() as state:
+            for request in reversed(state["requests"]):
+                if len(request) > 2 and request[2] == request_id:
+                    request[1] = actual_tokens
+                    break
+
+    def penalize(self, delay):
+        """Blocca tutte le richieste per questa API key (anche degli altri processi) per 'delay' secondi"""
+        with self._locked_state() as state:
+            state["blocked_until"] = max(state["blocked_until"], time.time() + delay)
+
+    def retry_delay(self, attempt, response=None):
+        """Pausa prima del tentativo successivo: Retry-After/retryDelay del server, altrimenti backoff con jitter"""
+        delay = None
+        if response is not None:
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                try:
+                    delay = retry_delay_from_body(response.json())
+                except ValueError:
+                    delay = None
+        if delay is None:
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        return delay
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key, config=None):
+    """Restituisce il limiter condiviso per la API key indicata"""
+    with _limiters_lock:
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            limiter = RateLimiter(api_key, config)
+            _limiters[api_key] = limiter
+        return limiter
+
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Run Store
+Stato delle esecuzioni in un unico database SQLite (modalità WAL): azioni ed esiti,
+visite alle Activity, fingerprint delle schermate e tempi delle fasi. Ogni scrittura è
+un INSERT indicizzato, invece di rileggere e riscrivere per intero action_history.json
+ad ogni iterazione.
+
+Più processi (parallel_runner.py) possono scrivere sullo stesso database: WAL permette
+letture concorrenti e le scritture attendono il lock (busy_timeout) invece di fallire.
+Nello stesso processo la connessione è protetta da un lock (il tracker logcat scrive
+da un altro thread).
+
+I file storici (action_history.json, last_action.txt, explored_activities.txt,
+all_activities.txt) si generano con export(), a fine test oppure da riga di comando:
+
+    python3 run_store.py export [--run ID] [--workspace test]
+    python3 run_store.py stats
+
+Configurazione (config.json, sezione "run_store"):
+    enabled - registra lo stato nel database (default: true)
+    path    - file del database (default: test/cache/run_state.db)
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from workspace import Workspace
+
+DEFAULT_DB_FILE = "test/cache/run_state.db"
+HISTORY_LIMIT = 100
+BUSY_TIMEOUT_MS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    serial TEXT,
+    package TEXT,
+    workspace TEXT,
+    started_at REAL,
+    ended_at REAL
+);
+CREATE INDEX IF NOT EXISTS runs_workspace ON runs (workspace, id);
+
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    ts TEXT NOT NULL,
+    action TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    screen TEXT,
+    fingerprint TEXT,
+    activity TEXT
+);
+CREATE INDEX IF NOT EXISTS actions_run ON actions (run_id, id);
+CREATE INDEX IF NOT EXISTS actions_fingerprint ON actions (fingerprint, action);
+
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    activity TEXT NOT NULL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS visits_run ON visits (run_id, activity);
+
+CREATE TABLE IF NOT EXISTS explored (
+    run_id INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (run_id, activity)
+);
+
+CREATE TABLE IF NOT EXISTS app_activities (
+    run_id INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    PRIMARY KEY (run_id, activity)
+);
+
+CREATE TABLE IF NOT EXISTS screens (
+    fingerprint TEXT PRIMARY KEY,
+    activity TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    visits INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS timings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    name TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS timings_run ON timings (run_id, name);
+"""
+
+
+class RunStore:
+    """Database delle esecuzioni: una connessione per processo, condivisa tra i thread"""
+
+    def __init__(self, path=DEFAULT_DB_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        with self._lock:
+            self._db.executescript(SCHEMA)
+        self.run_id = None
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # Esecuzioni
+    def last_run(self, workspace):
+        """Ultima esecuzione registrata per il workspace (None se non ce ne sono)"""
+        rows = self._query("SELECT id FROM runs WHERE workspace = ? ORDER BY id DESC LIMIT 1", (workspace,))
+        return rows[0][0] if rows else None
+
+    def start_run(self, serial=None, package=None, workspace=None, resume=False):
+        """Registra una nuova esecuzione, oppure riprende l'ultima del workspace (test interrotto)"""
+        if resume:
+            run_id = self.last_run(workspace)
+            if run_id is not None:
+                self.run_id = run_id
+                self._execute("UPDATE runs SET ended_at = NULL WHERE id = ?", (self.run_id,))
+                return self.run_id
+        cursor = self._execute("INSERT INTO runs (serial, package, workspace, started_at) VALUES (?, ?, ?, ?)",
+                               (serial, package, workspace, time.time()))
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def end_run(self):
+        self._execute("UPDATE runs SET ended_at = ? WHERE id = ?", (time.time(), self.run_id))
+
+    # Scritture (una riga, O(1))
+    def record_action(self, action, success=True, screen="", fingerprint=None, activity=None, timestamp=None):
+        self._execute("INSERT INTO actions (run_id, ts, action, success, screen, fingerprint, activity) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      (self.run_id, timestamp or datetime.now().isoformat(), action, int(bool(success)),
+                       screen, fingerprint, activity))
+
+    def record_visit(self, activity, source="snapshot"):
+        """Registra una visita; restituisce True se l'Activity è nuova per l'esecuzione"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT INTO visits (run_id, ts, activity, source) VALUES (?, ?, ?, ?)",
+                             (self.run_id, now, activity, source))
+            cursor = self._db.execute("INSERT OR IGNORE INTO explored (run_id, activity, first_seen) VALUES (?, ?, ?)",
+                                      (self.run_id, activity, now))
+            return cursor.rowcount == 1
+
+    def set_app_activities(self, activities):
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM app_activities WHERE run_id = ?", (self.run_id,))
+            self._db.executemany("INSERT OR IGNORE INTO app_activities (run_id, activity) VALUES (?, ?)",
+                                 [(self.run_id, activity) for activity in activities])
+            self._db.execute("COMMIT")
+
+    def record_screen(self, fingerprint, activity=None):
+        if not fingerprint:
+            return
+        now = time.time()
+        self._execute("INSERT INTO screens (fingerprint, activity, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                      "ON CONFLICT(fingerprint) DO UPDATE SET last_seen = excluded.last_seen, "
+                      "visits = visits + 1, activity = COALESCE(excluded.activity, activity)",
+                      (fingerprint, activity, now, now))
+
+    def record_timing(self, name, seconds):
+        self._execute("INSERT INTO timings (run_id, ts, name, seconds) VALUES (?, ?, ?, ?)",
+                      (self.run_id, time.time(), name, seconds))
+
+    # Letture indicizzate
+    def history(self, run_id=None, limit=HISTORY_LIMIT):
+        """Ultime azioni dell'esecuzione nel formato di action_history.json"""
+        rows = self._query("SELECT ts, action, success, screen FROM actions WHERE run_id = ? "
+                           "ORDER BY id DESC LIMIT ?", (run_id or self.run_id, limit))
+        return [{"timestamp": ts, "action": action, "success": bool(success), "screen": screen}
+                for ts, action, success, screen in reversed(rows)]
+
+    def explored(self, run_id=None):
+        rows = self._query("SELECT activity FROM explored WHERE run_id = ? ORDER BY first_seen, rowid",
+                           (run_id or self.run_id,))
+        return [row[0] for row in rows]
+
+    def app_activities(self, run_id=None):
+        rows = self._query("SELECT activity FROM app_activities WHERE run_id = ? ORDER BY activity",
+                           (run_id or self.run_id,))
+        return [row[0] for row in rows]
+
+    def screen_visits(self, fingerprint):
+        rows = self._query("SELECT visits FROM screens WHERE fingerprint = ?", (fingerprint,))
+        return rows[0][0] if rows else 0
+
+    def timing_stats(self, run_id=None):
+        """Media e totale per fase: {nome: {"count", "avg_ms", "total_s"}}"""
+        rows = self._query("SELECT name, COUNT(*), AVG(seconds), SUM(seconds) FROM timings WHERE run_id = ? "
+                           "GROUP BY name", (run_id or self.run_id,))
+        return {name: {"count": count, "avg_ms": round(avg * 1000, 1), "total_s": round(total, 2)}
+                for name, count, avg, total in rows}
+
+    def runs(self):
+        return self._query("SELECT id, serial, package, workspace, started_at, ended_at FROM runs ORDER BY id")
+
+    # Compatibilità con i file storici
+    def export(self, workspace, run_id=None):
+        """Scrive i file storici di un'esecuzione nel workspace indicato"""
+        run_id = run_id or self.run_id
+        workspace.create_dirs()
+        history = self.history(run_id)
+        with open(workspace.history_file, 'w', encoding='utf-8') as f:
+            json.dump(history, f, indent=2, ensure_ascii=False)
+        if history:
+            last = history[-1]
+            status_text = "SUCCESS" if last["success"] else f"ERROR: {last['screen'].replace('ERRORE: ', '', 1)}"
+            with open(workspace.last_action_file, 'w') as f:
+                f.write(f"{last['action']} | {status_text}")
+        with open(workspace.explored_activities_file, 'w', encoding='utf-8') as f:
+            for activity in self.explored(run_id):
+                f.write(f"{activity}\n")
+        app_activities = self.app_activities(run_id)
+        if app_activities:
+            with open(workspace.all_activities_file, 'w', encoding='utf-8') as f:
+                for activity in app_activities:
+                    f.write(f"{activity}\n")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_run_store(config=None):
+    """Store condiviso dal processo (None se disattivato in config)"""
+    store_config = (config or {}).get("run_store", {})
+    if not store_config.get("enabled", True):
+        return None
+    path = store_config.get("path", DEFAULT_DB_FILE)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = RunStore(path)
+            _stores[path] = store
+        return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogiDroid - database delle esecuzioni")
+    parser.add_argument("command", choices=["export", "stats"])
+    parser.add_argument("--db", default=DEFAULT_DB_FILE, help=f"File del database (default: {DEFAULT_DB_FILE})")
+    parser.add_argument("--run", type=int, help="Esecuzione da esportare (default: l'ultima del workspace)")
+    parser.add_argument("--workspace", default="test", help="Workspace di destinazione (default: test)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Database non trovato: {args.db}")
+        return 1
+    store = RunStore(args.db)
+
+    if args.command == "stats":
+        for run_id, serial, package, workspace, started_at, ended_at in store.runs():
+            started = datetime.fromtimestamp(started_at).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"#{run_id} {started} {package or '-'} [{serial or '-'}] {workspace} - "
+                  f"{len(store.history(run_id, limit=-1))} azioni, {len(store.explored(run_id))} Activity")
+            for name, stats in store.timing_stats(run_id).items():
+                print(f"    {name}: {stats['count']}× {stats['avg_ms']}ms")
+        return 0
+
+    run_id = args.run or store.last_run(args.workspace)
+    if run_id is None:
+        print(f"❌ Nessuna esecuzione per il workspace {args.workspace}")
+        return 1
+    store.export(Workspace(args.workspace), run_id)
+    print(f"✓ Esecuzione #{run_id} esportata in {args.workspace}/")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Screen Cache
+Fingerprint deterministico della schermata e cache delle conversioni indirizzata per contenuto.
+
+Il fingerprint è lo SHA-1 della gerarchia UI normalizzata: gli attributi volatili
+(focus, orari dell'orologio) vengono rimossi dai byte del dump prima dell'hash, così la
+stessa schermata ha lo stesso fingerprint tra iterazioni e tra esecuzioni diverse.
+Se il fingerprint è già in cache, la cattura restituisce gli elementi già convertiti
+(e il frammento di prompt già costruito) senza chiamare xml_to_json.
+
+Configurazione (config.json, sezione "capture"):
+    cache_size - numero di schermate mantenute in cache (default: 64, 0 disattiva la cache)
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 64
+
+# Attributi che cambiano senza che cambi la schermata
+VOLATILE_ATTRIBUTE = re.compile(rb'\sfocused="[^"]*"')
+# Orari (12:34, 12:34:56, 9:05 PM) nel testo e nelle descrizioni: l'orologio non cambia la schermata
+CLOCK_TEXT = re.compile(rb'\b\d{1,2}:\d{2}(?::\d{2})?(?:\s?[AaPp]\.?[Mm]\.?)?\b')
+TEXT_ATTRIBUTE = re.compile(rb'\s(?:text|content-desc)="[^"]*"')
+
+
+def _mask_clock(match):
+    return CLOCK_TEXT.sub(b'#:#', match.group(0))
+
+
+def normalize_hierarchy(xml_bytes):
+    """Rimuove dal dump gli attributi volatili (focus) e maschera gli orari nei testi"""
+    normalized = VOLATILE_ATTRIBUTE.sub(b'', xml_bytes)
+    return TEXT_ATTRIBUTE.sub(_mask_clock, normalized)
+
+
+def screen_fingerprint(xml_bytes):
+    """Fingerprint stabile (SHA-1 esadecimale) della gerarchia normalizzata"""
+    return hashlib.sha1(normalize_hierarchy(bytes(xml_bytes))).hexdigest()
+
+
+def elements_fingerprint(elements):
+    """Fingerprint stabile di una lista di elementi già convertiti (quando il dump XML non è disponibile)"""
+    key = [(e.get('type'), e.get('resource_id'), e.get('text'), e.get('content_desc')) for e in elements]
+    payload = json.dumps(key, ensure_ascii=False)
+    return hashlib.sha1(CLOCK_TEXT.sub(b'#:#', payload.encode('utf-8'))).hexdigest()
+
+
+def layout_fingerprint(elements):
+    """Fingerprint della struttura della schermata, senza il contenuto dei campi di testo:
+    resta invariato quando si compila un campo (serve a verificare i piani di più azioni)"""
+    key = [(e.get('type'), e.get('resource_id'), None if e.get('editable') else e.get('text'), e.get('content_desc'))
+           for e in elements]
+    payload = json.dumps(key, ensure_ascii=False)
+    return hashlib.sha1(CLOCK_TEXT.sub(b'#:#', payload.encode('utf-8'))).hexdigest()
+
+
+class ConversionCache:
+    """Cache LRU: fingerprint → dati JSON convertiti ed eventuale frammento di prompt"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.last_fingerprint = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint):
+        """Restituisce i dati convertiti per il fingerprint (None se assenti)"""
+        with self._lock:
+            self.last_fingerprint = fingerprint
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return entry['data']
+
+    def put(self, fingerprint, data):
+        with self._lock:
+            self.last_fingerprint = fingerprint
+            if self.max_entries <= 0:
+                return
+            self._entries[fingerprint] = {'data': data, 'fragment': None}
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def fragment(self, fingerprint, build):
+        """Frammento di prompt della schermata: costruito con build() solo al primo uso"""
+        with self._lock:
+            entry = self._entries.get(fingerprint) if fingerprint else None
+            if entry is not None and entry['fragment'] is not None:
+                return entry['fragment']
+        fragment = build()
+        with self._lock:
+            entry = self._entries.get(fingerprint) if fingerprint else None
+            if entry is not None:
+                entry['fragment'] = fragment
+        return fragment
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits * 100 / lookups, 1) if lookups else 0,
+            "entries": len(self._entries),
+        }
+
+
+_cache = ConversionCache()
+
+
+def get_cache():
+    """Cache condivisa dal processo (cattura e generazione del prompt)"""
+    return _cache
+
+
+def configure(config=None):
+    """Applica la dimensione configurata alla cache condivisa"""
+    _cache.max_entries = (config or {}).get("capture", {}).get("cache_size", DEFAULT_CACHE_SIZE)
+    return _cache
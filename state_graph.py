@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+LogiDroid State Graph
+Grafo orientato dell'esplorazione: i nodi sono le schermate (fingerprint, con l'Activity),
+gli archi le azioni eseguite (CLICK/FILL/BACK/RANDOM) con il numero di tentativi, i
+successi e le schermate di arrivo osservate.
+
+Quando la schermata corrente non ha più azioni da provare, path_to_frontier() cerca
+(BFS) il percorso più breve verso una schermata con azioni mai tentate, usando solo
+archi affidabili: l'orchestratore lo ripercorre localmente, senza chiamare l'LLM.
+
+Il grafo è salvato per package (test/cache/graphs/<package>.json), quindi una seconda
+esecuzione sulla stessa app riparte da quanto già scoperto. I worker paralleli condividono
+il file: save() lo rilegge sotto lock (fcntl) e vi somma solo i conteggi (visite, tentativi,
+successi, arrivi) accumulati dall'ultimo salvataggio, così nessun worker sovrascrive gli altri.
+
+Configurazione (config.json, sezione "state_graph"):
+    enabled          - costruisce e usa il grafo (default: true)
+    directory        - cartella dei grafi salvati (default: test/cache/graphs)
+    max_path_length  - lunghezza massima di un percorso da ripercorrere (default: 8)
+    min_success_rate - affidabilità minima di un arco per usarlo nei percorsi (default: 0.6)
+    save_every       - salva il grafo ogni N transizioni (default: 10)
+"""
+
+import copy
+import json
+import os
+import re
+import sys
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows: senza lock tra processi vince l'ultimo salvataggio
+    fcntl = None
+
+DEFAULT_GRAPH_DIR = "test/cache/graphs"
+# Azioni che si possono ripetere senza l'LLM (RANDOM non è riproducibile)
+REPLAYABLE_ACTION = re.compile(r'^(BACK|CLICK:.+|FILL:[^:]+:.*)$')
+
+
+def safe_package(package):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', package or "unknown")
+
+
+class StateGraph:
+    """Schermate (nodi) e azioni (archi) osservate durante l'esplorazione di un package"""
+
+    def __init__(self, package, config=None, graph_dir=None):
+        graph_config = (config or {}).get("state_graph", {})
+        self.package = package
+        self.max_path_length = graph_config.get("max_path_length", 8)
+        self.min_success_rate = graph_config.get("min_success_rate", 0.6)
+        self.save_every = graph_config.get("save_every", 10)
+        directory = graph_dir or graph_config.get("directory", DEFAULT_GRAPH_DIR)
+        self.graph_file = os.path.join(directory, f"{safe_package(package)}.json")
+        self.lock_file = f"{self.graph_file}.lock"
+        # fingerprint → {"activity", "visits", "actions": [azioni disponibili]}
+        self.nodes = {}
+        # fingerprint → {azione → {"attempts", "successes", "targets": {fingerprint: conteggio}}}
+        self.edges = {}
+        self._unsaved = 0
+        self.loaded_nodes = 0
+        # Stato già presente nel file (caricato o salvato): save() vi aggiunge solo la differenza
+        self._saved_nodes = {}
+        self._saved_edges = {}
+
+    # Persistenza
+    def _read(self):
+        try:
+            with open(self.graph_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            return stored.get("nodes", {}), stored.get("edges", {})
+        except (OSError, ValueError):
+            return {}, {}
+
+    def _mark_saved(self):
+        self._saved_nodes = copy.deepcopy(self.nodes)
+        self._saved_edges = copy.deepcopy(self.edges)
+
+    def load(self):
+        self.nodes, self.edges = self._read()
+        self._mark_saved()
+        self.loaded_nodes = len(self.nodes)
+        return self
+
+    def _merge_into(self, nodes, edges):
+        """Somma a nodes/edges (letti dal file) i conteggi accumulati dall'ultimo salvataggio"""
+        for fingerprint, node in self.nodes.items():
+            saved = self._saved_nodes.get(fingerprint, {})
+            merged = nodes.setdefault(fingerprint, {"activity": None, "visits": 0, "actions": []})
+            merged["visits"] += node["visits"] - saved.get("visits", 0)
+            if node["activity"]:
+                merged["activity"] = node["activity"]
+            if node["actions"]:
+                merged["actions"] = node["actions"]
+        for source, actions in self.edges.items():
+            for action, edge in actions.items():
+                saved = self._saved_edges.get(source, {}).get(action, {})
+                merged = edges.setdefault(source, {}).setdefault(action, {"attempts": 0, "successes": 0, "targets": {}})
+                merged["attempts"] += edge["attempts"] - saved.get("attempts", 0)
+                merged["successes"] += edge["successes"] - saved.get("successes", 0)
+                saved_targets = saved.get("targets", {})
+                for target, count in edge["targets"].items():
+                    added = count - saved_targets.get(target, 0)
+                    if added:
+                        merged["targets"][target] = merged["targets"].get(target, 0) + added
+
+    def save(self):
+        """Unisce il grafo a quello salvato (anche da altri worker) e lo riscrive sotto lock"""
+        try:
+            os.makedirs(os.path.dirname(self.graph_file), exist_ok=True)
+            with open(self.lock_file, 'a') as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    nodes, edges = self._read()
+                    self._merge_into(nodes, edges)
+                    temp_file = f"{self.graph_file}.{os.getpid()}.tmp"
+                    with open(temp_file, 'w', encoding='utf-8') as f:
+                        json.dump({"package": self.package, "nodes": nodes, "edges": edges}, f, ensure_ascii=False)
+                    os.replace(temp_file, self.graph_file)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+            # Da qui in poi anche le scoperte degli altri worker sono disponibili per i percorsi
+            self.nodes, self.edges = nodes, edges
+            self._mark_saved()
+            self._unsaved = 0
+        except Exception as e:
+            print(f"⚠️ Errore nel salvataggio del grafo: {e}", file=sys.stderr)
+
+    # Aggiornamento
+    def observe(self, fingerprint, activity=None, actions=None):
+        """Registra la visita a una schermata e le azioni che offre"""
+        if not fingerprint:
+            return
+        node = self.nodes.setdefault(fingerprint, {"activity": activity, "visits": 0, "actions": []})
+        node["visits"] += 1
+        if activity:
+            node["activity"] = activity
+        if actions is not None:
+            node["actions"] = list(actions)
+
+    def record_transition(self, source, action, success, target):
+        """Registra l'esito di un'azione eseguita su source che ha portato a target"""
+        if not source or not action:
+            return
+        edge = self.edges.setdefault(source, {}).setdefault(action, {"attempts": 0, "successes": 0, "targets": {}})
+        edge["attempts"] += 1
+        if success:
+            edge["successes"] += 1
+            if target:
+                edge["targets"][target] = edge["targets"].get(target, 0) + 1
+        self._unsaved += 1
+        if self.save_every and self._unsaved >= self.save_every:
+            self.save()
+
+    # Interrogazioni
+    def success_rate(self, source, action):
+        edge = self.edges.get(source, {}).get(action)
+        if not edge or not edge["attempts"]:
+            return 0.0
+        return edge["successes"] / edge["attempts"]
+
+    def likely_target(self, source, action):
+        """Schermata di arrivo più frequente dell'azione (None se mai riuscita)"""
+        targets = self.edges.get(source, {}).get(action, {}).get("targets")
+        return max(targets, key=targets.get) if targets else None
+
+    def untried(self, fingerprint):
+        """Azioni disponibili sulla schermata mai tentate"""
+        node = self.nodes.get(fingerprint)
+        if not node:
+            return []
+        tried = self.edges.get(fingerprint, {})
+        return [action for action in node["actions"] if action not in tried]
+
+    def is_frontier(self, fingerprint):
+        return bool(self.untried(fingerprint))
+
+    def path_to_frontier(self, source):
+        """Percorso più breve [(fingerprint, azione, fingerprint atteso)] verso una schermata con azioni
+        non provate; [] se la schermata corrente lo è già, None se non esiste un percorso affidabile"""
+        if self.is_frontier(source):
+            return []
+        parents = {source: None}
+        queue = deque([(source, 0)])
+        while queue:
+            fingerprint, depth = queue.popleft()
+            if depth >= self.max_path_length:
+                continue
+            for action in self.edges.get(fingerprint, {}):
+                if not REPLAYABLE_ACTION.match(action) or self.success_rate(fingerprint, action) < self.min_success_rate:
+                    continue
+                target = self.likely_target(fingerprint, action)
+                if target is None or target in parents:
+                    continue
+                parents[target] = (fingerprint, action)
+                if self.is_frontier(target):
+                    path = []
+                    step = target
+                    while parents[step] is not None:
+                        previous, previous_action = parents[step]
+                        path.append((previous, previous_action, step))
+                        step = previous
+                    return list(reversed(path))
+                queue.append((target, depth + 1))
+        return None
+
+    def stats(self):
+        return {
+            "nodes": len(self.nodes),
+            "nodes_from_previous_runs": self.loaded_nodes,
+            "edges": sum(len(actions) for actions in self.edges.values()),
+            "frontier_nodes": sum(1 for fingerprint in self.nodes if self.is_frontier(fingerprint)),
+        }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Genera gli APK minimi usati da tests/test_apk_manifest.py: un AndroidManifest.xml binario
+(AXML) scritto a mano, con string pool UTF-16 o UTF-8, dentro uno zip.
+
+    manifest_utf16.apk - string pool UTF-16, nomi degli attributi android:* in chiaro
+    manifest_utf8.apk  - string pool UTF-8, nomi degli attributi android:* svuotati come nelle
+                         build offuscate (si ricavano dalla resource map)
+
+    python3 tests/fixtures/build_manifest_fixtures.py
+"""
+
+import os
+import struct
+import zipfile
+
+ANDROID_NS = "http://schemas.android.com/apk/res/android"
+ANDROID_ATTRIBUTES = {
+    "name": 0x01010003,
+    "enabled": 0x0101000e,
+    "exported": 0x01010010,
+    "targetActivity": 0x01010202,
+    "versionCode": 0x0101021b,
+    "versionName": 0x0101021c,
+}
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (tag, attributi, figli); gli attributi in ANDROID_ATTRIBUTES sono nel namespace android
+MANIFEST = ("manifest", {"package": "com.example", "versionCode": 42, "versionName": "1.4.2"}, [
+    ("uses-sdk", {}, []),
+    ("application", {"name": ".App"}, [
+        ("activity", {"name": ".MainActivity", "exported": True}, [
+            ("intent-filter", {}, [
+                ("action", {"name": "android.intent.action.MAIN"}, []),
+                ("category", {"name": "android.intent.category.LAUNCHER"}, []),
+            ]),
+        ]),
+        ("activity", {"name": "com.example.EditActivity"}, [
+            ("intent-filter", {}, [
+                ("action", {"name": "android.intent.action.EDIT"}, []),
+                ("category", {"name": "android.intent.category.DEFAULT"}, []),
+                ("data", {"mimeType": "text/plain"}, []),
+            ]),
+        ]),
+        ("activity", {"name": "SettingsActivity"}, []),
+        ("activity", {"name": ".OldActivity", "enabled": False}, []),
+        ("activity", {"name": "org.lib.ExternalActivity", "exported": True}, []),
+        ("activity-alias", {"name": ".Launcher", "targetActivity": ".MainActivity"}, [
+            ("intent-filter", {}, [("action", {"name": "android.intent.action.VIEW"}, [])]),
+        ]),
+        ("service", {"name": ".SyncService"}, []),
+    ]),
+])
+
+
+def _android_names(node, names):
+    for key in node[1]:
+        if key in ANDROID_ATTRIBUTES and key not in names:
+            names.append(key)
+    for child in node[2]:
+        _android_names(child, names)
+    return names
+
+
+def _string_pool(strings, utf8):
+    data, offsets = b"", []
+    for string in strings:
+        offsets.append(len(data))
+        if utf8:
+            encoded = string.encode('utf-8')
+            data += bytes([len(string), len(encoded)]) + encoded + b"\0"
+        else:
+            data += struct.pack('<H', len(string)) + string.encode('utf-16-le') + b"\0\0"
+    data += b"\0" * (-len(data) % 4)
+    header_size = 28
+    body = struct.pack(f'<{len(offsets)}I', *offsets) + data
+    return struct.pack('<HHIIIIII', 0x0001, header_size, header_size + len(body), len(strings), 0,
+                       0x100 if utf8 else 0, header_size + 4 * len(offsets), 0) + body
+
+
+def build_axml(root, utf8=False, obfuscated=False):
+    """Manifest binario: string pool, resource map, namespace android ed elementi"""
+    android_names = _android_names(root, [])
+    # Le stringhe dei nomi con ID di risorsa vengono per prime, nello stesso ordine della resource map
+    strings = ["" if obfuscated else name for name in android_names]
+
+    def index(string):
+        if string not in strings:
+            strings.append(string)
+        return strings.index(string)
+
+    chunks = []
+
+    def element(node):
+        tag, attributes, children = node
+        encoded = b""
+        for key, value in attributes.items():
+            namespace = index(ANDROID_NS) if key in ANDROID_ATTRIBUTES else 0xFFFFFFFF
+            name = android_names.index(key) if key in ANDROID_ATTRIBUTES else index(key)
+            if isinstance(value, bool):
+                raw, data_type, data = 0xFFFFFFFF, 0x12, 0xFFFFFFFF if value else 0
+            elif isinstance(value, int):
+                raw, data_type, data = 0xFFFFFFFF, 0x10, value
+            else:
+                raw, data_type, data = index(value), 0x03, index(value)
+            encoded += struct.pack('<IIIHBBI', namespace, name, raw, 8, 0, data_type, data)
+        extension = struct.pack('<IIHHHHHH', 0xFFFFFFFF, index(tag), 20, 20, len(attributes), 0, 0, 0)
+        chunks.append(struct.pack('<HHIII', 0x0102, 16, 16 + len(extension) + len(encoded), 1, 0xFFFFFFFF)
+                      + extension + encoded)
+        for child in children:
+            element(child)
+        chunks.append(struct.pack('<HHIIIII', 0x0103, 16, 24, 1, 0xFFFFFFFF, 0xFFFFFFFF, index(tag)))
+
+    namespace = struct.pack('<HHIIIII', 0x0100, 16, 24, 1, 0xFFFFFFFF, index("android"), index(ANDROID_NS))
+    element(root)
+    namespace_end = struct.pack('<HHIIIII', 0x0101, 16, 24, 1, 0xFFFFFFFF, index("android"), index(ANDROID_NS))
+    resource_map = struct.pack('<HHI', 0x0180, 8, 8 + 4 * len(android_names)) + struct.pack(
+        f'<{len(android_names)}I', *[ANDROID_ATTRIBUTES[name] for name in android_names])
+    body = _string_pool(strings, utf8) + resource_map + namespace + b"".join(chunks) + namespace_end
+    return struct.pack('<HHI', 0x0003, 8, 8 + len(body)) + body
+
+
+def write_apk(path, manifest):
+    with zipfile.ZipFile(path, 'w') as apk:
+        # Data fissa: la fixture rigenerata è identica byte per byte
+        apk.writestr(zipfile.ZipInfo("AndroidManifest.xml", (2020, 1, 1, 0, 0, 0)), manifest)
+        apk.writestr(zipfile.ZipInfo("classes.dex", (2020, 1, 1, 0, 0, 0)), b"dex\n035\0")
+
+
+def main():
+    write_apk(os.path.join(FIXTURES_DIR, "manifest_utf16.apk"), build_axml(MANIFEST))
+    write_apk(os.path.join(FIXTURES_DIR, "manifest_utf8.apk"), build_axml(MANIFEST, utf8=True, obfuscated=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Regressione di activity_tracker.py: parse_resume su righe registrate dal buffer eventi
+e ciclo di lettura/riavvio di logcat attraverso fake_adb.py (fixture per serial).
+
+    python3 -m pytest tests/    oppure    python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import activity_tracker  # noqa: E402
+from activity_tracker import ActivityTracker, parse_resume  # noqa: E402
+
+FAKE_ADB = os.path.join(ROOT, "fake_adb.py")
+
+# Righe registrate con 'logcat -b events -v threadtime' (un resume produce più eventi)
+RECORDED_LOG = """\
+--------- beginning of events
+10-18 09:12:01.101  1432  1467 I wm_resume_activity: [0,d3c7a8e,com.example/.MainActivity]
+10-18 09:12:01.164 12001 12001 I wm_on_resume_called: [d3c7a8e,com.example.MainActivity,RESUME_ACTIVITY]
+10-18 09:12:03.412  1432  1467 I wm_resume_activity: [0,1f2e3d4,com.other.app/com.other.app.HomeActivity]
+10-18 09:12:03.470 13500 13500 I wm_on_resume_called: [1f2e3d4,com.other.app.HomeActivity,RESUME_ACTIVITY]
+10-18 09:12:05.020  1432  1467 I wm_resume_activity: [0,a1b2c3d,com.example/com.example.settings.SettingsActivity]
+10-18 09:12:05.077 12001 12001 I am_on_resume_called: [0,com.example.settings.SettingsActivity,RESUME_ACTIVITY]
+10-18 09:12:05.600  1432  1467 I wm_pause_activity: [0,a1b2c3d,com.example/com.example.settings.SettingsActivity,userLeaving=true]
+10-18 09:12:06.310  1432  1467 I wm_resume_activity: [0,d3c7a8e,com.example/.MainActivity]
+10-18 09:12:06.362 12001 12001 I wm_on_resume_called: [d3c7a8e,com.example.MainActivity,RESUME_ACTIVITY]
+"""
+
+
+class ParseResumeTest(unittest.TestCase):
+
+    def test_short_and_full_component_forms(self):
+        self.assertEqual(parse_resume("I wm_resume_activity: [0,d3c7a8e,com.example/.MainActivity]"),
+                         "com.example/.MainActivity")
+        self.assertEqual(parse_resume("I wm_resume_activity: [0,d3c7a8e,com.example/com.example.MainActivity]"),
+                         "com.example/.MainActivity")
+        # Classe fuori dal package: il componente resta in forma completa
+        self.assertEqual(parse_resume("I wm_resume_activity: [0,d3c7a8e,com.example/org.lib.ExternalActivity]"),
+                         "com.example/org.lib.ExternalActivity")
+
+    def test_class_name_only_needs_the_package(self):
+        line = "I am_on_resume_called: [0,com.example.settings.SettingsActivity,RESUME_ACTIVITY]"
+        self.assertEqual(parse_resume(line, "com.example"), "com.example/.settings.SettingsActivity")
+        self.assertIsNone(parse_resume(line))
+        self.assertIsNone(parse_resume(line, "com.other.app"))
+
+    def test_logcat_prefix_formats(self):
+        for line in ("10-18 09:12:01.101  1432  1467 I wm_resume_activity: [0,d3c7a8e,com.example/.MainActivity]",
+                     "I/wm_resume_activity( 1432): [0,d3c7a8e,com.example/.MainActivity]",
+                     "wm_resume_activity: [0,d3c7a8e,com.example/.MainActivity]"):
+            with self.subTest(line=line):
+                self.assertEqual(parse_resume(line, "com.example"), "com.example/.MainActivity")
+
+    def test_other_events_are_ignored(self):
+        for line in ("--------- beginning of events",
+                     "I wm_pause_activity: [0,a1b2c3d,com.example/.MainActivity,userLeaving=true]",
+                     "I wm_resume_activity: [0,d3c7a8e,not a component]"):
+            with self.subTest(line=line):
+                self.assertIsNone(parse_resume(line, "com.example"))
+
+
+class TrackerLogcatTest(unittest.TestCase):
+    """Il tracker legge il log registrato dal fake adb; il riavvio usa il serial con logcat_status.txt"""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.fixtures = self._directory.name
+        for serial, status in (("emulator-5554", None), ("emulator-5556", 255)):
+            device_dir = os.path.join(self.fixtures, serial)
+            os.makedirs(device_dir)
+            with open(os.path.join(device_dir, "logcat.txt"), 'w') as f:
+                f.write(RECORDED_LOG)
+            if status is not None:
+                with open(os.path.join(device_dir, "logcat_status.txt"), 'w') as f:
+                    f.write(str(status))
+        self.log_file = os.path.join(self.fixtures, "commands.log")
+        environment = {"FAKE_ADB_DIR": self.fixtures, "FAKE_ADB_LOG": self.log_file,
+                       "FAKE_ADB_SERIALS": "emulator-5554,emulator-5556"}
+        patcher = mock.patch.dict(os.environ, environment)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._directory.cleanup)
+
+    def run_tracker(self, serial):
+        """Esegue il ciclo di lettura nel thread del test (senza attese tra i riavvii)"""
+        reported = []
+        command = [sys.executable, FAKE_ADB, "-s", serial, "logcat", "-b", "events", "-T", "1"]
+        tracker = ActivityTracker(serial, "com.example", on_resume=reported.append, command=command)
+        with mock.patch.object(activity_tracker.time, "sleep"), \
+                mock.patch("builtins.print"):
+            tracker._run()
+        return tracker, reported
+
+    def logcat_calls(self, serial):
+        with open(self.log_file) as f:
+            return sum(1 for line in f if line.startswith(f"[{serial}] logcat "))
+
+    def test_recorded_log(self):
+        tracker, reported = self.run_tracker("emulator-5554")
+        self.assertEqual(reported, ["com.example/.MainActivity", "com.example/.settings.SettingsActivity"])
+        # I due eventi dello stesso resume contano una volta sola; l'altro package resta fuori
+        self.assertEqual([activity for _, activity in tracker.resumes], [
+            "com.example/.MainActivity",
+            "com.example/.settings.SettingsActivity",
+            "com.example/.MainActivity",
+        ])
+        self.assertEqual(tracker.seen, {"com.example/.MainActivity": 2, "com.example/.settings.SettingsActivity": 1})
+        self.assertEqual(tracker.current, "com.example/.MainActivity")
+        self.assertEqual(tracker.stats(), {"resume_events": 7, "resumes": 3, "activities_seen": 2})
+        self.assertEqual(self.logcat_calls("emulator-5554"), 1)
+
+    def test_duplicates_outside_window_are_kept(self):
+        tracker = ActivityTracker(package="com.example")
+        line = "I wm_resume_activity: [0,d3c7a8e,com.example/.MainActivity]"
+        with mock.patch.object(activity_tracker.time, "time", side_effect=[100.0, 100.5, 102.0]):
+            for _ in range(3):
+                tracker.feed(line)
+        self.assertEqual(tracker.resumes, [(100.0, "com.example/.MainActivity"), (102.0, "com.example/.MainActivity")])
+        self.assertEqual(tracker.stats()["resume_events"], 3)
+
+    def test_restart_after_logcat_failure(self):
+        tracker, reported = self.run_tracker("emulator-5556")
+        self.assertEqual(self.logcat_calls("emulator-5556"), activity_tracker.MAX_RESTARTS + 1)
+        self.assertEqual(self.logcat_calls("emulator-5554"), 0)
+        # Il log riletto dopo ogni riavvio non segnala di nuovo le Activity già viste
+        self.assertEqual(reported, ["com.example/.MainActivity", "com.example/.settings.SettingsActivity"])
+        self.assertEqual(tracker.seen["com.example/.settings.SettingsActivity"], activity_tracker.MAX_RESTARTS + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
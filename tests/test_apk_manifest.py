@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Regressione del parser AXML di apk_manifest.py sulle fixture in tests/fixtures/
+(rigenerabili con tests/fixtures/build_manifest_fixtures.py).
+
+    python3 -m pytest tests/    oppure    python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from apk_manifest import ManifestCache, ManifestError, launchable_activities, read_manifest  # noqa: E402
+
+FIXTURES_DIR = os.path.join(ROOT, "tests", "fixtures")
+
+EXPECTED_MANIFEST = {
+    "package": "com.example",
+    "version_code": 42,
+    "version_name": "1.4.2",
+    "activities": [
+        {
+            "name": "com.example.MainActivity",
+            "component": "com.example/.MainActivity",
+            "exported": True,
+            "enabled": True,
+            "alias": False,
+            "target": None,
+            "intent_filters": [{"actions": ["android.intent.action.MAIN"],
+                                "categories": ["android.intent.category.LAUNCHER"], "data": []}],
+        },
+        {
+            # Senza android:exported: esportata perché ha un intent-filter
+            "name": "com.example.EditActivity",
+            "component": "com.example/.EditActivity",
+            "exported": True,
+            "enabled": True,
+            "alias": False,
+            "target": None,
+            "intent_filters": [{"actions": ["android.intent.action.EDIT"],
+                                "categories": ["android.intent.category.DEFAULT"],
+                                "data": [{"mimeType": "text/plain"}]}],
+        },
+        {
+            # Nome senza punto (relativo al package) e nessun intent-filter: non esportata
+            "name": "com.example.SettingsActivity",
+            "component": "com.example/.SettingsActivity",
+            "exported": False,
+            "enabled": True,
+            "alias": False,
+            "target": None,
+            "intent_filters": [],
+        },
+        {
+            "name": "com.example.OldActivity",
+            "component": "com.example/.OldActivity",
+            "exported": False,
+            "enabled": False,
+            "alias": False,
+            "target": None,
+            "intent_filters": [],
+        },
+        {
+            "name": "org.lib.ExternalActivity",
+            "component": "com.example/org.lib.ExternalActivity",
+            "exported": True,
+            "enabled": True,
+            "alias": False,
+            "target": None,
+            "intent_filters": [],
+        },
+        {
+            "name": "com.example.Launcher",
+            "component": "com.example/.Launcher",
+            "exported": True,
+            "enabled": True,
+            "alias": True,
+            "target": "com.example/.MainActivity",
+            "intent_filters": [{"actions": ["android.intent.action.VIEW"], "categories": [], "data": []}],
+        },
+    ],
+}
+
+
+class ReadManifestTest(unittest.TestCase):
+
+    def test_utf16_string_pool(self):
+        self.assertEqual(read_manifest(os.path.join(FIXTURES_DIR, "manifest_utf16.apk")), EXPECTED_MANIFEST)
+
+    def test_utf8_string_pool_with_obfuscated_attribute_names(self):
+        self.assertEqual(read_manifest(os.path.join(FIXTURES_DIR, "manifest_utf8.apk")), EXPECTED_MANIFEST)
+
+    def test_launchable_activities_exclude_aliases_and_disabled(self):
+        manifest = read_manifest(os.path.join(FIXTURES_DIR, "manifest_utf16.apk"))
+        self.assertEqual(launchable_activities(manifest), [
+            "com.example/.EditActivity",
+            "com.example/.MainActivity",
+            "com.example/.SettingsActivity",
+            "com.example/org.lib.ExternalActivity",
+        ])
+
+    def test_invalid_apks_raise_manifest_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            not_zip = os.path.join(directory, "not_zip.apk")
+            with open(not_zip, 'w') as f:
+                f.write("package:/data/app/base.apk\n")
+            text_manifest = os.path.join(directory, "text_manifest.apk")
+            with zipfile.ZipFile(text_manifest, 'w') as apk:
+                apk.writestr("AndroidManifest.xml", '<manifest package="com.example"/>')
+            truncated = os.path.join(directory, "truncated.apk")
+            with zipfile.ZipFile(os.path.join(FIXTURES_DIR, "manifest_utf16.apk")) as source:
+                data = source.read("AndroidManifest.xml")
+            with zipfile.ZipFile(truncated, 'w') as apk:
+                apk.writestr("AndroidManifest.xml", data[:len(data) // 3])
+            for path in (not_zip, text_manifest, truncated):
+                with self.subTest(apk=os.path.basename(path)), self.assertRaises(ManifestError):
+                    read_manifest(path)
+
+
+class ManifestCacheTest(unittest.TestCase):
+
+    def test_lookup_requires_matching_build(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ManifestCache(directory=directory)
+            cache.store(EXPECTED_MANIFEST, "ab" * 32)
+            self.assertEqual(cache.lookup("com.example", 42, "ab" * 32), EXPECTED_MANIFEST)
+            self.assertEqual(cache.lookup("com.example", 42, None), EXPECTED_MANIFEST)
+            self.assertIsNone(cache.lookup("com.example", 43, "ab" * 32))
+            self.assertIsNone(cache.lookup("com.example", 42, "cd" * 32))
+            self.assertIsNone(cache.lookup("com.example", None, None))
+            self.assertIsNone(cache.lookup("com.other", 42, "ab" * 32))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+LogiDroid UI Settle Detector
+Sostituisce le pause fisse dopo ogni azione con il rilevamento della UI "ferma":
+interroga un segnale economico finché resta invariato per una finestra configurabile,
+con un timeout massimo. Le pause fisse restano solo come fallback se il segnale
+non è disponibile.
+
+Configurazione (config.json, sezione "ui_settle"):
+    enabled        - attiva il rilevamento (default: true)
+    signal         - "window" (focus + stato disegno/animazioni, default) o "hierarchy"
+    stable_window  - secondi di segnale invariato per considerare la UI ferma (default: 0.3)
+    poll_interval  - intervallo tra due rilevazioni (default: 0.1)
+    initial_delay  - attesa minima prima della prima rilevazione (default: 0.1)
+    timeout        - attesa massima (default: 5)
+"""
+
+import hashlib
+import time
+
+from adb_session import get_session
+
+# Righe di 'dumpsys window windows' che cambiano durante transizioni, animazioni e ridisegni
+WINDOW_SIGNAL_COMMAND = (
+    "dumpsys window windows | "
+    "grep -E 'mCurrentFocus|mFocusedApp|mDrawState|mAnimating|isAnimating|mAppTransitionState' || true"
+)
+BUSY_MARKERS = ("mAnimating=true", "isAnimating=true", "DRAW_PENDING", "APP_STATE_RUNNING", "APP_STATE_READY")
+
+# Statistiche di attesa condivise da tutti i detector del processo (per il report finale)
+WAIT_STATS = {
+    "total_seconds": 0.0,
+    "settle_waits": 0,
+    "settle_seconds": 0.0,
+    "timeouts": 0,
+    "fallback_sleeps": 0,
+    "fallback_seconds": 0.0,
+}
+
+
+def wait_stats():
+    """Copia arrotondata delle statistiche di attesa"""
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in WAIT_STATS.items()}
+
+
+def _record(kind, elapsed):
+    WAIT_STATS["total_seconds"] += elapsed
+    if kind == "fallback":
+        WAIT_STATS["fallback_sleeps"] += 1
+        WAIT_STATS["fallback_seconds"] += elapsed
+    else:
+        WAIT_STATS["settle_waits"] += 1
+        WAIT_STATS["settle_seconds"] += elapsed
+
+
+class UISettleDetector:
+    """Attende che la UI del dispositivo smetta di cambiare"""
+
+    def __init__(self, session=None, config=None):
+        settle_config = (config or {}).get("ui_settle", {})
+        self.session = session or get_session()
+        self.enabled = settle_config.get("enabled", True)
+        self.signal = settle_config.get("signal", "window")
+        self.stable_window = settle_config.get("stable_window", 0.3)
+        self.poll_interval = settle_config.get("poll_interval", 0.1)
+        self.initial_delay = settle_config.get("initial_delay", 0.1)
+        self.timeout = settle_config.get("timeout", 5)
+
+    def probe(self):
+        """Restituisce (firma, occupata) del segnale scelto, oppure (None, False) se non disponibile"""
+        if self.signal == "hierarchy":
+            output, status = self.session.shell("uiautomator dump /dev/tty", timeout=self.timeout, retry=True)
+            busy = False
+        else:
+            output, status = self.session.shell(WINDOW_SIGNAL_COMMAND, timeout=self.timeout, retry=True)
+            busy = any(marker in output for marker in BUSY_MARKERS)
+        if status != 0:
+            return None, False
+        return hashlib.sha1(output.encode('utf-8')).hexdigest(), busy
+
+    def sleep(self, seconds):
+        """Pausa fissa (fallback), conteggiata nelle statistiche"""
+        time.sleep(seconds)
+        _record("fallback", seconds)
+
+    def wait(self, fallback=1.0):
+        """Attende la UI stabile; se il segnale non è disponibile usa la pausa fissa 'fallback'.
+        Restituisce i secondi di attesa."""
+        if not self.enabled:
+            self.sleep(fallback)
+            return fallback
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        time.sleep(self.initial_delay)
+
+        last_signature = None
+        stable_since = None
+        while True:
+            signature, busy = self.probe()
+            now = time.monotonic()
+            if signature is None:
+                # Segnale non disponibile: completa la pausa fissa
+                time.sleep(max(0.0, fallback - (now - start)))
+                elapsed = time.monotonic() - start
+                _record("fallback", elapsed)
+                return elapsed
+
+            if busy or signature != last_signature:
+                last_signature = signature
+                stable_since = now
+            elif now - stable_since >= self.stable_window:
+                break
+
+            if now >= deadline:
+                WAIT_STATS["timeouts"] += 1
+                break
+            time.sleep(self.poll_interval)
+
+        elapsed = time.monotonic() - start
+        _record("settle", elapsed)
+        return elapsed
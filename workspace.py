@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+LogiDroid Workspace
+Percorsi di tutti i file prodotti da una sessione di test. Di default la struttura è
+quella storica sotto test/; con più dispositivi in parallelo ogni dispositivo ha il
+proprio workspace (test/devices/<serial>/) con cronologia, coverage e artefatti separati.
+
+I nomi degli artefatti includono timestamp in millisecondi e un contatore progressivo,
+così due catture nello stesso secondo non si sovrascrivono.
+"""
+
+import itertools
+import os
+import re
+import threading
+import time
+
+DEFAULT_ROOT = "test"
+DEVICES_DIR = "devices"
+
+
+def safe_serial(serial):
+    """Serial utilizzabile come nome di cartella (es. 192.168.1.5:5555 → 192.168.1.5_5555)"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', serial or "default")
+
+
+class Workspace:
+    """Cartelle e file di una sessione di test"""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.xml_dir = os.path.join(root, "xml")
+        self.json_dir = os.path.join(root, "json")
+        self.screenshots_dir = os.path.join(root, "screenshots")
+        self.prompts_dir = os.path.join(root, "prompts")
+        self.coverage_dir = os.path.join(root, "coverage")
+        self.cache_dir = os.path.join(root, "cache")
+
+        # Cronologia e stato della sessione
+        self.history_file = os.path.join(self.prompts_dir, "action_history.json")
+        self.last_action_file = os.path.join(self.prompts_dir, "last_action.txt")
+        self.random_count_file = os.path.join(self.prompts_dir, "random_action_count.txt")
+        self.test_in_progress_marker = os.path.join(self.prompts_dir, ".test_in_progress")
+        self.decision_cache_file = os.path.join(self.cache_dir, "decision_cache.json")
+
+        # Activity coverage
+        self.all_activities_file = os.path.join(self.coverage_dir, "all_activities.txt")
+        self.explored_activities_file = os.path.join(self.coverage_dir, "explored_activities.txt")
+        self.package_file = os.path.join(self.coverage_dir, "current_package.txt")
+        self.apk_file = os.path.join(self.coverage_dir, "app.apk")
+        self.final_report_file = os.path.join(self.coverage_dir, "final_report.json")
+
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_device(cls, serial, base=DEFAULT_ROOT):
+        """Workspace dedicato a un dispositivo: <base>/devices/<serial>/"""
+        return cls(os.path.join(base, DEVICES_DIR, safe_serial(serial)))
+
+    def create_dirs(self):
+        for folder in (self.xml_dir, self.json_dir, self.screenshots_dir, self.prompts_dir,
+                       self.coverage_dir, self.cache_dir):
+            os.makedirs(folder, exist_ok=True)
+
+    def stamp(self):
+        """Identificativo univoco nel workspace: <ms>_<progressivo>"""
+        with self._lock:
+            return f"{int(time.time() * 1000)}_{next(self._sequence):04d}"
+
+    def artifact_paths(self, name, stamp=None):
+        """Percorsi (xml, json) di una cattura: xml/<name>_<stamp>.xml e json/result_<name>_<stamp>.json"""
+        stamp = stamp or self.stamp()
+        return (os.path.join(self.xml_dir, f"{name}_{stamp}.xml"),
+                os.path.join(self.json_dir, f"result_{name}_{stamp}.json"))
+
+    def screenshot_path(self, stamp=None):
+        return os.path.join(self.screenshots_dir, f"screen_{stamp or self.stamp()}.png")
+
+
+_default = Workspace()
+
+
+def default_workspace():
+    """Workspace storico (test/), usato quando non ne viene passato uno"""
+    return _default
@@ -5,11 +5,14 @@ Estrae solo pulsanti e campi di testo con etichette automatiche
 """
 
 import xml.etree.ElementTree as ET
+import io
 import json
 import sys
 import os
 from datetime import datetime
 
+from element_index import assign_element_ids, build_lookup_index
+
 # Funzione per analizzare le coordinate
 def parse_bounds(bounds_str):
     """
@@ -31,14 +34,68 @@ def parse_bounds(bounds_str):
     except:
         return None
 
-def has_nearby_edittext(elements, target_bounds, min_distance=100):
-    """Controlla se c'è un altro EditText nelle vicinanze di target_bounds"""
+GRID_CELL_SIZE = 150  # lato (px) delle celle dell'indice spaziale
+EDITTEXT_LABEL_RANGE = (300, 150)  # distanza orizzontale/verticale massima (esclusa) etichetta-campo
+BUTTON_LABEL_DISTANCE = 50  # distanza massima (inclusa) etichetta-pulsante
+MIN_GROUP_SIZE = 3  # righe uguali (stesso resource_id, classe e dimensioni) per formare un gruppo
+GROUP_SIZE_TOLERANCE = 0.1  # differenza relativa ammessa tra le dimensioni delle righe di un gruppo
+GROUP_SAMPLES = 3  # testi di esempio riportati per ogni gruppo
+
+class SpatialIndex:
+    """
+    Indice spaziale a griglia costruito una volta per dump: le etichette (TextView) sono
+    raggruppate per cella in base al centro e gli EditText per fascia verticale, così ogni
+    ricerca controlla solo le celle vicine invece di tutti i nodi. I risultati sono
+    memorizzati per elemento (la stessa ricerca viene richiesta più volte durante il filtro).
+    """
+
+    def __init__(self, text_nodes, elements=(), cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.text_nodes = text_nodes
+        self._cells = {}
+        for position, text_node in enumerate(text_nodes):
+            bounds = text_node['bounds']
+            key = (bounds['x'] // cell_size, bounds['y'] // cell_size)
+            self._cells.setdefault(key, []).append(position)
+        self._edittext_rows = {}
+        for elem in elements:
+            if elem.get('editable') and elem.get('bounds'):
+                center_y = elem['bounds']['y'] + elem['bounds']['height'] // 2
+                self._edittext_rows.setdefault(center_y // cell_size, []).append(elem)
+        self._memo = {}
+
+    def text_nodes_near(self, x, y, dx, dy):
+        """Etichette con centro in [x-dx, x+dx] × [y-dy, y+dy], nell'ordine originale del documento"""
+        size = self.cell_size
+        positions = []
+        for cx in range((x - dx) // size, (x + dx) // size + 1):
+            for cy in range((y - dy) // size, (y + dy) // size + 1):
+                positions.extend(self._cells.get((cx, cy), ()))
+        positions.sort()
+        return [self.text_nodes[p] for p in positions]
+
+    def edittexts_near_row(self, center_y, distance):
+        """EditText con centro verticale in [center_y-distance, center_y+distance]"""
+        size = self.cell_size
+        for row in range((center_y - distance) // size, (center_y + distance) // size + 1):
+            yield from self._edittext_rows.get(row, ())
+
+    def memoized(self, kind, element, compute):
+        key = (kind, id(element))
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+def has_nearby_edittext(elements, target_bounds, min_distance=100, index=None):
+    """Controlla se c'è un altro EditText nelle vicinanze di target_bounds
+    (con index usa l'indice spaziale invece di scorrere tutti gli elementi)"""
     if not target_bounds:
         return False
     
     target_center_y = target_bounds['y'] + target_bounds['height'] // 2
+    candidates = index.edittexts_near_row(target_center_y, min_distance) if index else elements
     
-    for elem in elements:
+    for elem in candidates:
         if elem.get('editable') and elem.get('bounds'):
             elem_bounds = elem['bounds']
             elem_center_y = elem_bounds['y'] + elem_bounds['height'] // 2
@@ -49,15 +106,21 @@ def has_nearby_edittext(elements, target_bounds, min_distance=100):
                 return True
     return False
 
-def extract_elements(node, elements, text_nodes):
-    """Estrae elementi utili dal nodo XML"""
-    attrs = node.attrib
+FIELD_CLASSES = ('edittext', 'autocomplete', 'textinput')
+CHILD_TEXT_MAX_DEPTH = 3  # profondità massima della ricerca del testo nei figli (come la vecchia versione ricorsiva)
+CLEAR_BATCH = 256  # ogni quanti figli già elaborati liberare la memoria del nodo padre
+
+def classify_node(attrs):
+    """
+    Classifica un nodo a partire dai suoi attributi.
+    Restituisce (elemento, text_node, cerca_testo_figli):
+    - elemento: dizionario del pulsante/campo di testo, oppure None
+    - text_node: etichetta (TextView) da usare per i label, oppure None
+    - cerca_testo_figli: True se è un pulsante clickable senza testo (il testo va cercato nei figli)
+    """
     bounds = parse_bounds(attrs.get('bounds', ''))
-    
     if not bounds:  # Ignora nodi senza posizione
-        for child in node:
-            extract_elements(child, elements, text_nodes)
-        return
+        return None, None, False
     
     text = attrs.get('text', '').strip() #testo del nodo
     resource_id = attrs.get('resource-id', '').strip() #identificatore univoco del nodo
@@ -70,77 +133,135 @@ def extract_elements(node, elements, text_nodes):
     # - campo di testo (edittext/autocomplete/textinput)
     # - etichetta (textview)
     class_name = attrs.get('class', '').lower()
-    is_button = ('button' in class_name or clickable) and not any(field_type in class_name for field_type in ['edittext', 'autocomplete', 'textinput'])
-    is_edittext = any(field_type in class_name for field_type in ['edittext', 'autocomplete', 'textinput'])
+    is_edittext = any(field_type in class_name for field_type in FIELD_CLASSES)
+    is_button = ('button' in class_name or clickable) and not is_edittext
     is_textview = 'textview' in class_name and text and not clickable and not is_edittext
     
-    # Se è un pulsante clickable senza testo, cerca testo nei figli
-    if is_button and clickable and not text:
-        child_text = find_text_in_children(node)
-        if child_text:
-            text = child_text
-    
-    # Raccogli elementi utili
+    element = None
     if is_button or is_edittext:
-        # ✨ FILTRO INTELLIGENTE MIGLIORATO: Distingui tab navigation da menu dropdown
-        should_filter = False
-        
-        # ✨ FILTRO MIGLIORATO: Non filtrare se ha content_desc valido
-        if is_button and not resource_id and (not text or len(text.strip()) < 2) and (not content_desc or len(content_desc.strip()) < 2):
-            should_filter = True
-            filter_reason = "senza ID, senza testo e senza content_desc"
-        elif is_button and not resource_id and text and content_desc == text:
-            # Tab navigation: content-desc uguale al testo (es. content-desc="Playlist", text="Playlist")
-            should_filter = True  
-            filter_reason = f"tab navigation '{text}'"
-        
-        if should_filter:
-            print(f"🚫 FILTRATO elemento decorativo {filter_reason}: {text or 'NO_TEXT'}", file=sys.stderr)
-        else:
-            # Elementi validi: con resource_id, campi di testo, menu dropdown, o pulsanti con testo significativo
-            elements.append({
-                'type': 'button' if is_button else 'edit_text',
-                'text': text,
-                'hint': hint,
-                'content_desc': content_desc,
-                'resource_id': resource_id,
-                'bounds': bounds,
-                'clickable': clickable,
-                'editable': is_edittext
-            })
-    
-    if is_textview and bounds:
-        text_nodes.append({'text': text, 'bounds': bounds})
-    
-    # Processa figli
-    for child in node:
-        extract_elements(child, elements, text_nodes)
+        element = {
+            'type': 'button' if is_button else 'edit_text',
+            'text': text,
+            'hint': hint,
+            'content_desc': content_desc,
+            'resource_id': resource_id,
+            'class_name': attrs.get('class', ''),
+            'bounds': bounds,
+            'clickable': clickable,
+            'editable': is_edittext,
+            'password': attrs.get('password', 'false') == 'true'
+        }
+    text_node = {'text': text, 'bounds': bounds} if is_textview else None
+    return element, text_node, bool(is_button and clickable and not text)
 
-def find_text_in_children(node, max_depth=3):
-    """Cerca ricorsivamente il primo testo significativo nei nodi figli"""
-    if max_depth <= 0:
+def filter_reason(element):
+    """Restituisce il motivo per cui l'elemento è decorativo (da scartare), None se è valido"""
+    if element['editable']:
         return None
-        
-    for child in node:
-        child_text = child.attrib.get('text', '').strip()
-        if child_text and len(child_text) >= 2:
-            return child_text
-        
-        # Ricerca ricorsiva nei nipoti
-        grandchild_text = find_text_in_children(child, max_depth - 1)
-        if grandchild_text:
-            return grandchild_text
+    text = element['text']
+    content_desc = element['content_desc']
     
+    # ✨ FILTRO INTELLIGENTE MIGLIORATO: Distingui tab navigation da menu dropdown
+    # ✨ FILTRO MIGLIORATO: Non filtrare se ha content_desc valido
+    if not element['resource_id'] and (not text or len(text.strip()) < 2) and (not content_desc or len(content_desc.strip()) < 2):
+        return "senza ID, senza testo e senza content_desc"
+    if not element['resource_id'] and text and content_desc == text:
+        # Tab navigation: content-desc uguale al testo (es. content-desc="Playlist", text="Playlist")
+        return f"tab navigation '{text}'"
     return None
 
-def find_label_for_edittext(edittext, text_nodes):
-    """Trova l'etichetta più vicina per un campo EditText"""
+def extract_elements(xml_source):
+    """
+    Estrae pulsanti, campi di testo ed etichette in un'unica passata in streaming (iterparse).
+    Non è ricorsiva: i nodi aperti sono su uno stack esplicito e i sottoalberi già elaborati
+    vengono liberati, quindi gerarchie profonde (WebView, Compose) non raggiungono il limite
+    di ricorsione e la memoria resta proporzionale alla profondità, non al numero di nodi.
+    xml_source: percorso del file oppure byte del dump.
+    Restituisce (elements, text_nodes) nell'ordine del documento.
+    """
+    if isinstance(xml_source, (bytes, bytearray)):
+        xml_source = io.BytesIO(xml_source)
+    
+    slots = []  # per ogni elemento, in ordine di documento: dizionario, motivo di scarto, o None se in attesa
+    text_nodes = [] #lista di nodi di testo (TextView)
+    stack = []  # nodi aperti: [elem, slot in attesa del testo dei figli, figli già elaborati]
+    pending = []  # (profondità, frame) dei pulsanti che cercano il testo nei figli, dal più esterno
+    
+    for event, node in ET.iterparse(xml_source, events=('start', 'end')):
+        if event == 'start':
+            depth = len(stack)
+            frame = [node, None, 0]
+            stack.append(frame)
+            if depth == 0:  # Il nodo radice (hierarchy) non viene classificato
+                continue
+            
+            # Testo per i pulsanti antenati ancora senza testo (primo figlio in ordine di documento)
+            if pending:
+                child_text = node.attrib.get('text', '').strip()
+                if len(child_text) >= 2:
+                    while pending and depth - pending[-1][0] <= CHILD_TEXT_MAX_DEPTH:
+                        _, seeker = pending.pop()
+                        _resolve(slots, seeker[1], child_text)
+                        seeker[1] = None
+            
+            element, text_node, needs_child_text = classify_node(node.attrib)
+            if element is not None:
+                slots.append(None)
+                if needs_child_text:
+                    frame[1] = (len(slots) - 1, element)
+                    pending.append((depth, frame))
+                else:
+                    _resolve(slots, (len(slots) - 1, element), None)
+            if text_node is not None:
+                text_nodes.append(text_node)
+        else:
+            frame = stack.pop()
+            if frame[1] is not None:  # Nessun testo trovato nei figli
+                pending.pop()
+                _resolve(slots, frame[1], None)
+            
+            # Libera il sottoalbero elaborato (i figli elaborati sono sempre un prefisso del padre)
+            node.clear()
+            if stack:
+                parent = stack[-1]
+                parent[2] += 1
+                if parent[2] >= CLEAR_BATCH:
+                    del parent[0][:parent[2]]
+                    parent[2] = 0
+    
+    elements = []
+    for slot in slots:
+        if isinstance(slot, str):
+            print(f"🚫 FILTRATO elemento decorativo {slot}", file=sys.stderr)
+        else:
+            elements.append(slot)
+    return elements, text_nodes
+
+def _resolve(slots, pending_slot, child_text):
+    """Completa l'elemento in attesa: applica il testo dei figli e il filtro degli elementi decorativi"""
+    index, element = pending_slot
+    if child_text:
+        element['text'] = child_text
+    reason = filter_reason(element)
+    slots[index] = f"{reason}: {element['text'] or 'NO_TEXT'}" if reason else element
+
+def find_label_for_edittext(edittext, text_nodes, index=None):
+    """Trova l'etichetta più vicina per un campo EditText
+    (con index controlla solo le celle vicine e riusa il risultato già calcolato)"""
+    if index is not None:
+        return index.memoized('edittext', edittext, lambda: _label_for_edittext(edittext, text_nodes, index))
+    return _label_for_edittext(edittext, text_nodes)
+
+def _label_for_edittext(edittext, text_nodes, index=None):
     if not edittext['bounds']:
         return "Campo senza etichetta"
     
     edit_pos = edittext['bounds']
     best_label = None
     min_distance = float('inf')
+    max_h_dist, max_v_dist = EDITTEXT_LABEL_RANGE
+    if index is not None:
+        text_nodes = index.text_nodes_near(edit_pos['x'], edit_pos['y'], max_h_dist, max_v_dist)
     
     for text_node in text_nodes:
         text_pos = text_node['bounds']
@@ -150,7 +271,7 @@ def find_label_for_edittext(edittext, text_nodes):
         h_dist = abs(text_pos['x'] - edit_pos['x'])
         
         # Deve essere vicino e preferibilmente sopra
-        if v_dist < 150 and h_dist < 300:
+        if v_dist < max_v_dist and h_dist < max_h_dist:
             distance = v_dist + (h_dist * 0.5)  # Peso maggiore alla distanza verticale
             if text_pos['y'] <= edit_pos['y']:  # Sopra
                 distance *= 0.7  # Bonus per elementi sopra
@@ -161,8 +282,14 @@ def find_label_for_edittext(edittext, text_nodes):
     
     return best_label or edittext['hint'] or edittext['text'] or "Campo senza etichetta"
 
-def find_label_for_button(button, text_nodes):
-    """Trova l'etichetta per un pulsante senza testo"""
+def find_label_for_button(button, text_nodes, index=None):
+    """Trova l'etichetta per un pulsante senza testo
+    (con index controlla solo le celle vicine e riusa il risultato già calcolato)"""
+    if index is not None:
+        return index.memoized('button', button, lambda: _label_for_button(button, text_nodes, index))
+    return _label_for_button(button, text_nodes)
+
+def _label_for_button(button, text_nodes, index=None):
     if button['text']:
         return button['text']
     
@@ -170,6 +297,8 @@ def find_label_for_button(button, text_nodes):
         return ""
     
     btn_pos = button['bounds']
+    if index is not None:
+        text_nodes = index.text_nodes_near(btn_pos['x'], btn_pos['y'], BUTTON_LABEL_DISTANCE, BUTTON_LABEL_DISTANCE)
     
     # Cerca TextView molto vicino al pulsante
     for text_node in text_nodes:
@@ -177,23 +306,78 @@ def find_label_for_button(button, text_nodes):
         
         # Distanza molto piccola (stesso elemento)
         distance = abs(text_pos['x'] - btn_pos['x']) + abs(text_pos['y'] - btn_pos['y'])
-        if distance <= 50:
+        if distance <= BUTTON_LABEL_DISTANCE:
             return text_node['text']
     
     return ""
 
-def xml_to_json(xml_file):
-    """Converte XML UIAutomator in JSON pulito"""
+def _similar_size(bounds, reference):
+    """True se le dimensioni differiscono al massimo di GROUP_SIZE_TOLERANCE"""
+    for key in ('width', 'height'):
+        if abs(bounds[key] - reference[key]) > max(reference[key], 1) * GROUP_SIZE_TOLERANCE:
+            return False
+    return True
+
+def group_repeated_elements(elements):
+    """
+    Individua le righe ripetute delle liste: bottoni clickable con lo stesso resource_id,
+    la stessa classe e dimensioni simili, che differiscono solo per il testo.
+    Ogni riga riceve la chiave 'group' (nome del gruppo) e resta nell'elenco degli elementi,
+    così l'esecutore può scegliere una riga concreta; il prompt mostra una sola opzione per gruppo.
+    Restituisce la lista dei gruppi: nome, resource_id, classe, numero di righe e testi di esempio.
+    """
+    candidates = {}  # (resource_id, classe) → [[elementi con dimensioni simili], ...]
+    for element in elements:
+        if element['editable'] or not element['clickable'] or not element['resource_id']:
+            continue
+        clusters = candidates.setdefault((element['resource_id'], element.get('class_name', '')), [])
+        for cluster in clusters:
+            if _similar_size(element['bounds'], cluster[0]['bounds']):
+                cluster.append(element)
+                break
+        else:
+            clusters.append([element])
+
+    groups = []
+    names = set()
+    for (resource_id, class_name), clusters in candidates.items():
+        for cluster in clusters:
+            if len(cluster) < MIN_GROUP_SIZE:
+                continue
+            # resource_id nel formato package:id/nome
+            base_name = resource_id.split('/')[-1] or "lista"
+            name, suffix = base_name, 2
+            while name in names:
+                name = f"{base_name}#{suffix}"
+                suffix += 1
+            names.add(name)
+            for element in cluster:
+                element['group'] = name
+            samples = [' '.join((element['text'] or element['content_desc']).split())[:30] for element in cluster]
+            groups.append({
+                'name': name,
+                'resource_id': resource_id,
+                'class_name': class_name,
+                'count': len(cluster),
+                'samples': [sample for sample in samples if sample][:GROUP_SAMPLES],
+            })
+    return groups
+
+def xml_to_json(xml_source, source_name=None):
+    """Converte XML UIAutomator in JSON pulito.
+    xml_source può essere il percorso del file XML oppure direttamente i byte del dump
+    (cattura in streaming, senza file intermedi); source_name è il nome riportato nel JSON."""
     try:
-        tree = ET.parse(xml_file) #dato un xml fornise un albero formato da nodi
-        root = tree.getroot()  #ottiene il nodo radice dell'albero
+        if isinstance(xml_source, (bytes, bytearray)):
+            source_file = source_name or "stream"
+        else:
+            source_file = source_name or os.path.basename(xml_source)
         
-        # Estrai tutti gli elementi
-        elements = [] #lista di bottoni o campi di testo
-        text_nodes = [] #lista di nodi di testo (TextView)
+        # Estrai tutti gli elementi in un'unica passata (bottoni/campi di testo ed etichette TextView)
+        elements, text_nodes = extract_elements(xml_source)
         
-        for child in root:
-            extract_elements(child, elements, text_nodes)
+        # Indice spaziale delle etichette, costruito una sola volta per dump
+        index = SpatialIndex(text_nodes, elements)
         
         # ✨ FILTRO POST-PROCESSING: Gestione intelligente e universale dei duplicati
         # Fase 1: Analisi preliminare - identifica i pattern
@@ -208,7 +392,7 @@ def xml_to_json(xml_file):
                 
                 if element.get('editable'):
                     # Calcola label temporaneo
-                    temp_label = find_label_for_edittext(element, text_nodes)
+                    temp_label = find_label_for_edittext(element, text_nodes, index)
                     
                     if width > 100 and height > 50:  # EditText "grandi" (veri campi)
                         if temp_label not in large_edittexts:
@@ -276,7 +460,7 @@ def xml_to_json(xml_file):
             if element['editable']:
                 # ✨ MIGLIORAMENTO: Se l'EditText ha un testo significativo che non è un placeholder, usalo come label
                 element_text = element.get('text', '').strip()
-                calculated_label = find_label_for_edittext(element, text_nodes)
+                calculated_label = find_label_for_edittext(element, text_nodes, index)
                 
                 # Se il testo è significativo e diverso dal label calcolato, preferisci il testo
                 if (element_text and len(element_text) > 1 and 
@@ -286,16 +470,24 @@ def xml_to_json(xml_file):
                 else:
                     element['label'] = calculated_label
             else:
-                element['text'] = find_label_for_button(element, text_nodes)
+                element['text'] = find_label_for_button(element, text_nodes, index)
                 element['label'] = element['text']
         
+        # Righe ripetute di liste (RecyclerView/ListView) raccolte in gruppi
+        groups = group_repeated_elements(elements)
+        
+        # ID stabili e indice di ricerca: l'esecutore agisce per ID, il testo libero passa dall'indice
+        assign_element_ids(elements)
+        
         # Risultato finale
         result = {
-            'source_file': os.path.basename(xml_file),
+            'source_file': source_file,
             'timestamp': datetime.now().isoformat(),
             'total_buttons': len([e for e in elements if not e['editable']]),
             'total_inputs': len([e for e in elements if e['editable']]),
-            'elements': elements
+            'groups': groups,
+            'elements': elements,
+            'lookup': build_lookup_index(elements)
         }
         
         return result